@@ -0,0 +1,4 @@
+The search configuration (searches, aliases, fields, facets, display fields and codes) is now loaded once per process
+into an immutable snapshot that is only rebuilt when a Search, Field, Code or ChronologicCode is saved or deleted.
+Changes are broadcast to other processes and servers through a generation counter in the Redis cache
+(SEARCH_CONFIG_BROADCAST_CACHE). The CACHE_LOCAL_TIMEOUT setting is no longer used.
@@ -0,0 +1,3 @@
+New warm_search_cache command and optional SEARCH_WARM_ON_STARTUP hook that load the search configuration, import
+the search plugins and precompile the templates and snippets named on the Search models when a worker starts.
+Set SEARCH_WARM_PING_SOLR (or use --ping) to also send one query to each Solr core.
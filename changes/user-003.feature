@@ -0,0 +1,3 @@
+Code labels are now kept in compact per-field code tables (sorted interned code IDs and a single label store for
+both languages) that are loaded the first time a search is requested. New search_memory_report command shows the
+memory used by the code labels of each search before and after.
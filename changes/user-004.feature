@@ -0,0 +1,3 @@
+Optional Solr result cache (SEARCH_RESULT_CACHE_ENABLED) for the search, record and more-like-this pages. Cached
+responses are keyed by the normalized Solr query, the core, the search plugin version and a per-core index generation
+that import_data_csv and solr_index_data increment after committing to Solr.
@@ -0,0 +1,3 @@
+Solr clients are now shared per process through search.solr_connections.get_solr_client(), with keep-alive pooled
+connections (SOLR_CLIENT_POOL_SIZE), gzip responses, bounded retries (SOLR_CLIENT_RETRIES) and connect/read timeouts
+per operation (SOLR_CLIENT_TIMEOUTS).
@@ -0,0 +1,3 @@
+Per-core Solr circuit breaker. After repeated connection failures or timeouts, queries to the core fail immediately
+for SOLR_CIRCUIT_RESET_TIMEOUT seconds. The last good cached response for the same query is shown with a notice
+when available, and the error page otherwise.
@@ -0,0 +1,3 @@
+Async versions of the search, record, more-like-this and search form views for ASGI deployments, enabled with
+SEARCH_ASYNC_VIEWS. They query Solr with an httpx based asyncio client and support coroutine plugin hooks named
+async_pre_search_solr_query, async_post_search_solr_query and so on.
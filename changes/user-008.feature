@@ -0,0 +1,3 @@
+New federated search endpoint at /search/<lang>/federated/ (/rechercher/<lang>/federe/) that queries the Solr cores
+of all the enabled searches concurrently and returns the number of matching records and the top records of each
+search as JSON. Responses are briefly cached in the result cache.
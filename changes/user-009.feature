@@ -0,0 +1,4 @@
+Setting values, like the search page top message, are now part of the search configuration snapshot and are
+reloaded when a Setting is saved or deleted, instead of being read from the database on every search page. Missing
+top message settings are no longer created automatically. New tests check that warm search, record, more-like-this
+and JSON requests do not query the database.
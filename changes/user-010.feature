@@ -0,0 +1,3 @@
+The query fields, highlighting fields, export field list and facet parameters of each search are now computed once per
+language and query type (search, record, export and more-like-this) and reused for every request. The new
+search_query_benchmark command compares the time needed to build the queries with and without these query skeletons.
@@ -0,0 +1,5 @@
+GET searches, POST search forms and exports now build their Solr queries with a single QueryBuilder. Equivalent GET and
+POST searches produce the same canonical query, with sorted filter values and without empty parameters, and share
+their result cache and export file cache entries. POST searches now fall back to the search's default sort order for
+an unknown sort order, and exports now translate French boolean operators and use the "id asc" export sort order
+for both forms.
@@ -0,0 +1,3 @@
+Search pages and the JSON search results can page with Solr cursors (SEARCH_CURSOR_PAGING). The next page link and
+button, and the next_cursor value of the JSON results, continue from the cursor of the current page, with the record
+ID used to break ties in the sort order. Offset paging is limited to SEARCH_MAX_START_ROW rows.
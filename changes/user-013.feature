@@ -0,0 +1,3 @@
+The Solr facet method can be set per facet field (enum, fc, fcs or auto) and the number of facet threads per search.
+In auto mode the method is chosen from the number of distinct values of the facet, which is measured with its query
+time after every data import, or with the measure_search_facets command, and shown in the Field admin.
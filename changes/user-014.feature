@@ -0,0 +1,5 @@
+Searches can request their facets with the Solr JSON Facet API in one request (Use the JSON Facet API). Date facet
+fields with a range gap, such as +1YEAR, are returned as date range buckets and filtered by range, with the older
+records counted together in a first bucket such as <2015, and selected facets exclude their own filter so their
+other values can still be chosen. The results are converted to the same facet counts as before, so templates and
+plugins are unchanged.
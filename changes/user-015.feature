@@ -0,0 +1,4 @@
+Highlighting can be set per field: on, off or automatic, with the number of snippets, the fragment size and the
+maximum number of characters analyzed. In automatic mode the search results page only highlights the fields that
+the search item snippet shows, found by scanning the snippet once per configuration change. Single-valued fields
+ask for one snippet instead of ten.
@@ -0,0 +1,3 @@
+Searches can declare the fields returned for each result on the search page (Search Results Fields), instead of
+every searchable field. The new derive_search_results_fields command finds the fields that the search item snippet
+shows and can save them. The record page, JSON results and exports still return every field.
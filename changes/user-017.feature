@@ -0,0 +1,3 @@
+Searches can opt in to approximate hit counts for broad queries (Minimum Exact Hit Count, Solr minExactCount).
+When Solr stops counting, the search page shows "About 1.2 million records", the pagination has no last page link
+but keeps a Next link, and the JSON results include "num_count_exact": false.
@@ -0,0 +1,4 @@
+The search text is parsed by a new query text parser (search/query_parser.py) with one precompiled regular
+expression, and the French boolean operators are translated in the same pass, but no longer inside quoted phrases.
+The search views no longer import NLTK. The search_query_benchmark command compares the parser with the NLTK
+tokenizer.
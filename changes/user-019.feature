@@ -0,0 +1,3 @@
+Identical Solr queries that are in flight at the same time are coalesced (search/single_flight.py): the first request
+queries Solr and the others wait for its response. With SEARCH_SINGLE_FLIGHT_LOCK, the web workers sharing the
+Redis result cache coalesce their queries with a lock in the cache.
@@ -0,0 +1,4 @@
+Searches can set a Solr time budget (timeAllowed) and CPU budget (cpuAllowed) for their queries. When Solr stops a
+query early, the search page shows the results found so far with a notice, the JSON response and federated search
+results have partial_results set, and the response is not kept in the result cache. Queries paged with a cursor are
+not bounded, since Solr cannot combine a cursor with a time budget.
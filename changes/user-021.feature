@@ -0,0 +1,4 @@
+Facets sorted by label are ordered with label ranks computed once per language when the code tables of a search are
+loaded, using the Canadian English and French collations (PyICU when installed, a built-in approximation otherwise).
+Unknown facet values are counted in the unknown_facet_value metric (search/metrics.py) and only logged the first
+time they are seen by a worker.
@@ -0,0 +1,4 @@
+The facet counts of a Solr response are read once into FacetResult objects (search/facets.py), with the values,
+labels and counts of each facet in display order. The search page and search form templates and the JSON responses
+render from them. FacetResult still works as a dictionary of counts with __label__ and __sortorder__ for custom
+facet snippets and plugins.
@@ -0,0 +1,4 @@
+New versioned JSON API for each search with JSON responses enabled: /search/api/v1/<lang>/<search>/. It takes the
+search page parameters plus fields= (projection), facets= (facets to count, none by default), rows= (up to
+SEARCH_API_MAX_ROWS) and cursor= (cursor paging with next_cursor). Responses are encoded incrementally, with orjson
+when it is installed.
@@ -0,0 +1,5 @@
+Conditional GET for the search, record and more-like-this pages and the search API, with SEARCH_HTTP_CACHE_ENABLED:
+ETag and Last-Modified headers based on the normalized Solr query and the index generation of the core, 304 Not
+Modified for a matching If-None-Match without querying Solr, and a per-core surrogate key header. import_data_csv and
+solr_index_data send the new search_index_updated signal after committing, which purges the core's surrogate key
+through SEARCH_CDN_PURGE_URL.
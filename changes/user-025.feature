@@ -0,0 +1,5 @@
+The facet list and result list of the search pages are cached as rendered template fragments in the
+SEARCH_FRAGMENT_CACHE_ALIAS cache, keyed by the facet counts, selected filters and search text, and by the record IDs,
+highlighting, search text, sort order and page number, along with the language and page path. New {% cachefragment %}
+template tag for custom page templates; see search/fragment_cache.py for the context variables that the snippets of
+a cached fragment may use.
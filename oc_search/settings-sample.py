@@ -174,6 +174,22 @@ SOLR_SERVER_URL = 'http://localhost:8983/solr'
 
 SOLR_COLLECTION = "SolrClient_unittest"
 
+# Solr HTTP connections are kept alive and shared by all the requests handled by a process. Set the number of pooled
+# connections per Solr host, the number of retries for failed connections and 502/503/504 responses (read timeouts
+# are never retried) and (connect, read) timeouts in seconds for each type of Solr operation
+SOLR_CLIENT_POOL_SIZE = 10
+SOLR_CLIENT_RETRIES = 2
+SOLR_CLIENT_RETRY_BACKOFF = 0.2
+SOLR_CLIENT_TIMEOUTS = {
+    'select': (3.05, 30),
+    'export': (3.05, 300),
+    'update': (3.05, 120),
+}
+
+# When deployed with ASGI (see oc_search/asgi.py), use the async versions of the search, record, more-like-this and
+# search form views, which query Solr with an asyncio client (requires httpx)
+SEARCH_ASYNC_VIEWS = False
+
 # Application URL
 
 SEARCH_EN_HOSTNAME = ''
@@ -255,8 +271,88 @@ CACHES = {
         'LOCATION': 'redis://:password@localhost:6379',
     },
 }
-# Object in the local cache expire after this many seconds. Not recommended to be less than 60 seconds.
-CACHE_LOCAL_TIMEOUT = 30
+# The Search, Field and Code configuration is loaded once per process and only reloaded when it changes. Changes
+# are broadcast to the other processes and servers through a generation counter kept in this cache, which is
+# checked at most once every SEARCH_CONFIG_CHECK_INTERVAL seconds.
+SEARCH_CONFIG_BROADCAST_CACHE = 'redis'
+SEARCH_CONFIG_CHECK_INTERVAL = 5
+
+# Load the search configuration, plugins and templates when a web worker starts instead of on its first request.
+# Optionally also load the code tables of every search, which can be large, and send one query to each Solr core.
+# Only the WSGI and ASGI servers and runserver warm up. The same warm-up can be run with the warm_search_cache command.
+SEARCH_WARM_ON_STARTUP = False
+SEARCH_WARM_CODE_TABLES = False
+SEARCH_WARM_PING_SOLR = False
+
+# Optional cache of Solr search, record and more-like-this responses. Cached responses are keyed by the Solr query and
+# a per-core index generation counter that import_data_csv and solr_index_data increment after committing to Solr.
+# Change SEARCH_RESULT_CACHE_VERSION to discard all the cached responses, for example after deploying plugin changes.
+SEARCH_RESULT_CACHE_ENABLED = False
+SEARCH_RESULT_CACHE_ALIAS = 'redis'
+SEARCH_RESULT_CACHE_TIMEOUT = 3600
+SEARCH_RESULT_CACHE_VERSION = 1
+
+# Stop querying a Solr core for SOLR_CIRCUIT_RESET_TIMEOUT seconds after SOLR_CIRCUIT_FAILURE_THRESHOLD consecutive
+# connection failures, timeouts or 5xx responses. While the core is unavailable, the last good response for a query
+# is shown with a notice if the result cache is enabled and has one, and the error page otherwise. The last good
+# responses are kept for SEARCH_STALE_RESULT_TIMEOUT seconds.
+SOLR_CIRCUIT_FAILURE_THRESHOLD = 5
+SOLR_CIRCUIT_RESET_TIMEOUT = 30
+SEARCH_STALE_RESULT_TIMEOUT = 86400
+
+# Identical Solr queries made at the same time by the threads of a web worker are sent to Solr once: the later
+# requests wait up to SEARCH_SINGLE_FLIGHT_TIMEOUT seconds for the response of the first one. With
+# SEARCH_SINGLE_FLIGHT_LOCK and the result cache enabled, the web workers sharing the result cache also wait for each
+# other, polling the cache every SEARCH_SINGLE_FLIGHT_POLL_INTERVAL seconds.
+SEARCH_SINGLE_FLIGHT_ENABLED = True
+SEARCH_SINGLE_FLIGHT_TIMEOUT = 10
+SEARCH_SINGLE_FLIGHT_LOCK = False
+SEARCH_SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+
+# With SEARCH_HTTP_CACHE_ENABLED and the result cache enabled, the search, record and more-like-this pages and the
+# search API are sent with ETag, Last-Modified and SEARCH_SURROGATE_KEY_HEADER headers, and requests with a matching
+# If-None-Match header get 304 Not Modified without querying Solr. The surrogate key of a page is
+# SEARCH_SURROGATE_KEY_PREFIX followed by the name of its Solr core. After committing to a core, import_data_csv and
+# solr_index_data post a purge request for its key to SEARCH_CDN_PURGE_URL, if set, for example
+# 'https://api.fastly.com/service/<service id>/purge/{key}' with SEARCH_CDN_PURGE_HEADERS = {'Fastly-Key': '...'}
+SEARCH_HTTP_CACHE_ENABLED = False
+SEARCH_SURROGATE_KEY_HEADER = 'Surrogate-Key'
+SEARCH_SURROGATE_KEY_PREFIX = 'search-core-'
+SEARCH_CDN_PURGE_URL = ''
+SEARCH_CDN_PURGE_HEADERS = {}
+SEARCH_CDN_PURGE_TIMEOUT = 10
+
+# Cache the rendered facet list and result list of the search pages in the SEARCH_FRAGMENT_CACHE_ALIAS cache for up
+# to SEARCH_FRAGMENT_CACHE_TIMEOUT seconds, so that paging through the same results does not render the facets again.
+# Use a real cache backend here, not the dummy 'default' cache. Leave empty to disable.
+SEARCH_FRAGMENT_CACHE_ALIAS = 'local'
+SEARCH_FRAGMENT_CACHE_TIMEOUT = 300
+
+# The federated search (/search/<lang>/federated/?search_text=...) queries every enabled search concurrently with a
+# pool of FEDERATED_SEARCH_WORKERS threads shared by the requests of each process, and returns the number of matches
+# and the top FEDERATED_SEARCH_ROWS records of each search (the rows parameter may ask for up to
+# FEDERATED_SEARCH_MAX_ROWS). Searches that have not answered after FEDERATED_SEARCH_TIMEOUT seconds, which is also
+# the Solr read timeout of their queries, are reported as timed out. Complete responses are kept in the result cache
+# for FEDERATED_SEARCH_CACHE_TIMEOUT seconds.
+FEDERATED_SEARCH_WORKERS = 8
+FEDERATED_SEARCH_ROWS = 3
+FEDERATED_SEARCH_MAX_ROWS = 10
+FEDERATED_SEARCH_TIMEOUT = 5
+FEDERATED_SEARCH_CACHE_TIMEOUT = 60
+
+# The search API (/search/api/v1/<lang>/<search>/) of the searches with JSON responses enabled returns at most
+# SEARCH_API_MAX_ROWS records per request. Install orjson for faster encoding of the responses.
+SEARCH_API_MAX_ROWS = 100
+
+# Use Solr cursors for the next page links of the search pages and the JSON search results, so that paging through
+# the results does not require deep paging in Solr. Links to other pages still use a row offset, which is limited to
+# SEARCH_MAX_START_ROW rows.
+SEARCH_CURSOR_PAGING = True
+SEARCH_MAX_START_ROW = 10000
+
+# Facet fields with the 'auto' facet method use facet.method=enum when they have at most this many distinct values,
+# as measured after each data import, and a field cache method otherwise. Keep it below the size of the Solr filterCache.
+SEARCH_FACET_ENUM_MAX_CARDINALITY = 500
 
 SESSION_ENGINE="django.contrib.sessions.backends.file"
 SESSION_FILE_PATH = os.path.join(BASE_DIR, 'session')
@@ -18,9 +18,15 @@ from django.contrib import admin
 from django.urls import path
 from django.conf.urls import include
 from django.views.decorators.cache import never_cache
-from search.views import SearchView, SearchFormView, RecordView, ExportView, MoreLikeThisView, HomeView, DefaultView, ExportStatusView, DownloadSearchResultsView, PageView
+from search.views import SearchView, SearchFormView, RecordView, ExportView, MoreLikeThisView, HomeView, DefaultView, ExportStatusView, DownloadSearchResultsView, PageView, \
+    FederatedSearchView, SearchApiView
 from ramp.views import RampView
 
+# Use the async search, record, more-like-this and search form views when running under ASGI
+if getattr(settings, 'SEARCH_ASYNC_VIEWS', False):
+    from search.views import AsyncSearchView as SearchView, AsyncSearchFormView as SearchFormView, \
+        AsyncRecordView as RecordView, AsyncMoreLikeThisView as MoreLikeThisView
+
 
 urlpatterns = [
     path('search/admin/doc/', include('django.contrib.admindocs.urls')),
@@ -39,6 +45,10 @@ if settings.SEARCH_LANG_USE_PATH:
         path('search/<str:lang>/page/<str:page_type>/', PageView.as_view(), name="StaticPage"),
         path('rechercher/', DefaultView.as_view(), name="HomePage"),
         path('search/<str:lang>/', HomeView.as_view(), name="HomePage"),
+        path('search/<str:lang>/federated/', FederatedSearchView.as_view(), name="FederatedSearch"),
+        path('rechercher/<str:lang>/federe/', FederatedSearchView.as_view(), name="FederatedSearch"),
+        path('search/api/v<int:version>/<str:lang>/<str:search_type>/', SearchApiView.as_view(), name="SearchApi"),
+        path('rechercher/api/v<int:version>/<str:lang>/<str:search_type>/', SearchApiView.as_view(), name="SearchApi"),
         path('rechercher/<str:lang>/page/<str:page_type>/', PageView.as_view(), name="StaticPage"),
         path('search/<str:lang>/<str:search_type>/record/<path:record_id>', RecordView.as_view(), name='RecordForm'),
         path('rechercher/<str:lang>/<str:search_type>/record/<path:record_id>', RecordView.as_view(), name='RecordForm'),
@@ -73,6 +83,10 @@ else:
         path('', DefaultView.as_view(), name="HomePage"),
         path(settings.SEARCH_HOST_PATH, HomeView.as_view(), name="HomePage"),
         path(settings.SEARCH_HOST_PATH + 'page/<str:page_type>/', PageView.as_view(), name="StaticPage"),
+        path(settings.SEARCH_HOST_PATH + 'federated/', FederatedSearchView.as_view(), name="FederatedSearch"),
+        path(settings.SEARCH_HOST_PATH + 'federe/', FederatedSearchView.as_view(), name="FederatedSearch"),
+        path(settings.SEARCH_HOST_PATH + 'api/v<int:version>/<str:search_type>/', SearchApiView.as_view(),
+             name="SearchApi"),
 
         path(settings.SEARCH_HOST_PATH + 'record/<str:search_type>/<path:record_id>', RecordView.as_view(),
              name='RecordForm'),
@@ -4,7 +4,8 @@ from django.http import HttpRequest
 from django.views.generic import View
 from django.shortcuts import render
 import re
-from SolrClient2 import SolrClient, SolrResponse
+from search.solr_connections import get_solr_client
+from SolrClient2 import SolrResponse
 from SolrClient2.exceptions import ConnectionError, SolrError
 
 
@@ -38,7 +39,7 @@ class RampView(View):
 
         # Get the titles
 
-        solr = SolrClient(settings.OPEN_DATA_SOLR_SERVER_URL)
+        solr = get_solr_client(host=settings.OPEN_DATA_SOLR_SERVER_URL)
         q_text = " OR id:".join(valid_uuids)
         q_text = "id:" + q_text
         solr_query = {'q': q_text, 'defType': 'edismax', 'sow': True}
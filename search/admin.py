@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import reverse
 from django.utils.html import format_html
 from .models import Search, Field, Code, ChronologicCode, Setting, Event
+from .registry import search_registry
 
 # -- Searches ---
 
@@ -16,7 +17,8 @@ class SearchAdmin(admin.ModelAdmin):
                            'about_message_en', 'about_message_fr', 'search_alias_en', 'search_alias_fr',
                            'imported_on')}),
         ('Disabled', {'fields': ('is_disabled', 'disabled_message_en', 'disabled_message_fr')}),
-        ('Results', {'fields': ('results_page_size', 'results_sort_order_en', 'results_sort_order_fr',
+        ('Results', {'fields': ('results_page_size', 'results_fields', 'solr_min_exact_count',
+                                'solr_time_allowed', 'solr_cpu_allowed', 'results_sort_order_en', 'results_sort_order_fr',
                                 'results_sort_order_display_en', 'results_sort_order_display_fr',
                                 'results_sort_default_en','results_sort_default_fr',
                                 'json_response', 'raw_solr_response')}),
@@ -25,7 +27,8 @@ class SearchAdmin(admin.ModelAdmin):
                                   'header_css_snippet', 'body_js_snippet', 'search_item_snippet',
                                   'record_detail_snippet', 'record_breadcrumb_snippet',
                                   'main_content_body_top_snippet', 'search_results_message_snippet', 'more_like_this_template')}),
-        ('More-like-this', {'fields': ('mlt_enabled', 'mlt_items')})
+        ('More-like-this', {'fields': ('mlt_enabled', 'mlt_items')}),
+        ('Facets', {'fields': ('solr_json_facets', 'solr_facet_threads')})
     )
 
     # -- Fields ---
@@ -33,6 +36,8 @@ class SearchAdmin(admin.ModelAdmin):
 
 def make_facet_field(modeladmn, request, queryset):
     queryset.update(is_search_facet=True)
+    # update() does not send post_save, so the configuration snapshots are invalidated here
+    search_registry.invalidate_on_commit()
 
 
 make_facet_field.short_description = 'Mark selected fields as search facets'
@@ -40,6 +45,7 @@ make_facet_field.short_description = 'Mark selected fields as search facets'
 
 def clear_facet_field(modeladmn, request, queryset):
     queryset.update(is_search_facet=False)
+    search_registry.invalidate_on_commit()
 
 
 clear_facet_field.short_description = 'Clear selected fields as search facets'
@@ -47,6 +53,7 @@ clear_facet_field.short_description = 'Clear selected fields as search facets'
 
 def make_default_display_field(modeladmn, request, queryset):
     queryset.update(is_default_display=True)
+    search_registry.invalidate_on_commit()
 
 
 make_default_display_field.short_description = 'Mark selected fields for default search results'
@@ -54,6 +61,7 @@ make_default_display_field.short_description = 'Mark selected fields for default
 
 def clear_default_display_field(modeladmn, request, queryset):
     queryset.update(is_default_display=False)
+    search_registry.invalidate_on_commit()
 
 
 clear_default_display_field.short_description = 'Clear selected fields for default search results'
@@ -61,6 +69,7 @@ clear_default_display_field.short_description = 'Clear selected fields for defau
 
 def make_currency_field(modeladmn, request, queryset):
     queryset.update(solr_field_is_currency=True, solr_field_type='pfloat')
+    search_registry.invalidate_on_commit()
 
 
 make_currency_field.short_description = 'Mark selected fields as currency, float'
@@ -68,14 +77,18 @@ make_currency_field.short_description = 'Mark selected fields as currency, float
 
 class FieldAdmin(admin.ModelAdmin):
 
-    list_display = ('field_id', 'is_search_facet', 'is_default_display', 'search_id', 'format_name', 'solr_field_is_coded', 'solr_field_type', 'solr_field_lang')
+    list_display = ('field_id', 'is_search_facet', 'is_default_display', 'search_id', 'format_name', 'solr_field_is_coded', 'solr_field_type', 'solr_field_lang',
+                    'solr_facet_method', 'solr_facet_cardinality', 'solr_facet_cost_ms')
     actions = [make_facet_field, make_default_display_field, clear_facet_field, clear_default_display_field, make_currency_field]
     search_fields = ['field_id', 'is_search_facet']
     list_filter = ['search_id']
+    readonly_fields = ('solr_facet_cardinality', 'solr_facet_cost_ms', 'solr_facet_measured_on')
     fieldsets = (
         (None, {'fields': ('field_id', 'search_id', 'label_en', 'label_fr', 'format_name', 'solr_field_type', 'solr_field_lang', 'solr_field_export', 'solr_field_is_coded', 'solr_extra_fields')}),
         ('Solr Attributes', {'fields': ('solr_field_stored', 'solr_field_indexed', 'solr_field_multivalued', 'solr_field_multivalue_delimeter','solr_field_is_currency')}),
-        ('Facets', {'fields': ('is_search_facet', 'solr_facet_sort', 'solr_facet_limit', 'solr_facet_snippet', 'solr_facet_display_reversed', 'solr_facet_display_order')}),
+        ('Highlighting', {'fields': ('solr_highlight', 'solr_hl_snippets', 'solr_hl_fragsize', 'solr_hl_max_analyzed_chars')}),
+        ('Facets', {'fields': ('is_search_facet', 'solr_facet_sort', 'solr_facet_limit', 'solr_facet_snippet', 'solr_facet_display_reversed', 'solr_facet_display_order',
+                               'solr_facet_method', 'solr_facet_range_gap', 'solr_facet_range_start', 'solr_facet_cardinality', 'solr_facet_cost_ms', 'solr_facet_measured_on')}),
         ('Advanced', {'fields': ('alt_format', 'is_default_display', 'default_export_value')}),
         ('Search Default', {'fields': ('is_default_year', 'is_default_month')}),
     )
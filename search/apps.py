@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class SearchConfig(AppConfig):
     name = 'search'
     verbose_name = "Open Canada Metadata Search Application"
+
+    def ready(self):
+        # Connect the signal handlers that keep the search configuration registry current
+        from search import signals
+
+        # Optionally load the configuration, plugins and templates before the worker serves its first request
+        if getattr(settings, 'SEARCH_WARM_ON_STARTUP', False):
+            from search.warmup import is_server_process, warm_on_startup
+            if is_server_process():
+                warm_on_startup()
@@ -0,0 +1,91 @@
+"""
+Per-core circuit breaker for Solr queries.
+
+When a Solr core stops responding, every worker that queries it waits for the read timeout, and soon no worker is
+left to serve any page. After SOLR_CIRCUIT_FAILURE_THRESHOLD consecutive connection failures, timeouts or 5xx
+responses the circuit for the core opens and queries fail immediately (or are answered from the last good cached
+response) for SOLR_CIRCUIT_RESET_TIMEOUT seconds. After that a single trial query is let through: the circuit closes again if it
+succeeds and stays open for another period if it fails. A trial query that never reports back, because it was
+cancelled for example, is replaced by another one after SOLR_CIRCUIT_RESET_TIMEOUT seconds. Circuits are kept per
+process.
+"""
+
+from django.conf import settings
+import logging
+import threading
+import time
+from SolrClient2.exceptions import ConnectionError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    Raised instead of querying a Solr core while its circuit is open
+    """
+
+
+class CircuitBreaker:
+
+    def __init__(self, name: str, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        :return: True if a query may be sent to Solr
+        """
+        if self.state == CLOSED:
+            return True
+        with self._lock:
+            # A trial query that has not reported back after reset_timeout seconds, because it was cancelled for
+            # example, is given up on and another one is let through
+            if self.state != CLOSED and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let one trial query through
+                self.state = HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return self.state == CLOSED
+
+    def record_success(self):
+        if self.state != CLOSED or self.failures:
+            with self._lock:
+                if self.state != CLOSED:
+                    logger.info(f"Solr circuit for {self.name} closed")
+                self.state = CLOSED
+                self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Solr circuit for {self.name} opened after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(core_name: str) -> CircuitBreaker:
+    breaker = _breakers.get(core_name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(core_name)
+            if breaker is None:
+                breaker = CircuitBreaker(core_name,
+                                         failure_threshold=getattr(settings, 'SOLR_CIRCUIT_FAILURE_THRESHOLD', 5),
+                                         reset_timeout=getattr(settings, 'SOLR_CIRCUIT_RESET_TIMEOUT', 30))
+                _breakers[core_name] = breaker
+    return breaker
@@ -0,0 +1,156 @@
+"""
+Compact storage for the Code labels of a search.
+
+The code labels of a search used to be kept as two nested dictionaries (one per language) of full label strings.
+For searches with thousands of organization and choice codes this is a lot of memory per worker, so the labels of
+each field are now kept in a CodeTable: a sorted tuple of interned code IDs and one tuple holding the English and
+French labels side by side. Read-only dictionary-like views (CodeLabels) keep the views, plugins and templates
+working with the same `codes[field_id][code_id]` lookups as before.
+
+The labels are also ranked once per language with a locale-aware collation (see search/collation.py) when the table
+is built, so facets sorted by label only need an integer sort per request.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from search.collation import get_collation_key
+import sys
+
+
+class CodeTable:
+    """
+    Code labels for a single field. The label for the code at position i of `keys` is at position 2 * i (English) and
+    2 * i + 1 (French) of `labels`, and its rank in the label order of the language at the same position of `ranks`.
+    """
+
+    __slots__ = ('keys', 'labels', 'ranks')
+
+    LANG_OFFSET = {'en': 0, 'fr': 1}
+
+    def __init__(self, codes: dict):
+        """
+        :param codes: dictionary of (English label, French label) tuples keyed by code ID
+        """
+        self.keys = tuple(sys.intern(code_id) for code_id in sorted(codes))
+        labels = []
+        for code_id in self.keys:
+            labels.extend(codes[code_id])
+        self.labels = tuple(labels)
+        ranks = [0] * len(labels)
+        for lang, offset in self.LANG_OFFSET.items():
+            key = get_collation_key(lang)
+            # Codes with the same label keep the order of their IDs
+            order = sorted(range(len(self.keys)), key=lambda i: key(self.labels[2 * i + offset] or ''))
+            for rank, i in enumerate(order):
+                ranks[2 * i + offset] = rank
+        self.ranks = array('L', ranks)
+
+    def index(self, code_id):
+        if not isinstance(code_id, str):
+            return -1
+        i = bisect_left(self.keys, code_id)
+        if i < len(self.keys) and self.keys[i] == code_id:
+            return i
+        return -1
+
+    def label(self, code_id, lang: str):
+        i = self.index(code_id)
+        if i < 0:
+            raise KeyError(code_id)
+        return self.labels[2 * i + self.LANG_OFFSET[lang]]
+
+    def for_lang(self, lang: str):
+        return CodeLabels(self, lang)
+
+
+class CodeLabels(Mapping):
+    """
+    Read-only mapping of code ID to the label in one language, backed by a CodeTable
+    """
+
+    __slots__ = ('table', 'offset')
+
+    def __init__(self, table: CodeTable, lang: str):
+        self.table = table
+        self.offset = CodeTable.LANG_OFFSET[lang]
+
+    def __getitem__(self, code_id):
+        i = self.table.index(code_id)
+        if i < 0:
+            raise KeyError(code_id)
+        return self.table.labels[2 * i + self.offset]
+
+    def __contains__(self, code_id):
+        return self.table.index(code_id) >= 0
+
+    def __iter__(self):
+        return iter(self.table.keys)
+
+    def __len__(self):
+        return len(self.table.keys)
+
+    def __repr__(self):
+        return f"CodeLabels({len(self)} codes)"
+
+    def sort_by_label(self, code_ids):
+        """
+        Sort codes by their labels in the language of the mapping
+        :return: the list of sorted code IDs and the list of the code IDs that are not in the table
+        """
+        ranked = []
+        unknown = []
+        for code_id in code_ids:
+            i = self.table.index(code_id)
+            if i < 0:
+                unknown.append(code_id)
+            else:
+                ranked.append((self.table.ranks[2 * i + self.offset], code_id))
+        ranked.sort()
+        return [code_id for rank, code_id in ranked], unknown
+
+
+class SearchCodeTables:
+    """
+    The code tables for all the fields of one search, with the per-language views that are handed to the views,
+    plugins and templates.
+    """
+
+    __slots__ = ('tables', 'codes_en', 'codes_fr')
+
+    def __init__(self, field_codes: dict):
+        """
+        :param field_codes: dictionary keyed by field ID of dictionaries of (English label, French label) tuples
+        keyed by code ID
+        """
+        self.tables = {sys.intern(field_id): CodeTable(codes) for field_id, codes in field_codes.items()}
+        self.codes_en = {field_id: table.for_lang('en') for field_id, table in self.tables.items()}
+        self.codes_fr = {field_id: table.for_lang('fr') for field_id, table in self.tables.items()}
+
+    def for_lang(self, lang: str) -> dict:
+        return self.codes_fr if lang == 'fr' else self.codes_en
+
+
+def deep_sizeof(obj, seen=None) -> int:
+    """
+    Approximate memory footprint of an object and everything it references, counting shared objects once
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += deep_sizeof(k, seen) + deep_sizeof(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += deep_sizeof(v, seen)
+    elif hasattr(obj, '__slots__'):
+        for attr in obj.__slots__:
+            if hasattr(obj, attr):
+                size += deep_sizeof(getattr(obj, attr), seen)
+    return size
@@ -0,0 +1,56 @@
+"""
+Locale-aware sort keys for the labels shown to users.
+
+Facets sorted by label used to be sorted by code point in English and with unidecode in French, on every request.
+The code tables now rank their labels once per language with the keys below, see search.code_tables.CodeTable.
+
+PyICU is used when it is installed, with the Canadian English and French collations. Otherwise a simplified
+version of the same multi-level comparison is used: letters are compared first without accents or case, then the
+accents, then the case. Like the Canadian French collation, French compares the accents from the end of the word,
+so cote < côte < coté < côté.
+"""
+
+import unicodedata
+
+try:
+    import icu
+except ImportError:
+    icu = None
+
+ICU_LOCALES = {'en': 'en_CA', 'fr': 'fr_CA'}
+
+# Letters that do not decompose to a base letter and an accent
+LIGATURES = str.maketrans({'æ': 'ae', 'Æ': 'AE', 'œ': 'oe', 'Œ': 'OE', 'ß': 'ss'})
+
+
+def collation_key(label: str, backward_accents=False) -> tuple:
+    """
+    :param backward_accents: compare the accents from the end of the label, as in French
+    :return: a sort key comparing the base letters, then the accents, then the case, of a label
+    """
+    letters = []
+    accents = []
+    cases = []
+    for c in unicodedata.normalize('NFD', label.translate(LIGATURES)):
+        if unicodedata.combining(c):
+            if accents:
+                accents[-1] += c
+            continue
+        letters.append(c.casefold())
+        accents.append('')
+        # Lowercase sorts first
+        cases.append(c != c.casefold())
+    if backward_accents:
+        accents.reverse()
+    return ''.join(letters), tuple(accents), tuple(cases), label
+
+
+def get_collation_key(lang: str):
+    """
+    :return: a function returning the sort key of a label in the given language
+    """
+    if icu is not None:
+        return icu.Collator.createInstance(icu.Locale(ICU_LOCALES.get(lang, 'en_CA'))).getSortKey
+    if lang == 'fr':
+        return lambda label: collation_key(label, backward_accents=True)
+    return collation_key
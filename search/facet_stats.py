@@ -0,0 +1,87 @@
+"""
+Measure the facet fields of a search after a data import.
+
+For every facet field the number of distinct values (the cardinality) and the time Solr needs to calculate the facet
+with its current facet method are saved in the Field model. Fields with the 'auto' facet method use the measured
+cardinality to choose between the enum and field cache methods (see search.query.get_facet_method), and the admin
+shows both measurements so that the method of the other fields can be tuned.
+"""
+
+from django.utils import timezone
+import json
+import logging
+from search.models import Search, Field
+from search.query import get_facet_method
+from search.registry import search_registry
+from search.solr_connections import get_solr_client
+from SolrClient2.exceptions import ConnectionError, SolrError
+
+logger = logging.getLogger(__name__)
+
+
+def measure_facet_cardinality(solr, core_name: str, fields: list) -> dict:
+    """
+    Count the distinct values of all the facet fields with a single JSON Facet API query
+    :return: dictionary of the number of distinct values keyed by field ID
+    """
+    json_facet = {f.field_id: f"unique({f.field_id})" for f in fields}
+    solr_response = solr.query(core_name, {'q': '*:*', 'rows': 0, 'json.facet': json.dumps(json_facet)})
+    facets = solr_response.data.get('facets', {})
+    # Solr leaves out the counts when the core is empty
+    return {f.field_id: int(facets.get(f.field_id, 0)) for f in fields}
+
+
+def measure_facet_cost(solr, core_name: str, search: Search, field: Field) -> int:
+    """
+    Calculate a facet the way the search page does and return the Solr query time in milliseconds
+    """
+    solr_query = {
+        'q': '*:*',
+        'rows': 0,
+        'facet': True,
+        'facet.field': field.field_id,
+        'facet.mincount': 1,
+        'facet.sort': field.solr_facet_sort if field.solr_facet_sort in ('count', 'index') else 'index',
+        'facet.limit': field.solr_facet_limit,
+        'facet.method': get_facet_method(field),
+    }
+    if search.solr_facet_threads > 0:
+        solr_query['facet.threads'] = search.solr_facet_threads
+    solr_response = solr.query(core_name, solr_query)
+    return solr_response.data.get('responseHeader', {}).get('QTime', 0)
+
+
+def measure_facets(search_id: str, solr=None) -> dict:
+    """
+    Measure the cardinality and cost of every facet field of a search and save them in the Field models. Called by the
+    data import commands after the final commit. Errors are logged and never interrupt the import.
+    :return: dictionary of (cardinality, cost in ms, facet method) tuples keyed by field ID
+    """
+    try:
+        search = Search.objects.get(search_id=search_id)
+    except Search.DoesNotExist:
+        logger.warning(f"Unable to measure the facets of unknown search {search_id}")
+        return {}
+    fields = list(Field.objects.filter(search_id=search, is_search_facet=True).order_by('id'))
+    if not fields:
+        return {}
+    if solr is None:
+        solr = get_solr_client()
+
+    results = {}
+    try:
+        cardinality = measure_facet_cardinality(solr, search.solr_core_name, fields)
+        measured_on = timezone.now()
+        for field in fields:
+            field.solr_facet_cardinality = cardinality[field.field_id]
+            cost = measure_facet_cost(solr, search.solr_core_name, search, field)
+            results[field.field_id] = (field.solr_facet_cardinality, cost, get_facet_method(field))
+            # update() does not send the post_save signal, the registry is invalidated once below
+            Field.objects.filter(pk=field.pk).update(solr_facet_cardinality=field.solr_facet_cardinality,
+                                                     solr_facet_cost_ms=cost, solr_facet_measured_on=measured_on)
+    except (ConnectionError, SolrError) as x:
+        logger.warning(f"Unable to measure the facets of search {search_id}: {x}")
+    if results:
+        search_registry.invalidate_on_commit()
+        logger.info(f"Measured {len(results)} facets of search {search_id}: {results}")
+    return results
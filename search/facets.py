@@ -0,0 +1,136 @@
+"""
+Facet results shared by the HTML pages and the JSON responses.
+
+The facet counts of a Solr response are read once into a FacetResult per field: parallel lists of the facet values,
+their labels in English and French, and their counts, in display order. The templates loop over FacetResult.rows and
+the JSON responses use FacetResult.to_json(), so neither has to resolve the code labels again.
+
+For custom facet snippets and search plugins written for the dictionaries of counts returned by
+SolrResponse.get_facets(), a FacetResult also behaves as an ordered mapping of facet value to count, followed by the
+'__label__' and '__sortorder__' entries.
+"""
+
+from collections.abc import MutableMapping
+
+SYSTEM_FACET_FIELDS = ('__label__', '__sortorder__')
+
+
+class FacetResult(MutableMapping):
+    """
+    The values, labels and counts of one facet of a Solr response, in display order
+    """
+
+    __slots__ = ('field_id', 'label', 'sort_order', 'lang', 'coded', 'values', 'counts', 'labels_en', 'labels_fr')
+
+    def __init__(self, field_id: str, label: str, sort_order: str, lang: str, values: list, counts: list,
+                 codes_en=None, codes_fr=None):
+        """
+        :param label: label of the facet field in the language of the page
+        :param codes_en: English labels of the codes of the field, or None if the field is not coded
+        :param codes_fr: French labels of the codes of the field
+        """
+        self.field_id = field_id
+        self.label = label
+        self.sort_order = sort_order
+        self.lang = lang
+        self.coded = codes_en is not None
+        self.values = values
+        self.counts = counts
+        if self.coded:
+            self.labels_en = [codes_en.get(v, '') for v in values]
+            self.labels_fr = [codes_fr.get(v, '') for v in values]
+        else:
+            self.labels_en = self.labels_fr = values
+
+    @classmethod
+    def from_solr(cls, field_id: str, facet_field: list, label: str, sort_order: str, lang: str, codes_en=None,
+                  codes_fr=None):
+        """
+        :param facet_field: the flat list of values and counts of the field in facet_counts.facet_fields
+        """
+        return cls(field_id, label, sort_order, lang, facet_field[::2], facet_field[1::2], codes_en, codes_fr)
+
+    @classmethod
+    def from_mapping(cls, field_id: str, facet, lang: str, codes_en=None, codes_fr=None):
+        """
+        Build a facet result from a dictionary of counts with the '__label__' and '__sortorder__' entries, as made by
+        search plugins that replace the facets of the context
+        """
+        if isinstance(facet, FacetResult):
+            return facet
+        values = [v for v in facet if v not in SYSTEM_FACET_FIELDS]
+        return cls(field_id, facet.get('__label__', ''), facet.get('__sortorder__', ''), lang, values,
+                   [facet[v] for v in values], codes_en, codes_fr)
+
+    @property
+    def labels(self) -> list:
+        return self.labels_fr if self.lang == 'fr' else self.labels_en
+
+    @property
+    def rows(self) -> list:
+        """
+        :return: a list of (value, label, count) tuples in display order
+        """
+        return list(zip(self.values, self.labels, self.counts))
+
+    def reorder(self, values: list):
+        """
+        Keep only the given facet values, in the given order
+        """
+        positions = {v: i for i, v in enumerate(self.values)}
+        order = [positions[v] for v in values]
+        self.values = [self.values[i] for i in order]
+        self.counts = [self.counts[i] for i in order]
+        if self.coded:
+            self.labels_en = [self.labels_en[i] for i in order]
+            self.labels_fr = [self.labels_fr[i] for i in order]
+        else:
+            self.labels_en = self.labels_fr = self.values
+
+    def to_json(self) -> list:
+        return [{'code': v, 'label_en': label_en, 'label_fr': label_fr, 'count': count}
+                for v, label_en, label_fr, count in zip(self.values, self.labels_en, self.labels_fr, self.counts)]
+
+    # Mapping of facet value to count
+
+    def __getitem__(self, key):
+        if key == '__label__':
+            return self.label
+        if key == '__sortorder__':
+            return self.sort_order
+        try:
+            return self.counts[self.values.index(key)]
+        except ValueError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, count):
+        if key == '__label__':
+            self.label = count
+        elif key == '__sortorder__':
+            self.sort_order = count
+        elif key in self.values:
+            self.counts[self.values.index(key)] = count
+        else:
+            if self.coded:
+                self.labels_en.append('')
+                self.labels_fr.append('')
+            self.values.append(key)
+            self.counts.append(count)
+
+    def __delitem__(self, key):
+        if key in SYSTEM_FACET_FIELDS or key not in self.values:
+            raise KeyError(key)
+        self.reorder([v for v in self.values if v != key])
+
+    def __iter__(self):
+        yield from self.values
+        yield from SYSTEM_FACET_FIELDS
+
+    def __len__(self):
+        return len(self.values) + len(SYSTEM_FACET_FIELDS)
+
+    def __contains__(self, key):
+        return key in SYSTEM_FACET_FIELDS or key in self.values
+
+    def __repr__(self):
+        return f"FacetResult({self.field_id}, {len(self.values)} values)"
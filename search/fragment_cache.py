@@ -0,0 +1,101 @@
+"""
+Cache of rendered template fragments of the search pages.
+
+The facet sidebar of a search page can have hundreds of entries, and it is rendered again for every page of the
+same results, where only the page number changes. With SEARCH_FRAGMENT_CACHE_ALIAS set, the search views add cache
+keys for the facet list and the result list to the page context, and the templates wrap those parts in
+{% cachefragment key %} (see search/templatetags/search_extras.py), which renders them once per key.
+
+  The facet list key covers the facet values, labels and counts, the selected filters, the search text, the language
+  and the page path.
+  The result list key covers the record IDs, the highlighting of the response, the search text, the sort order, the
+  page number, the language and the page path.
+
+A cached fragment is served to every request with the same key, so the templates and snippets inside it, including
+the search_item_snippet and solr_facet_snippet templates of the custom searches, may only use these context
+variables: docs, highlighting, facets, selected_facets, search_text, sort, currentpage, LANGUAGE_CODE and the
+variables that only depend on the search configuration, such as reversed_facets, facet_snippets and
+default_display_fields. Anything else that depends on the request, such as its query string, the CSRF token or the
+session, must stay outside of {% cachefragment %}.
+
+Both keys also include the search configuration generation and SEARCH_RESULT_CACHE_VERSION, and the result list key
+the index generation of the Solr core, which only changes on data loads when the result cache is enabled. Otherwise
+the rendered results may be up to SEARCH_FRAGMENT_CACHE_TIMEOUT seconds old after a data load.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_fragment_cache():
+    """
+    :return: the cache used for template fragments, or None if fragment caching is disabled or not configured
+    """
+    alias = getattr(settings, 'SEARCH_FRAGMENT_CACHE_ALIAS', '')
+    if not alias or alias not in settings.CACHES:
+        return None
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return None
+
+
+def fragment_key(name: str, *parts) -> str:
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    version = getattr(settings, 'SEARCH_RESULT_CACHE_VERSION', 1)
+    return f"search_fragment:{version}:{name}:{digest}"
+
+
+def facets_fragment_key(search_type: str, lang: str, config_generation, facets, selected_facets, search_text='',
+                        path=''):
+    """
+    :param facets: the facets of the page context, FacetResult objects or dictionaries of counts set by a plugin
+    :return: the cache key of the facet list of a page, or None if fragment caching is disabled
+    """
+    if get_fragment_cache() is None:
+        return None
+    facet_items = [(f, list(facet.items())) for f, facet in (facets.items() if facets else ())]
+    selected = sorted(selected_facets.items()) if selected_facets else []
+    return fragment_key('facets', search_type, lang, config_generation, facet_items, selected, search_text, path)
+
+
+def results_fragment_key(search_type: str, lang: str, config_generation, index_generation, path: str, docs: list,
+                         highlighting: dict, search_text='', sort='', page=None):
+    """
+    :return: the cache key of the result list of a page, or None if fragment caching is disabled
+    """
+    if get_fragment_cache() is None:
+        return None
+    doc_ids = [doc.get('id') for doc in docs]
+    highlight_digest = hashlib.sha1(repr(highlighting).encode('utf-8')).hexdigest()
+    return fragment_key('results', search_type, lang, config_generation, index_generation, path, doc_ids,
+                        highlight_digest, search_text, sort, page)
+
+
+def get_fragment(key: str):
+    """
+    :return: the rendered fragment, or None if it is not cached
+    """
+    cache = get_fragment_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception as x:
+        logger.warning(f"Unable to read the fragment cache: {x}")
+        return None
+
+
+def set_fragment(key: str, content: str):
+    cache = get_fragment_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(key, content, timeout=getattr(settings, 'SEARCH_FRAGMENT_CACHE_TIMEOUT', 300))
+    except Exception as x:
+        logger.warning(f"Unable to write to the fragment cache: {x}")
@@ -0,0 +1,103 @@
+"""
+HTTP validators and CDN surrogate keys for the search pages.
+
+When SEARCH_HTTP_CACHE_ENABLED is set, the search, record and more-like-this pages and the search API are sent with
+an ETag computed from the result cache key of their Solr query, which includes the normalized query and the index
+generation of the Solr core, see search/result_cache.py. A request with a matching If-None-Match header is answered
+with 304 Not Modified before Solr is queried. Last-Modified is the time of the last data load into the core.
+
+Each response also carries a surrogate key header naming its Solr core, so that a CDN can purge every cached page of
+a search at once. The data loading commands send the search_index_updated signal after they commit, and the
+default receiver posts a purge request for the key of the core to SEARCH_CDN_PURGE_URL, see search/signals.py.
+
+The ETag does not cover the templates or translations: increment SEARCH_RESULT_CACHE_VERSION when deploying changes
+to them.
+"""
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, quote_etag
+import hashlib
+import logging
+import requests
+from search.result_cache import get_index_generation, get_index_updated, get_result_cache, result_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+def surrogate_key(core_name: str) -> str:
+    return f"{getattr(settings, 'SEARCH_SURROGATE_KEY_PREFIX', 'search-core-')}{core_name}"
+
+
+def get_etag(variant: str, config_generation, core_name: str, solr_query: dict, request_handler='select',
+             plugin_version='', **kwargs):
+    """
+    :param variant: the kind of page and format the query is rendered to, which is not part of the Solr query
+    :param config_generation: generation of the search configuration the page was rendered with
+    :return: an ETag for a page rendered from a Solr query, or None if HTTP caching is disabled. The ETag is weak,
+    since the pages also contain content that does not depend on the query, such as the CSRF token.
+    """
+    # The ETag depends on the index generations kept in the result cache
+    cache = get_result_cache()
+    if cache is None or not getattr(settings, 'SEARCH_HTTP_CACHE_ENABLED', False):
+        return None
+    try:
+        generation = get_index_generation(core_name, cache)
+    except Exception as x:
+        logger.warning(f"Unable to read the index generation for Solr core {core_name}: {x}")
+        return None
+    key = result_cache_key(core_name, solr_query, request_handler, plugin_version, generation, **kwargs)
+    return 'W/' + quote_etag(hashlib.sha1(f"{variant}:{config_generation}:{key}".encode('utf-8')).hexdigest())
+
+
+def not_modified_response(request: HttpRequest, etag: str):
+    """
+    :return: a 304 response if the If-None-Match header of a GET or HEAD request matches the ETag, otherwise None
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return None
+    # Weak comparison, as required for If-None-Match
+    etags = [e.removeprefix('W/') for e in parse_etags(if_none_match)]
+    if '*' in etags or etag.removeprefix('W/') in etags:
+        return HttpResponseNotModified()
+    return None
+
+
+def add_cache_headers(response: HttpResponse, etag: str, core_name: str) -> HttpResponse:
+    """
+    Add the ETag, Last-Modified and surrogate key headers to a response
+    """
+    response.headers['ETag'] = etag
+    try:
+        updated = get_index_updated(core_name)
+    except Exception:
+        updated = None
+    if updated:
+        response.headers['Last-Modified'] = http_date(updated)
+    header = getattr(settings, 'SEARCH_SURROGATE_KEY_HEADER', 'Surrogate-Key')
+    if header:
+        response.headers[header] = surrogate_key(core_name)
+    return response
+
+
+def purge_surrogate_key(key: str) -> bool:
+    """
+    Ask the CDN to purge the cached pages with a surrogate key, by posting to SEARCH_CDN_PURGE_URL with '{key}'
+    replaced by the key
+    :return: True if the purge request succeeded
+    """
+    url = getattr(settings, 'SEARCH_CDN_PURGE_URL', '')
+    if not url:
+        return False
+    try:
+        response = requests.post(url.format(key=key), headers=getattr(settings, 'SEARCH_CDN_PURGE_HEADERS', {}),
+                                 timeout=getattr(settings, 'SEARCH_CDN_PURGE_TIMEOUT', 10))
+        response.raise_for_status()
+    except requests.RequestException as x:
+        logger.warning(f"Unable to purge the surrogate key {key}: {x}")
+        return False
+    logger.info(f"Purged the surrogate key {key}")
+    return True
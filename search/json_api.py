@@ -0,0 +1,55 @@
+"""
+JSON encoding for the search API.
+
+The responses of the search API (see search.views.SearchApiView) are written incrementally: the summary and facets
+are encoded first, then the documents one at a time into chunks of about JSON_API_CHUNK_SIZE bytes, so that a large
+page of results is never held in memory as one Python structure and one string. orjson is used when it is installed,
+otherwise the standard library encoder with compact separators.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_API_CHUNK_SIZE = 64 * 1024
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def dumps(obj) -> bytes:
+    """
+    Encode a value to compact UTF-8 JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return _encoder.encode(obj).encode('utf-8')
+
+
+def iter_json_object(members: dict, list_name: str, items, chunk_size: int = JSON_API_CHUNK_SIZE):
+    """
+    Encode a JSON object with the given members, followed by a list member whose items are encoded one at a time
+    :param list_name: name of the list member, which is the last member of the object
+    :param items: iterable of the values of the list
+    :return: a generator of chunks of the encoded object
+    """
+    buffer = bytearray(b'{')
+    for name, value in members.items():
+        buffer += dumps(name)
+        buffer += b':'
+        buffer += dumps(value)
+        buffer += b','
+    buffer += dumps(list_name)
+    buffer += b':['
+    separator = b''
+    for item in items:
+        buffer += separator
+        buffer += dumps(item)
+        separator = b','
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b']}'
+    yield bytes(buffer)
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand, CommandError
 from pathlib import Path
 import json
 from search.models import Code, Field, Search
+from search.registry import search_registry
 import logging
 
 
@@ -23,6 +24,7 @@ class Command(BaseCommand):
                             "delete codes not found in JSON, 'add_new': create missing codes from JSON" )
         parser.add_argument('--dry_run', action="store_true", help="Do a dry run withouth deleting from or adding to the database")
 
+    @search_registry.batch()
     def handle(self, *args, **options):
         org_file = Path(options['org_file'])
 
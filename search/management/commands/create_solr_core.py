@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 from search.models import Search, Field
+from search.registry import search_registry
 from SolrClient2 import SolrClient
 import logging
 
@@ -102,6 +103,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--search', help='Unique Search model identifier', type=str)
 
+    @search_registry.batch()
     def handle(self, *args, **options):
         try:
             search_id = options['search']
@@ -4,6 +4,7 @@ import glob
 from os import path, listdir, remove, rmdir
 from pathlib import Path
 from search.models import Search, Field, Code, ChronologicCode
+from search.registry import search_registry
 import logging
 
 
@@ -30,6 +31,7 @@ class Command(BaseCommand):
                 elif path.isdir(filename):
                     rmdir(filename)
 
+    @search_registry.batch()
     def handle(self, *args, **options):
 
         self.is_dry_run = options['dry_run']
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+import logging
+from search.models import Search, Field
+from search.registry import search_registry
+from search.snippet_fields import get_template_field_ids
+
+
+class Command(BaseCommand):
+    help = 'Find the fields shown by the search item snippet of a search, which are the only fields the search page ' \
+           'needs for each result, and optionally save them as the search results fields'
+
+    logger = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--search', type=str, help='The Search ID. If not given, all searches are scanned',
+                            required=False)
+        parser.add_argument('--save', required=False, action='store_true', default=False,
+                            help='Save the fields as the search results fields of the search')
+
+    @search_registry.batch()
+    def handle(self, *args, **options):
+
+        if options['search']:
+            searches = Search.objects.filter(search_id=options['search'])
+            if not searches.exists():
+                self.stderr.write(f"Search {options['search']} not found")
+                return
+        else:
+            searches = Search.objects.all().order_by('search_id')
+        for search in searches:
+            fields = {f.field_id: f for f in Field.objects.filter(search_id=search).order_by('id')}
+            results_fields = set()
+            for lang in ('en', 'fr'):
+                display_fields = [f for f in fields if fields[f].is_default_display and fields[f].solr_field_lang in [lang, 'bi']]
+                field_ids = get_template_field_ids(search.search_item_snippet, fields, display_fields)
+                if field_ids is None:
+                    results_fields = None
+                    break
+                results_fields |= field_ids
+            if results_fields is None:
+                self.stderr.write(f"Search {search.search_id}: unable to scan {search.search_item_snippet}")
+                continue
+            # Keep the field order of the search, the ID fields are always returned
+            id_fields = [f.strip() for f in search.id_fields.split(',')]
+            results_fields = ",".join(f for f in fields if f in results_fields and f not in id_fields)
+            self.stdout.write(f"Search {search.search_id}: {results_fields}")
+            if options['save']:
+                search.results_fields = results_fields
+                search.save()
@@ -2,6 +2,7 @@ import csv
 from django.core.management.base import BaseCommand
 from pathlib import Path
 from search.models import Search, Field
+from search.registry import search_registry
 
 import logging
 
@@ -20,6 +21,7 @@ class Command(BaseCommand):
                             help='Flag to overwrite previous Search settings that were loaded. '
                                  'By default the search is  updated, not overwritten')
 
+    @search_registry.batch()
     def handle(self, *args, **options):
 
         # Verify file exists, then load YAML
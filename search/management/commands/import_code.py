@@ -1,4 +1,5 @@
 from search.models import Field, Code
+from search.registry import search_registry
 from django.core.management.base import BaseCommand, CommandError
 import json
 import logging
@@ -15,6 +16,7 @@ class Command(BaseCommand):
         parser.add_argument('--search', type=str, help='Search Name', required=True)
         parser.add_argument('--field', type=str, help='Full Field DB Name (fid)', required=True)
 
+    @search_registry.batch()
     def handle(self, *args, **options):
 
         if not path.exists(options['code_file']):
@@ -1,4 +1,5 @@
 from search.models import Field, Code
+from search.registry import search_registry
 from django.core.management.base import BaseCommand, CommandError
 from os import path
 from termcolor import colored, cprint
@@ -16,6 +17,7 @@ class Command(BaseCommand):
         parser.add_argument('--dryrun', action='store_true', help="Do a dry run, do not make any changes")
         
 
+    @search_registry.batch()
     def handle(self, *args, **options):
 
         if not path.exists(options['codes']):
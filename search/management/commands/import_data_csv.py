@@ -12,7 +12,10 @@ import pkgutil
 import re
 from search.models import Search, Field, Code, Event
 import search.plugins
-from SolrClient2 import SolrClient
+from search.facet_stats import measure_facets
+from search.result_cache import bump_index_generation
+from search.signals import search_index_updated
+from search.solr_connections import get_solr_client
 from SolrClient2.exceptions import ConnectionError
 import traceback
 import csv
@@ -96,7 +99,7 @@ class Command(BaseCommand):
 
         try:
             # Retrieve the Search  and Field models from the database
-            solr = SolrClient(settings.SOLR_SERVER_URL)
+            solr = get_solr_client('update')
             try:
                 self.search_target = Search.objects.get(search_id=options['search'])
                 self.solr_core = self.search_target.solr_core_name
@@ -147,6 +150,8 @@ class Command(BaseCommand):
             if options['nothing_to_report']:
                 solr.delete_doc_by_query(self.solr_core, "format:NTR")
                 solr.commit(self.solr_core, softCommit=True)
+                bump_index_generation(self.solr_core)
+                search_index_updated.send(sender=self.__class__, core_name=self.solr_core)
                 self.logger.info("Purging NTR records")
             elif not options['append']:
                 solr.delete_doc_by_query(self.solr_core, "*:*")
@@ -483,6 +488,9 @@ class Command(BaseCommand):
                             bd_file.flush()
                     finally:
                         solr.commit(self.solr_core, softCommit=True, waitSearcher=True)
+                        bump_index_generation(self.solr_core)
+                        search_index_updated.send(sender=self.__class__, core_name=self.solr_core)
+                        measure_facets(self.search_target.search_id, solr)
                         sys.stdout.write(f"\nTotal rows processed: {total}, committed to Solr: {commit_count}")
 
         except Exception as x:
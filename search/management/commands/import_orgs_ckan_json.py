@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand, CommandError
 from pathlib import Path
 import json
 from search.models import Code, Field, Search
+from search.registry import search_registry
 import logging
 
 
@@ -15,6 +16,7 @@ class Command(BaseCommand):
         parser.add_argument('--field', type=str, help='field name', required=True)
         parser.add_argument('--search', type=str, help='search name', required=True)
 
+    @search_registry.batch()
     def handle(self, *args, **options):
         org_file = Path(options['org_file'])
         if org_file.is_file():
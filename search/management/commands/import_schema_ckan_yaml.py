@@ -2,6 +2,7 @@ from datetime import datetime, timezone
 from django.core.management.base import BaseCommand
 from pathlib import Path
 from search.models import Search, Field, Code
+from search.registry import search_registry
 from yaml import load, FullLoader
 try:
     from yaml import CLoader as Loader
@@ -216,6 +217,7 @@ class Command(BaseCommand):
         field.default_export_value = "str|-"
         field.save()
 
+    @search_registry.batch()
     def handle(self, *args, **options):
 
         # Verify file exists, then load YAML
@@ -1,5 +1,6 @@
 from distutils.dir_util import copy_tree
 from search.models import Search, Field, Code, ChronologicCode
+from search.registry import search_registry
 from django.core.management.base import BaseCommand, CommandError
 import json
 import logging
@@ -21,6 +22,7 @@ class Command(BaseCommand):
         parser.add_argument('--db_only', required=False, action='store_true',
                             help="Only import database definitions.")
 
+    @search_registry.batch()
     def handle(self, *args, **options):
 
         if not path.exists(options['import_dir']):
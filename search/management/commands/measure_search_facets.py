@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+import logging
+from search.facet_stats import measure_facets
+from search.models import Search
+
+
+class Command(BaseCommand):
+    help = 'Measure the cardinality and Solr cost of the facet fields of a search. This is done automatically after ' \
+           'each data import'
+
+    logger = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--search', type=str, help='The Search ID. If not given, all searches are measured',
+                            required=False)
+
+    def handle(self, *args, **options):
+
+        if options['search']:
+            search_ids = [options['search']]
+        else:
+            search_ids = list(Search.objects.values_list('search_id', flat=True).order_by('search_id'))
+        for search_id in search_ids:
+            results = measure_facets(search_id)
+            self.stdout.write(f"Search {search_id}: {len(results)} facets measured")
+            for field_id, (cardinality, cost, method) in results.items():
+                self.stdout.write(f"  {field_id}: {cardinality} values, {cost} ms with facet.method={method}")
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+import logging
+from search.code_tables import SearchCodeTables, deep_sizeof
+from search.registry import SearchConfigSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Report the memory used by the code labels of each search, as nested dictionaries and as compact code tables'
+
+    logger = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--search', type=str, help='A unique code identifier for the Search', required=False)
+
+    def handle(self, *args, **options):
+
+        config = SearchConfigSnapshot(0).load()
+        search_ids = [options['search']] if options['search'] else sorted(config.searches)
+        total_before = 0
+        total_after = 0
+        self.stdout.write(f"{'Search':<30} {'Codes':>8} {'Before (KB)':>12} {'After (KB)':>12}")
+        for search_id in search_ids:
+            if search_id not in config.searches:
+                self.stderr.write(f"Search {search_id} not found")
+                continue
+            field_codes = config.load_codes(search_id)
+
+            # The nested dictionaries of full label strings used before the code tables, with strings that are not
+            # shared with the database rows
+            codes_en = {}
+            codes_fr = {}
+            for field_id, codes in field_codes.items():
+                codes_en[field_id] = {code_id: label_en for code_id, (label_en, label_fr) in codes.items()}
+                codes_fr[field_id] = {code_id: label_fr for code_id, (label_en, label_fr) in codes.items()}
+            before = deep_sizeof((codes_en, codes_fr))
+            after = deep_sizeof(SearchCodeTables(field_codes))
+
+            code_count = sum(len(codes) for codes in field_codes.values())
+            self.stdout.write(f"{search_id:<30} {code_count:>8} {before / 1024:>12.1f} {after / 1024:>12.1f}")
+            total_before += before
+            total_after += after
+        self.stdout.write(f"{'Total':<30} {'':>8} {total_before / 1024:>12.1f} {total_after / 1024:>12.1f}")
@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+import importlib.util
+import logging
+import time
+from search.models import Search, Field
+from search.query import QuerySkeleton, create_solr_query, create_solr_mlt_query
+from search.query_parser import parse_query_text
+from search.registry import SearchConfigSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Compare the time needed to build the Solr queries of a search with and without the precomputed query ' \
+           'skeletons, and the time needed to parse the search text with the query text parser and with NLTK'
+
+    logger = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--search', type=str, help='A unique code identifier for the Search. If not given, a '
+                                                       'generated search is used', required=False)
+        parser.add_argument('--fields', type=int, default=150, help='Number of fields of the generated search')
+        parser.add_argument('--iterations', type=int, default=2000, help='Number of queries built for each test')
+        parser.add_argument('--lang', type=str, default='en', choices=['en', 'fr'])
+
+    @staticmethod
+    def generate_search(field_count: int):
+        """
+        Create, without saving them, a search and fields similar to the proactive disclosure searches
+        """
+        search = Search(search_id='benchmark', results_sort_order_en='score desc', results_sort_order_fr='score desc',
+                        mlt_items=10)
+        field_types = ['string', 'search_text_en', 'search_text_fr', 'pint', 'pdate', 'text_general']
+        fields = {}
+        for i in range(field_count):
+            lang = ['en', 'fr', 'bi'][i % 3]
+            field_id = f"field_{i}" if lang == 'bi' else f"field_{i}_{lang}"
+            fields[field_id] = Field(field_id=field_id, search_id=search, solr_field_lang=lang,
+                                     solr_field_type=field_types[i % len(field_types)],
+                                     solr_field_is_coded=i % 4 == 0, is_search_facet=i % 10 == 0,
+                                     solr_extra_fields=f"{field_id}_text_en,{field_id}_text_fr" if i % 5 == 0 else '',
+                                     solr_field_export=f"{field_id}_export" if i % 7 == 0 else '',
+                                     solr_facet_sort='count', solr_facet_limit=100)
+        return search, fields
+
+    def time_queries(self, build_query, iterations: int) -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            build_query()
+        return (time.perf_counter() - start) / iterations * 1000000
+
+    @staticmethod
+    def nltk_query_text(search_text: str, lang: str) -> str:
+        """
+        The search text parsing done before search.query_parser: a new NLTK tokenizer per query, then the French
+        operators replaced in the joined text
+        """
+        from nltk.tokenize.regexp import RegexpTokenizer
+        terms = RegexpTokenizer(r'[^"\s]\S*|".+?"', gaps=False).tokenize(search_text)
+        q = ' '.join(terms) if terms else '*'
+        if lang == 'fr':
+            q = q.replace(' OU ', ' OR ').replace(" ET ", " AND ").replace(' PAS ', ' NOT ').replace("(PAS ", "(NOT ")
+            if q.startswith('PAS '):
+                q = "NOT " + q[4:]
+        return q
+
+    def time_parsers(self, iterations: int):
+        search_texts = ['travel expenses', '"hospitality expenses" OU voyage ET PAS hôtel',
+                        'contract  value:[10000 TO *] (PAS "air canada")']
+        if importlib.util.find_spec('nltk') is None:
+            self.stdout.write("NLTK is not installed, the query text parser is not compared")
+            return
+        for lang in ('en', 'fr'):
+            without = self.time_queries(lambda: [self.nltk_query_text(t, lang) for t in search_texts], iterations)
+            with_parser = self.time_queries(lambda: [parse_query_text(t, lang) for t in search_texts], iterations)
+            self.stdout.write(f"{'text-' + lang:<10} {without:>14.1f} {with_parser:>14.1f} {without / with_parser:>9.1f}x")
+
+    def handle(self, *args, **options):
+        lang = options['lang']
+        if options['search']:
+            config = SearchConfigSnapshot(0).load()
+            if options['search'] not in config.searches:
+                self.stderr.write(f"Search {options['search']} not found")
+                return
+            search = config.searches[options['search']]
+            fields = config.fields[options['search']]
+            facets = config.facets_fr[search.search_id] if lang == 'fr' else config.facets_en[search.search_id]
+        else:
+            search, fields = self.generate_search(options['fields'])
+            facets = [f for f in fields if fields[f].is_search_facet]
+
+        request = RequestFactory().get('/', {'search_text': 'travel expenses', 'sort': 'score desc'})
+        request.LANGUAGE_CODE = lang
+        skeletons = {mode: QuerySkeleton(fields, lang, mode) for mode in QuerySkeleton.MODES}
+        tests = {
+            'search': lambda skeleton: create_solr_query(request, search, fields, {}, facets, 0, 10, '',
+                                                         highlighting=True, skeleton=skeleton),
+            'record': lambda skeleton: create_solr_query(request, search, fields, {}, facets, 0, 25, 'id1',
+                                                         skeleton=skeleton),
+            'export': lambda skeleton: create_solr_query(request, search, fields, {}, facets, 1, 0, '', export=True,
+                                                         skeleton=skeleton),
+            'mlt': lambda skeleton: create_solr_mlt_query(request, search, fields, 0, 'id1', skeleton=skeleton),
+        }
+
+        self.stdout.write(f"Search {search.search_id}: {len(fields)} fields, {len(facets)} facets, "
+                          f"{options['iterations']} queries per test")
+        self.stdout.write(f"{'Mode':<10} {'Without (µs)':>14} {'With (µs)':>14} {'Speedup':>10}")
+        for mode, build_query in tests.items():
+            without = self.time_queries(lambda: build_query(None), options['iterations'])
+            with_skeleton = self.time_queries(lambda: build_query(skeletons[mode]), options['iterations'])
+            self.stdout.write(f"{mode:<10} {without:>14.1f} {with_skeleton:>14.1f} {without / with_skeleton:>9.1f}x")
+        self.time_parsers(options['iterations'])
@@ -1,8 +1,10 @@
 import sys
 from django.core.management.base import BaseCommand
-from django.conf import settings
 from search.models import Search, Field, Code
-from SolrClient2 import SolrClient
+from search.facet_stats import measure_facets
+from search.result_cache import bump_index_generation
+from search.signals import search_index_updated
+from search.solr_connections import get_solr_client
 from SolrClient2.exceptions import ConnectionError
 import csv
 import logging
@@ -28,7 +30,7 @@ class Command(BaseCommand):
 
         try:
             # Retrieve the Search  and Field models from the database
-            solr = SolrClient(settings.SOLR_SERVER_URL)
+            solr = get_solr_client('update')
             self.search_target = Search.objects.get(search_id=options['search'])
             self.solr_core = self.search_target.solr_core_name
 
@@ -56,6 +58,9 @@ class Command(BaseCommand):
             # If there were changes, then commit them
             if self.indexed_count > 0:
                 solr.commit(self.solr_core, softCommit=True)
+                bump_index_generation(self.solr_core)
+                search_index_updated.send(sender=self.__class__, core_name=self.solr_core)
+                measure_facets(self.search_target.search_id, solr)
             self.logger.info(f"\nTotal rows processed: {self.indexed_count}")
 
         except Exception as x:
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+import logging
+from search.warmup import warm_search_cache
+
+
+class Command(BaseCommand):
+    help = 'Load the search configuration, plugins and templates, and optionally ping each Solr core'
+
+    logger = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ping', required=False, action='store_true', default=False,
+                            help='Send one query to each Solr core used by a search')
+        parser.add_argument('--codes', required=False, action='store_true', default=False,
+                            help='Load the code tables of every search')
+        parser.add_argument('--skip_templates', required=False, action='store_true', default=False,
+                            help='Do not precompile the search templates and snippets')
+
+    def handle(self, *args, **options):
+
+        summary = warm_search_cache(templates=not options['skip_templates'], ping=options['ping'],
+                                    codes=options['codes'])
+        self.stdout.write(f"Search configuration version {summary['config_version']}: "
+                          f"{summary['searches']} searches, {summary['codes']} codes loaded, {summary['plugins']} plugins, "
+                          f"{summary['templates']} templates compiled")
+        for core_name, ok in summary['solr_cores'].items():
+            self.stdout.write(f"  {core_name}: {'OK' if ok else 'FAILED'}")
@@ -0,0 +1,36 @@
+"""
+Process-local counters for events that are too frequent to log every time they happen.
+
+Each counter is keyed by a metric name and a tuple of labels, for example the search and field of an unknown facet
+value. The counts are kept per worker process and can be read with get_counts().
+"""
+
+from collections import Counter
+import threading
+
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def increment(name: str, *labels) -> int:
+    """
+    Increment a counter
+    :return: the new count, 1 the first time the name and labels are counted in this process
+    """
+    key = (name, labels)
+    with _lock:
+        _counters[key] += 1
+        return _counters[key]
+
+
+def get_counts(name: str) -> dict:
+    """
+    :return: the counts of a metric keyed by their labels
+    """
+    with _lock:
+        return {labels: count for (metric, labels), count in _counters.items() if metric == name}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
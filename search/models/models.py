@@ -92,10 +92,41 @@ class Search(models.Model):
                                       help_text="Indicate if the this search will be using Solr's 'More Like This' functionality")
     mlt_items = models.IntegerField(blank=True, default=10, verbose_name="No. Items returned for More-Like-This",
                                     help_text="Number of itemsto show on the More-Like-This search results page. Default is 10")
+    solr_min_exact_count = models.IntegerField(blank=True, null=True, verbose_name="Minimum Exact Hit Count",
+                                               validators=[MinValueValidator(1)],
+                                               help_text="Optional. Solr counts the hits exactly up to this number "
+                                                         "(minExactCount) and the search page shows an approximate total "
+                                                         "above it. Leave blank to always count exactly")
+    solr_time_allowed = models.IntegerField(blank=True, null=True, verbose_name="Solr Time Budget (ms)",
+                                            validators=[MinValueValidator(1)],
+                                            help_text="Optional. Solr stops searching after this many milliseconds "
+                                                      "(timeAllowed) and the search page shows the results found so "
+                                                      "far with a notice. Solr cannot combine it with a cursor, so it "
+                                                      "is not applied to queries paged with a cursor: the API and, "
+                                                      "with SEARCH_CURSOR_PAGING, the search pages. Leave blank for no "
+                                                      "limit")
+    solr_cpu_allowed = models.IntegerField(blank=True, null=True, verbose_name="Solr CPU Budget (ms)",
+                                           validators=[MinValueValidator(1)],
+                                           help_text="Optional. Solr stops searching after using this many "
+                                                     "milliseconds of CPU time (cpuAllowed, Solr 9.7 or later). Like "
+                                                     "the time budget, it is not applied to queries paged with a "
+                                                     "cursor. Leave blank for no limit")
+    results_fields = models.CharField(blank=True, default="", max_length=1024, verbose_name="Search Results Fields",
+                                      help_text="Comma separated list of the fields returned for each result on the search "
+                                                "page. Leave blank to return every field. The derive_search_results_fields "
+                                                "command finds the fields used by the search item snippet. Add any field "
+                                                "used by the custom search plugin")
     json_response = models.BooleanField(blank=False, default=False, verbose_name="Enable JSON format response",
                                         help_text="Allows JSON style responses suitable for REST API")
     raw_solr_response = models.BooleanField(blank=False, default=False, verbose_name="Enable raw Solr format response",
                                             help_text="Allows returning the raw Solr engine responses suitable for REST API")
+    solr_facet_threads = models.IntegerField(blank=True, default=0, verbose_name="Facet Threads",
+                                             validators=[MinValueValidator(0), MaxValueValidator(16)],
+                                             help_text="Number of threads Solr uses to calculate the facets of a query "
+                                                       "(facet.threads). Default is 0, no additional threads")
+    solr_json_facets = models.BooleanField(blank=False, default=False, verbose_name="Use the JSON Facet API",
+                                           help_text="Request all the facets with the Solr JSON Facet API. Required for "
+                                                     "date range facets")
 
     def __str__(self):
         return '%s (%s)' % (self.label_en, self.search_id)
@@ -160,8 +191,14 @@ class Search(models.Model):
         self.alt_formats = data_dict["alt_formats"]
         self.mlt_enabled = data_dict["mlt_enabled"]
         self.mlt_items = data_dict["mlt_items"]
+        self.results_fields = data_dict.get("results_fields", "")
+        self.solr_min_exact_count = data_dict.get("solr_min_exact_count")
+        self.solr_time_allowed = data_dict.get("solr_time_allowed")
+        self.solr_cpu_allowed = data_dict.get("solr_cpu_allowed")
         self.json_response = data_dict["json_response"]
         self.raw_solr_response = data_dict["raw_solr_response"]
+        self.solr_facet_threads = data_dict.get("solr_facet_threads", 0)
+        self.solr_json_facets = data_dict.get("solr_json_facets", False)
 
 
 class Field(models.Model):
@@ -184,6 +221,17 @@ class Field(models.Model):
         ('fr', 'Français'),
         ('bi', 'Bilingual/Bilangue')
     ]
+    SOLR_HIGHLIGHT_MODES = [
+        ('auto', 'Automatic - when shown in the search results'),
+        ('on', 'Always'),
+        ('off', 'Never')
+    ]
+    SOLR_FACET_METHODS = [
+        ('auto', 'Automatic, based on the measured cardinality'),
+        ('enum', 'Enum - few distinct values'),
+        ('fc', 'Field Cache - many distinct values'),
+        ('fcs', 'Per-segment Field Cache - many distinct values, single-valued fields')
+    ]
 
     id = models.AutoField(primary_key=True)
     fid = models.CharField(max_length=1024, editable=False, unique=True)
@@ -212,6 +260,21 @@ class Field(models.Model):
     solr_field_multivalue_delimeter = models.CharField(blank=True, default=",", max_length=1, verbose_name="Multivalue Field Delimeter",
                                                        help_text="Delimeter character for use with multi-value fields")
     solr_field_is_currency = models.BooleanField(blank=False, default=False, verbose_name="Is a monetary field")
+    solr_highlight = models.CharField(blank=False, max_length=4, choices=SOLR_HIGHLIGHT_MODES, default='auto',
+                                      verbose_name="Highlight Search Terms",
+                                      help_text="Highlight the search terms in text fields. 'auto' only highlights the "
+                                                "field when the search item snippet shows it")
+    solr_hl_snippets = models.IntegerField(blank=True, null=True, verbose_name="Highlight Snippets",
+                                           validators=[MinValueValidator(1), MaxValueValidator(50)],
+                                           help_text="Number of highlighted snippets (hl.snippets). Default is 1, or 10 for multi-valued fields")
+    solr_hl_fragsize = models.IntegerField(blank=True, null=True, verbose_name="Highlight Fragment Size",
+                                           validators=[MinValueValidator(0)],
+                                           help_text="Approximate size in characters of a highlighted snippet (hl.fragsize). "
+                                                     "0 highlights the whole value. Default is the Solr default")
+    solr_hl_max_analyzed_chars = models.IntegerField(blank=True, null=True, verbose_name="Highlight Maximum Analyzed Characters",
+                                                     validators=[MinValueValidator(1)],
+                                                     help_text="Only look for search terms in this many characters of the "
+                                                               "field (hl.maxAnalyzedChars). Default is the Solr default")
     is_search_facet = models.BooleanField(blank=False, default=False, help_text="Is a search facet field, should never have blank values",
                                           verbose_name="Search Facet field")
     solr_facet_sort = models.CharField(blank=True, max_length=5,
@@ -226,6 +289,23 @@ class Field(models.Model):
     solr_facet_display_reversed = models.BooleanField(blank=False, default=False, verbose_name="Display Facet in Reversed Orderd")
     solr_facet_display_order = models.IntegerField(blank=True, default=0, verbose_name="Facet Display Order",
                                                    help_text="Ordered place in which to display the facets on the page, if this field is a facet")
+    solr_facet_method = models.CharField(blank=False, max_length=4, choices=SOLR_FACET_METHODS, default='enum',
+                                         verbose_name="Facet Method",
+                                         help_text="Solr facet method (facet.method) used when the field is a facet. "
+                                                   "'auto' chooses the method from the cardinality measured after each data import")
+    solr_facet_range_gap = models.CharField(blank=True, default="", max_length=32, verbose_name="Date Range Facet Gap",
+                                            help_text="For date fields, the size of the facet buckets as a Solr date math "
+                                                      "gap, for example +1YEAR or +1MONTH. Only used with the JSON Facet API")
+    solr_facet_range_start = models.CharField(blank=True, default="NOW/YEAR-10YEARS", max_length=64,
+                                              verbose_name="Date Range Facet Start",
+                                              help_text="Start of the first date range facet bucket, as a Solr date or date "
+                                                        "math expression rounded to the unit of the gap. Older records "
+                                                        "are counted together in a single facet value, such as <2015")
+    solr_facet_cardinality = models.IntegerField(blank=True, null=True, editable=False, verbose_name="Measured Facet Cardinality",
+                                                 help_text="Number of distinct values of the facet, measured after the last data import")
+    solr_facet_cost_ms = models.IntegerField(blank=True, null=True, editable=False, verbose_name="Measured Facet Cost (ms)",
+                                             help_text="Solr query time of the facet with its current facet method, measured after the last data import")
+    solr_facet_measured_on = models.DateTimeField(blank=True, null=True, editable=False, verbose_name="Facet Measured On")
     alt_format = models.CharField(blank=True, default='', max_length=30, verbose_name="Alternate Record Type",
                                   help_text="This field is part of an alternate format (e.g. Nothing To Report). Use 'ALL' if the field appears in all formats")
     is_default_display = models.BooleanField(blank=False, default=False, verbose_name="Default search item field",
@@ -270,12 +350,19 @@ class Field(models.Model):
         self.solr_field_multivalued = data_dict["solr_field_multivalued"]
         self.solr_field_multivalue_delimeter = data_dict["solr_field_multivalue_delimeter"]
         self.solr_field_is_currency = data_dict["solr_field_is_currency"]
+        self.solr_highlight = data_dict.get("solr_highlight", "auto")
+        self.solr_hl_snippets = data_dict.get("solr_hl_snippets")
+        self.solr_hl_fragsize = data_dict.get("solr_hl_fragsize")
+        self.solr_hl_max_analyzed_chars = data_dict.get("solr_hl_max_analyzed_chars")
         self.is_search_facet = data_dict["is_search_facet"]
         self.solr_facet_sort = data_dict["solr_facet_sort"]
         self.solr_facet_limit = data_dict["solr_facet_limit"]
         self.solr_facet_snippet = data_dict["solr_facet_snippet"]
         self.solr_facet_display_reversed = data_dict["solr_facet_display_reversed"]
         self.solr_facet_display_order = data_dict["solr_facet_display_order"]
+        self.solr_facet_method = data_dict.get("solr_facet_method", "enum")
+        self.solr_facet_range_gap = data_dict.get("solr_facet_range_gap", "")
+        self.solr_facet_range_start = data_dict.get("solr_facet_range_start", "NOW/YEAR-10YEARS")
         self.alt_format = data_dict["alt_format"]
         self.is_default_display = data_dict["is_default_display"]
         self.default_export_value = data_dict["default_export_value"]
@@ -3,6 +3,13 @@ from search.models import Search, Field, Code
 from SolrClient2 import SolrResponse
 
 
+# The pre and post Solr query hooks may also be implemented as coroutines for the async views, by adding functions
+# with the same arguments prefixed with async_, for example:
+#
+# async def async_pre_search_solr_query(context: dict, solr_query: dict, request: HttpRequest, search: Search, ...):
+#     return context, solr_query
+
+
 def plugin_api_version():
     return 1.1
 
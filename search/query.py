@@ -1,10 +1,15 @@
 import bleach
+from collections.abc import Mapping
+from django.conf import settings
 from django.http import HttpRequest
+import hashlib
+import json
 from math import ceil
-from nltk.tokenize.regexp import RegexpTokenizer
 import os
 import re
 from search.models import Search, Field
+from search.query_parser import get_search_terms, parse_query_text
+from types import MappingProxyType
 from urllib import parse
 
 
@@ -47,7 +52,11 @@ def uuid_pattern(version):
     )
 
 
-def calc_pagination_range(num_found: int, pagesize, current_page, delta=2):
+def calc_pagination_range(num_found: int, pagesize, current_page, delta=2, exact=True):
+    """
+    :param exact: False if num_found is a lower bound (see Solr minExactCount). The last page is then unknown, so it
+    is left out and the range ends with a gap instead.
+    """
     # @TODO This is not very efficient - could be refactored
     pages = int(ceil(num_found / pagesize))
     if current_page > pages:
@@ -60,7 +69,7 @@ def calc_pagination_range(num_found: int, pagesize, current_page, delta=2):
     spaced_pagination = []
 
     for p in range(1, pages + 1):
-        if (p == 1) or (p == pages) or (left <= p < right):
+        if (p == 1) or (p == pages and exact) or (left <= p < right):
             pagination.append(p)
 
     last = None
@@ -72,15 +81,18 @@ def calc_pagination_range(num_found: int, pagesize, current_page, delta=2):
                 spaced_pagination.append(0)
         spaced_pagination.append(p)
         last = p
+    if not exact:
+        spaced_pagination.append(0)
 
     return spaced_pagination
 
 
-def calc_starting_row(page_num: str, rows_per_page=10):
+def calc_starting_row(page_num: str, rows_per_page=10, max_start_row=None):
     """
     Calculate a starting row for the Solr search results. We only retrieve one page at a time
     :param page_num: Current page number
     :param rows_per_page: number of rows per page
+    :param max_start_row: if set, the page number is lowered so that the starting row is not past this row
     :return: starting row
     """
     page = 1
@@ -92,23 +104,11 @@ def calc_starting_row(page_num: str, rows_per_page=10):
         page = 1
     elif page > 100000:  # @magic_number: arbitrary upper range
         page = 100000
+    if max_start_row is not None and rows_per_page * (page - 1) > max_start_row:
+        page = max(max_start_row // rows_per_page + 1, 1)
     return rows_per_page * (page - 1), page
 
 
-def get_search_terms(search_text: str):
-    # Get any search terms
-
-    tr = RegexpTokenizer(r'[^"\s]\S*|".+?"', gaps=False)
-
-    # Respect quoted strings
-    search_terms = tr.tokenize(search_text)
-    if len(search_terms) == 0:
-        solr_search_terms = "*"
-    else:
-        solr_search_terms = ' '.join(search_terms)
-    return solr_search_terms
-
-
 def get_query_fields(query_lang: str, fields: dict):
     qf = ['id']
     for f in fields:
@@ -129,18 +129,621 @@ def get_query_fields(query_lang: str, fields: dict):
     return qf
 
 
-def get_mlt_fields(request: HttpRequest, fields: dict):
+def get_mlt_fields(query_lang: str, fields: dict):
     qf = ['id']
     for f in fields:
-        if fields[f].solr_field_lang in [request.LANGUAGE_CODE, 'bi']:
+        if fields[f].solr_field_lang in [query_lang, 'bi']:
             if fields[f].solr_field_type in ['search_text_en', 'search_text_en', 'string']:
                 qf.append(f)
     return qf
 
 
+def get_highlight_fields(query_lang: str, fields: dict, rendered_fields=None):
+    """
+    Get the fields to highlight: text fields in the query language, unless highlighting is turned off for the field,
+    plus their language copyfields.
+    :param rendered_fields: IDs of the fields shown by the search item snippet. If given, fields with automatic
+    highlighting are only highlighted when they are shown. If None, all the text fields are highlighted.
+    """
+    hl_fields = []
+    hl_field_types = ["search_text_en", "string", 'text_general']
+    if query_lang == 'fr':
+        hl_field_types = ["search_text_fr", "string", 'text_general']
+    for field in fields:
+        if fields[field].solr_field_type in hl_field_types:
+            hl_mode = getattr(fields[field], 'solr_highlight', 'auto')
+            if hl_mode == 'off' or (hl_mode == 'auto' and rendered_fields is not None and field not in rendered_fields):
+                continue
+            hl_fields.append(field)
+            if fields[field].solr_extra_fields:
+                for extra_field in fields[field].solr_extra_fields.split(","):
+                    if extra_field.endswith("_en") or extra_field.endswith("_fr"):
+                        hl_fields.append(extra_field.strip())
+    return hl_fields
+
+
+def get_highlight_params(hl_fields: list, fields: dict):
+    """
+    Get the per-field highlighting parameters of the highlighted fields. Copyfields use the settings of their field.
+    Single-valued fields only need one snippet since only the first snippet replaces the field value.
+    """
+    params = {}
+    for field in fields.values():
+        for hl_field in [field.field_id] + [f.strip() for f in field.solr_extra_fields.split(",") if f.strip()]:
+            if hl_field not in hl_fields:
+                continue
+            snippets = getattr(field, 'solr_hl_snippets', None)
+            if not snippets:
+                snippets = 10 if field.solr_field_multivalued else 1
+            params['f.{0}.hl.snippets'.format(hl_field)] = snippets
+            if getattr(field, 'solr_hl_fragsize', None) is not None:
+                params['f.{0}.hl.fragsize'.format(hl_field)] = field.solr_hl_fragsize
+            if getattr(field, 'solr_hl_max_analyzed_chars', None):
+                params['f.{0}.hl.maxAnalyzedChars'.format(hl_field)] = field.solr_hl_max_analyzed_chars
+    return params
+
+
+def get_export_fields(query_lang: str, fields: dict):
+    ef = ['id']
+    for f in fields:
+        if fields[f].solr_field_lang in [query_lang, 'bi']:
+            if fields[f].solr_field_type in ['string', 'pint', 'pfloat', 'pdate']:
+                if not fields[f].solr_field_is_coded and f != "unique_identifier":
+                    ef.append(f)
+                if fields[f].solr_field_is_coded and f[-2:] not in ['_en', '_fr'] and f not in ['month', 'year']:
+                    ef.append("{0}_{1}".format(f, query_lang))
+            elif fields[f].solr_field_type in ["search_text_en", "search_text_fr", 'text_general', 'text_keyword']:
+                if fields[f].solr_field_export:
+                    for extra_field in fields[f].solr_field_export.split(","):
+                        ef.append(extra_field.strip())
+    return ef
+
+
+def get_results_fields(search: Search) -> list:
+    """
+    Get the fields returned for each search result: the declared result fields of the search and its ID fields, or
+    an empty list if the search returns every field
+    """
+    if not getattr(search, 'results_fields', ''):
+        return []
+    names = search.results_fields.split(',') + search.id_fields.split(',')
+    return [name.strip() for name in names if name.strip()]
+
+
+def get_facet_method(field: Field) -> str:
+    """
+    Get the Solr facet method of a facet field. In 'auto' mode the method is chosen from the number of distinct values
+    measured after the last data import (see search.facet_stats): 'enum' uses one cached filter per value and is
+    fastest for a few values, while the field cache methods scale to many values. Unmeasured fields use 'enum', as
+    did every facet before the method could be chosen.
+    """
+    method = getattr(field, 'solr_facet_method', 'enum') or 'enum'
+    if method != 'auto':
+        return method
+    cardinality = field.solr_facet_cardinality
+    if cardinality is None or cardinality <= getattr(settings, 'SEARCH_FACET_ENUM_MAX_CARDINALITY', 500):
+        return 'enum'
+    # The per-segment method only supports single-valued string fields
+    if field.solr_field_type == 'string' and not field.solr_field_multivalued:
+        return 'fcs'
+    return 'fc'
+
+
+def get_facet_params(facet: str, field: Field):
+    return {
+        'f.{0}.facet.sort'.format(facet): field.solr_facet_sort,
+        'f.{0}.facet.limit'.format(facet): field.solr_facet_limit,
+        'f.{0}.facet.method'.format(facet): get_facet_method(field),
+    }
+
+
+# JSON Facet API equivalents of the facet.method values
+JSON_FACET_METHODS = {'enum': 'enum', 'fc': 'uif', 'fcs': 'dv'}
+
+# Number of characters of a range bucket date kept as the facet value, by the unit of the range gap
+RANGE_FACET_VALUE_LENGTHS = (('YEAR', 4), ('MONTH', 7), ('DAY', 10))
+
+# Facet values of range facets: a year, year-month, date or full timestamp, or '<' and the start of the first bucket
+# for the records before the range
+RANGE_FACET_VALUE = re.compile(r'^<?\d{4}(-\d{2}(-\d{2}(T\d{2}:\d{2}:\d{2}Z)?)?)?$')
+
+
+def is_range_facet(field: Field) -> bool:
+    return field.solr_field_type == 'pdate' and bool(getattr(field, 'solr_facet_range_gap', ''))
+
+
+def get_json_facet(facet: str, field: Field) -> dict:
+    """
+    Get the JSON Facet API definition of a facet: range buckets for date fields with a range gap, otherwise a terms
+    facet with the same sort order, limit and method as the facet.field parameters
+    """
+    if is_range_facet(field):
+        return {
+            'type': 'range',
+            'field': facet,
+            'start': field.solr_facet_range_start or 'NOW/YEAR-10YEARS',
+            'end': 'NOW',
+            'gap': field.solr_facet_range_gap,
+            # Also count the records before the start of the range, which would otherwise not be shown in any bucket
+            'other': 'before',
+        }
+    return {
+        'type': 'terms',
+        'field': facet,
+        'limit': field.solr_facet_limit,
+        'mincount': 1,
+        'sort': 'count desc' if field.solr_facet_sort == 'count' else 'index asc',
+        'method': JSON_FACET_METHODS.get(get_facet_method(field), 'smart'),
+    }
+
+
+def get_range_facet_value(bucket_value: str, gap: str) -> str:
+    """
+    Shorten the start date of a range bucket to the unit of the gap, for example 2019 for a +1YEAR gap
+    """
+    for unit, length in RANGE_FACET_VALUE_LENGTHS:
+        if unit in gap.upper():
+            return bucket_value[:length]
+    return bucket_value
+
+
+def get_range_filter(facet_value: str, gap: str):
+    """
+    Get the Solr range of the bucket of a range facet value, or None if the value is not a date
+    """
+    if not RANGE_FACET_VALUE.match(facet_value):
+        return None
+    if facet_value.startswith('<'):
+        facet_value = facet_value[1:]
+        return '[* TO {0}}}'.format(facet_value + '0000-01-01T00:00:00Z'[len(facet_value):])
+    start = facet_value + '0000-01-01T00:00:00Z'[len(facet_value):]
+    return '[{0} TO {0}{1}}}'.format(start, gap)
+
+
+def add_legacy_facet_counts(solr_data: dict, solr_query: dict, fields: dict):
+    """
+    Add the buckets of a JSON Facet API response to the response data as facet_counts, in the same form as
+    facet.field results, so that SolrResponse.get_facets(), the custom plugins and the templates are unchanged.
+    Empty range buckets are left out, like facet values below facet.mincount. The records before the start of a
+    range are counted first, with '<' and the value of the first bucket, for example <2015.
+    """
+    if 'json.facet' not in solr_query or 'facet_counts' in solr_data or not isinstance(solr_data.get('facets'), dict):
+        return
+    facet_fields = {}
+    # Keep the order of the facets in the query, which is the display order
+    for facet in json.loads(solr_query['json.facet']):
+        field = fields[facet]
+        result = solr_data['facets'].get(facet)
+        counts = []
+        if isinstance(result, dict):
+            buckets = result.get('buckets', [])
+            before = result.get('before', {}).get('count', 0) if is_range_facet(field) else 0
+            if before > 0 and buckets:
+                counts.extend(('<' + get_range_facet_value(buckets[0]['val'], field.solr_facet_range_gap), before))
+            for bucket in buckets:
+                if bucket['count'] < 1:
+                    continue
+                value = bucket['val']
+                if is_range_facet(field):
+                    value = get_range_facet_value(value, field.solr_facet_range_gap)
+                elif isinstance(value, bool):
+                    value = 'true' if value else 'false'
+                counts.extend((str(value), bucket['count']))
+        facet_fields[facet] = counts
+    solr_data['facet_counts'] = {'facet_queries': {}, 'facet_fields': facet_fields, 'facet_ranges': {},
+                                 'facet_intervals': {}, 'facet_heatmaps': {}}
+
+
+class QuerySkeleton:
+    """
+    The parts of a Solr query that only depend on the Field models of the search, the language and the type of
+    query: 'search', 'record', 'export' or 'mlt'. A skeleton is built once per configuration snapshot (see
+    SearchConfigSnapshot.get_query_skeleton()) and shared by all requests, so only copies of its values are put in
+    a query.
+    """
+
+    __slots__ = ('lang', 'mode', 'qf', 'fl', 'results_fl', 'hl_fl', 'hl_params', 'mlt_fl', 'facet_params', 'json_facets')
+
+    MODES = ('search', 'record', 'export', 'mlt')
+
+    def __init__(self, fields: dict, lang: str, mode: str, rendered_fields=None, results_fields=None):
+        """
+        :param rendered_fields: IDs of the fields shown by the search item snippet, see get_highlight_fields()
+        :param results_fields: the fields returned for each search result, see get_results_fields()
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown query mode: {mode}")
+        self.lang = lang
+        self.mode = mode
+        self.qf = tuple(get_query_fields(lang, fields))
+        self.hl_fl = ()
+        self.hl_params = {}
+        self.mlt_fl = ()
+        if mode == 'export':
+            self.fl = ",".join(get_export_fields(lang, fields))
+        else:
+            self.fl = ",".join(self.qf)
+        # Projection of the search results, without the fields of the other language
+        self.results_fl = ''
+        if mode == 'search' and results_fields:
+            other_lang = 'en' if lang == 'fr' else 'fr'
+            names = []
+            for name in ['id'] + list(results_fields):
+                if name not in names and not (name in fields and fields[name].solr_field_lang == other_lang):
+                    names.append(name)
+            self.results_fl = ",".join(names)
+        if mode in ('search', 'record'):
+            # The record page shows every field
+            self.hl_fl = tuple(get_highlight_fields(lang, fields, rendered_fields if mode == 'search' else None))
+            self.hl_params = get_highlight_params(self.hl_fl, fields)
+        if mode == 'mlt':
+            self.mlt_fl = tuple(get_mlt_fields(lang, fields))
+        self.facet_params = {f: get_facet_params(f, fields[f]) for f in fields if fields[f].is_search_facet}
+        self.json_facets = {f: get_json_facet(f, fields[f]) for f in fields if fields[f].is_search_facet}
+
+    def get_facet_params(self, facet: str, fields: dict):
+        params = self.facet_params.get(facet)
+        if params is None:
+            params = get_facet_params(facet, fields[facet])
+        return params
+
+    def get_json_facet(self, facet: str, fields: dict):
+        json_facet = self.json_facets.get(facet)
+        if json_facet is None:
+            json_facet = get_json_facet(facet, fields[facet])
+        return json_facet
+
+
+def get_query_skeleton(skeleton: QuerySkeleton, fields: dict, lang: str, mode: str) -> QuerySkeleton:
+    """
+    Return the precomputed skeleton if it matches the language and mode of the query, otherwise build a new one
+    """
+    if skeleton is not None and skeleton.lang == lang and skeleton.mode == mode:
+        return skeleton
+    return QuerySkeleton(fields, lang, mode)
+
+
+def freeze_query_value(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_query_value(v) for v in value)
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze_query_value(v) for k, v in value.items()})
+    return value
+
+
+def thaw_query_value(value):
+    if isinstance(value, tuple):
+        return [thaw_query_value(v) for v in value]
+    if isinstance(value, MappingProxyType):
+        return {k: thaw_query_value(v) for k, v in value.items()}
+    return value
+
+
+class CanonicalQuery(Mapping):
+    """
+    Immutable, hashable Solr query. Parameters are kept in name order, the filter queries are sorted and parameters
+    without a value, which Solr would ignore, are dropped, so equivalent queries compare equal and have the same key.
+    Use as_dict() to get a regular query dictionary that can be changed, for example by a search plugin.
+    """
+
+    __slots__ = ('_params', '_key')
+
+    def __init__(self, params: dict):
+        canonical = {}
+        for name in sorted(params):
+            value = params[name]
+            if value is None or (isinstance(value, (str, list, tuple, dict)) and len(value) == 0):
+                continue
+            if name == 'fq' and isinstance(value, (list, tuple)):
+                value = sorted(value)
+            canonical[name] = freeze_query_value(value)
+        self._params = canonical
+        self._key = None
+
+    def __getitem__(self, name):
+        return self._params[name]
+
+    def __iter__(self):
+        return iter(self._params)
+
+    def __len__(self):
+        return len(self._params)
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        if isinstance(other, CanonicalQuery):
+            return self.key == other.key
+        return NotImplemented
+
+    def __repr__(self):
+        return f"CanonicalQuery({self.as_dict()})"
+
+    def as_dict(self) -> dict:
+        return {name: thaw_query_value(value) for name, value in self._params.items()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), separators=(',', ':'), ensure_ascii=False, default=str)
+
+    @property
+    def key(self) -> str:
+        """
+        SHA-1 digest of the canonical query, used by the result cache, the export file cache and the logs
+        """
+        if self._key is None:
+            self._key = hashlib.sha1(self.to_json().encode('utf-8')).hexdigest()
+        return self._key
+
+
+def get_query_key(solr_query: dict) -> str:
+    return CanonicalQuery(solr_query).key
+
+
+class QueryBuilder:
+    """
+    Builds the Solr query of a search from the parameters of a GET search request, a POST search form, or the search
+    path of an export request. The requests are parsed into the same search text, sort order and facet filters, so
+    equivalent searches produce the same canonical query whatever the form of the request.
+    """
+
+    # Request parameters that are not part of the Solr query
+    GET_IGNORED_PARAMS = ["page", "wbdisable", "_ga", "search_format"]
+    POST_IGNORED_PARAMS = ["page", "wbdisable", "_ga", "search_format", "export_query", "export_search_path",
+                           "csrfmiddlewaretoken", "next_cursor"]
+
+    def __init__(self, search: Search, fields: dict, lang: str, skeleton: QuerySkeleton = None):
+        self.search = search
+        self.fields = fields
+        self.lang = lang
+        self.skeleton = skeleton
+        self.search_text = None
+        self.sort = None
+        self.filters = {}
+        self.cursor = None
+        self.error = None
+
+    def add_filter(self, field_id: str, values: list):
+        self.filters.setdefault(field_id, set()).update(values)
+
+    def parse_get(self, params):
+        """
+        Parse the parameters of a GET search request. An unknown parameter is an error.
+        :param params: a QueryDict or dictionary of request parameters
+        """
+        for name in params.keys():
+            if name == 'search_text':
+                self.search_text = params.get('search_text')
+            elif name == 'sort':
+                self.sort = params.get('sort')
+            elif name == 'cursor':
+                self.cursor = params.get('cursor')
+            elif name in self.fields:
+                self.add_filter(name, params.get(name).split('|'))
+            elif name in self.GET_IGNORED_PARAMS:
+                pass
+            else:
+                self.error = bleach.clean(f"{name}={params.get(name)}" if params.get(name) else f"{name}")
+                break
+        return self
+
+    def parse_search_path(self, search_path: str):
+        """
+        Parse the search path of an export request. The search results are always exported in the default order.
+        """
+        keys = parse.parse_qs(parse.urlsplit(search_path).query)
+        for name in keys:
+            if name == 'search_text':
+                self.search_text = keys[name][0]
+            elif name in self.fields:
+                self.add_filter(name, keys[name][0].split('|'))
+        return self
+
+    def parse_post(self, form: dict, reset_filters=False):
+        """
+        Parse a POST search form. Facet filters are submitted as '<field ID>|<value>' values of any form field. The
+        cursor of the next page of results is used when the next page button was pressed.
+        :param reset_filters: ignore the search text, sort order and filters of the form
+        """
+        for name, value in form.items():
+            if name == 'search_text':
+                if not reset_filters:
+                    self.search_text = value
+            elif name == 'sort':
+                if not reset_filters:
+                    self.sort = value
+            elif name in self.POST_IGNORED_PARAMS or reset_filters:
+                pass
+            else:
+                field_value = value.split('|')
+                if len(field_value) == 2 and field_value[0] in self.fields:
+                    self.add_filter(field_value[0], [field_value[1]])
+        if not reset_filters and form.get('next_cursor') and any(name.startswith('pg_next-') for name in form):
+            self.cursor = form['next_cursor']
+        return self
+
+    def get_facet_filter(self, facet: str, values, json_facets=False) -> str:
+        """
+        Get the tagged filter query for the selected values of a facet. With the JSON Facet API, the values of range
+        facets are the buckets of the range, and None is returned if none of the values is a valid bucket.
+        """
+        field = self.fields[facet]
+        if json_facets and is_range_facet(field):
+            terms = [get_range_filter(item, field.solr_facet_range_gap) for item in sorted(values)]
+            terms = [term for term in terms if term]
+            if not terms:
+                return None
+        else:
+            terms = ['"{0}"'.format(item) for item in sorted(values)]
+        return '{{!tag=tag_{0}}}{0}:({1})'.format(facet, ' OR '.join(terms))
+
+    def get_query_text(self) -> str:
+        if self.search_text is None:
+            return '*'
+        # Users may enter the French equivalents of the eDisMax boolean operators
+        return parse_query_text(self.search_text, self.lang)
+
+    def get_default_sort(self) -> str:
+        """
+        :return: the default sort order of the search in the language of the query, best match if none is set
+        """
+        default_sort = self.search.results_sort_default_fr if self.lang == 'fr' else self.search.results_sort_default_en
+        return default_sort or 'score desc'
+
+    def get_sort(self, default_sort: str) -> str:
+        sort_orders = self.search.results_sort_order_fr if self.lang == 'fr' else self.search.results_sort_order_en
+        if self.sort and self.sort in sort_orders.split(','):
+            return self.sort
+        return default_sort
+
+    def build(self, facets: list, start_row: int = 0, rows: int = 10, record_id: str = '', export=False,
+              highlighting=False, default_sort: str = None, override_sort=False, cursor_paging=False,
+              project_results=False, count_facets: list = None) -> CanonicalQuery:
+        """
+        :param facets: A list of the facets used in the query
+        :param record_id: If used, the ID of a record to retrieve. The parsed request parameters are not used.
+        :param export: Set to true if constructing the query for a /export Solr handler query
+        :param highlighting: set to true if the query should include search term highlighting
+        :param default_sort: the sort order used when the request does not select a valid one. By default, best match
+        for a new text search and the default sort order of the search otherwise, see get_default_sort().
+        :param override_sort: ignore the sort order of the request, used for a new text search
+        :param cursor_paging: use a Solr cursor for the first page of results and for requests with a cursor, so
+        that the next pages can be retrieved without deep paging. The response has the cursor of the next page in
+        nextCursorMark.
+        :param project_results: only return the result fields of the search, if it declares them, instead of every
+        field. Used for the search pages, which only show some of the fields.
+        :param count_facets: the facets whose values are counted, all the facets by default. The filters of the
+        request apply to all the facets.
+        """
+        skeleton = get_query_skeleton(self.skeleton, self.fields, self.lang,
+                                      'export' if export else 'record' if record_id else 'search')
+        solr_query = {'q': '*', 'defType': 'edismax', 'sow': True}
+        if record_id:
+            solr_query['q'] = 'id:"{0}"'.format(record_id)
+            solr_query['sort'] = 'score desc'
+            filters = {}
+        else:
+            solr_query['q'] = self.get_query_text()
+            if default_sort is None:
+                default_sort = 'score desc' if override_sort else self.get_default_sort()
+            solr_query['sort'] = default_sort if override_sort else self.get_sort(default_sort)
+            solr_query['q.op'] = self.search.solr_default_op
+            filters = self.filters
+
+        solr_query['qf'] = skeleton.qf
+        solr_query['fl'] = skeleton.results_fl if project_results and skeleton.results_fl else skeleton.fl
+        if not export:
+            solr_query['start'] = start_row
+            solr_query['rows'] = rows
+            if cursor_paging and not record_id and (self.cursor or start_row == 0):
+                # A cursor always starts at row 0 and needs a sort order that ends with the unique key
+                solr_query['cursorMark'] = self.cursor or '*'
+                solr_query['start'] = 0
+                solr_query['sort'] = get_cursor_sort(solr_query['sort'])
+        if not export and highlighting and skeleton.hl_fl:
+            solr_query.update({
+                'hl': 'on',
+                'hl.method': 'unified',
+                'hl.simple.pre': '<mark>',
+                'hl.simple.post': '</mark>',
+                'hl.snippets': 10,
+                'hl.fl': skeleton.hl_fl,
+                'hl.highlightMultiTerm': True,
+            })
+            solr_query.update(skeleton.hl_params)
+
+        if len(facets) > 0 and self.search.solr_json_facets:
+            # One JSON Facet API request for all the facets. Selected facets exclude their own filter from the
+            # facet domain, so that the other values of the facet can still be selected
+            fq = []
+            json_facet = {}
+            for facet in facets:
+                facet_filter = self.get_facet_filter(facet, filters[facet], json_facets=True) if facet in filters else None
+                if facet_filter:
+                    fq.append(facet_filter)
+                if not export and (count_facets is None or facet in count_facets):
+                    json_facet[facet] = skeleton.get_json_facet(facet, self.fields)
+                    if facet in filters:
+                        json_facet[facet] = dict(json_facet[facet], domain={'excludeTags': 'tag_{0}'.format(facet)})
+            solr_query['fq'] = fq
+            if json_facet:
+                solr_query['json.facet'] = json.dumps(json_facet, separators=(',', ':'))
+        elif len(facets) > 0:
+            counted = [facet for facet in facets if count_facets is None or facet in count_facets]
+            if counted:
+                solr_query['facet'] = True
+                solr_query['facet.sort'] = 'index'
+                solr_query['facet.method'] = 'enum'
+                solr_query['facet.mincount'] = 1
+                if self.search.solr_facet_threads > 0:
+                    solr_query['facet.threads'] = self.search.solr_facet_threads
+            fq = []
+            ff = []
+            for facet in facets:
+                if facet in counted:
+                    solr_query.update(skeleton.get_facet_params(facet, self.fields))
+                if facet in filters:
+                    # Use this query syntax when facet search values are specified
+                    fq.append(self.get_facet_filter(facet, filters[facet]))
+                    if facet in counted:
+                        ff.append('{{!ex=tag_{0}}}{0}'.format(facet))
+                elif facet in counted:
+                    # Otherwise just retrieve the entire facet
+                    ff.append(facet)
+            solr_query['fq'] = fq
+            if ff:
+                solr_query['facet.field'] = ff
+
+        # The export handler can only sort on fields with DocValues
+        if export and solr_query['sort'] == "score desc":
+            solr_query['sort'] = "id asc"
+        # Let Solr stop counting the hits of broad queries, numFound is then a lower bound
+        if not export and not record_id and self.search.solr_min_exact_count:
+            solr_query['minExactCount'] = self.search.solr_min_exact_count
+        # Bound the time spent on pathological queries, the response then has partialResults set in its header.
+        # Solr rejects cursor queries with a time budget, and a partial page would give a wrong next cursor anyway, so
+        # cursor queries are not bounded.
+        if not export and 'cursorMark' not in solr_query:
+            if self.search.solr_time_allowed:
+                solr_query['timeAllowed'] = self.search.solr_time_allowed
+            if self.search.solr_cpu_allowed:
+                solr_query['cpuAllowed'] = self.search.solr_cpu_allowed
+        if self.search.solr_debugging:
+            solr_query['debugQuery'] = True
+        return CanonicalQuery(solr_query)
+
+
+def get_cursor_sort(sort: str) -> str:
+    """
+    Add the unique key as the tiebreaker of a sort order, as required for cursor paging
+    """
+    sort_fields = [s.strip().split(' ')[0] for s in sort.split(',')]
+    if 'id' in sort_fields:
+        return sort
+    return f"{sort},id asc"
+
+
+def remove_cursor_sort(sort: str) -> str:
+    """
+    Reverse get_cursor_sort(), to get back the sort order selected by the user
+    """
+    if sort.endswith(",id asc") and sort[:-7] != get_cursor_sort(sort[:-7]):
+        return sort[:-7]
+    return sort
+
+
+def to_query_dict(query: CanonicalQuery, facets: list) -> dict:
+    solr_query = query.as_dict()
+    # Custom search plugins expect a filter query list when the search has facets
+    if len(facets) > 0:
+        solr_query.setdefault('fq', [])
+    return solr_query
+
+
 def create_solr_query(request: HttpRequest, search: Search, fields: dict, Codes: dict, facets: list, start_row: int,
-                      rows: int, record_id: str, export=False, highlighting=False, default_sort='score desc',
-                      override_sort=False):
+                      rows: int, record_id: str, export=False, highlighting=False, default_sort: str = None,
+                      override_sort=False, skeleton: QuerySkeleton = None, cursor_paging=False,
+                      project_results=False):
     """
     Create a complete query to send to the SolrClient query.
     :param request: The HttpRequest for the page
@@ -153,149 +756,32 @@ def create_solr_query(request: HttpRequest, search: Search, fields: dict, Codes:
     :param record_id: If used, is a list of record ID. Used to retrieve specific records from Solr
     :param export: Set to true if constructing the query for a /export Solr handler query
     :param highlighting: set to true if the query should include search term highlighting
+    :param skeleton: The precomputed QuerySkeleton for the search, language and mode of the query, if available
+    :param cursor_paging: page through the search results with a Solr cursor, see QueryBuilder.build()
+    :param project_results: only return the result fields of the search, see QueryBuilder.build()
     :return: A dictionary representing a Solr query for use with the SolrClient library
     """
-    using_facets = len(facets) > 0
-
-    # Look for known fields in the GET request
-    known_fields = {}
-    solr_query = {'q': '*', 'defType': 'edismax', 'sow': True}
+    builder = QueryBuilder(search, fields, request.LANGUAGE_CODE, skeleton)
 
     # Most search pages in the app use HTTP GET method, but the data export uses POST method with CSTF protection.
-    # This impacts how user data is retrieved.
-
-    # The request is for a specific record - other fields should not be present
-    if record_id:
-        solr_query['q'] = 'id:"{0}"'.format(record_id)
-
-    # Pre-process the search request URL
-    else:
+    # This impacts how user data is retrieved. Requests for a specific record do not use the other parameters.
+    if not record_id:
         if len(request.GET) > 0:
-            for request_field in request.GET.keys():
-                if request_field == 'search_text' and not record_id:
-                    solr_query['q'] = get_search_terms(request.GET.get('search_text'))
-                    if request.LANGUAGE_CODE == 'fr':
-                        solr_query['q'] = solr_query['q'].replace(' OU ', ' OR ').replace(" ET ", " AND ").replace(' PAS ', ' NOT ').replace("(PAS ", "(NOT ")
-                        if solr_query['q'].startswith('PAS '):
-                            solr_query['q'] = "NOT " + solr_query['q'][4:]
-                elif request_field == 'sort' and not record_id:
-                    if request.LANGUAGE_CODE == 'fr':
-                        solr_query['sort'] = request.GET.get('sort') if request.GET.get('sort') in search.results_sort_order_fr.split(',') else default_sort
-                    else:
-                        solr_query['sort'] = request.GET.get('sort') if request.GET.get('sort') in search.results_sort_order_en.split(',') else default_sort
-                elif request_field in fields:
-                    known_fields[request_field] = request.GET.get(request_field).split('|')
-                elif request_field in ["page", "wbdisable", "_ga", "search_format"]:
-                    pass
-                else:
-                    if request.GET.get(request_field):
-                        solr_query = {"error": bleach.clean(f"{request_field}={request.GET.get(request_field)}")}
-                    else:
-                        solr_query = {"error": bleach.clean(f"{request_field}")}
-                    solr_query['error_search_path'] = request.path
-                    return solr_query
-
+            builder.parse_get(request.GET)
+            if builder.error:
+                return {"error": builder.error, 'error_search_path': request.path}
         elif request.POST.get("export_query"):
+            builder.parse_search_path(request.POST.get('export_search_path'))
 
-            # Currently only the data export uses a POST form, so export fields are hard-coded here, and default sort order is used
-
-            qurl = parse.urlsplit(request.POST.get('export_search_path'))
-            keys = parse.parse_qs(qurl.query)
-            for request_field in keys:
-                if request_field == 'search_text' and not record_id:
-                    solr_query['q'] = get_search_terms(keys[request_field][0])
-                elif request_field == 'sort' and not record_id:
-                    solr_query['sort'] = default_sort
-                elif request_field in fields:
-                    known_fields[request_field] = keys[request_field][0].split('|')
-
-        # If sort not specified in the request, then use the default
-        if 'sort' not in solr_query:
-            solr_query['sort'] = default_sort
-
-        # Sometimes, the sort order will be forced to the default value
-        if override_sort:
-            solr_query['sort'] = default_sort
-
-        solr_query['q.op'] = search.solr_default_op
-
-    # Create a Solr query field list based on the Fields Model. Expand the field list where needed
-    solr_query['qf'] = get_query_fields(request.LANGUAGE_CODE, fields)
-
-    if export:
-        ef = ['id']
-        for f in fields:
-            if fields[f].solr_field_lang in [request.LANGUAGE_CODE, 'bi']:
-                if fields[f].solr_field_type in ['string', 'pint', 'pfloat', 'pdate']:
-                    if not fields[f].solr_field_is_coded and f != "unique_identifier":
-                        ef.append(f)
-                    if fields[f].solr_field_is_coded and f[-2:] not in ['_en', '_fr'] and f not in ['month', 'year']:
-                        ef.append("{0}_{1}".format(f, request.LANGUAGE_CODE))
-                elif fields[f].solr_field_type in ["search_text_en", "search_text_fr", 'text_general', 'text_keyword']:
-                    if fields[f].solr_field_export:
-                        for extra_field in fields[f].solr_field_export.split(","):
-                            ef.append(extra_field.strip())
-        solr_query['fl'] = ",".join(ef)
-    else:
-        solr_query['fl'] = ",".join(solr_query['qf'])
-    if not export:
-        solr_query['start'] = start_row
-        solr_query['rows'] = rows
-    if not export and highlighting:
-        hl_fields = []
-        hl_field_types = ["search_text_en", "string", 'text_general']
-        if request.LANGUAGE_CODE == 'fr':
-            hl_field_types = ["search_text_fr", "string", 'text_general']
-        for field in fields:
-            if fields[field].solr_field_type in hl_field_types:
-                hl_fields.append(field)
-                if fields[field].solr_extra_fields:
-                    for extra_field in fields[field].solr_extra_fields.split(","):
-                        if extra_field.endswith("_en") or extra_field.endswith("_fr"):
-                            hl_fields.append(extra_field.strip())
-        solr_query.update({
-            'hl': 'on',
-            'hl.method': 'unified',
-            'hl.simple.pre': '<mark>',
-            'hl.simple.post': '</mark>',
-            'hl.snippets': 10,
-            'hl.fl': hl_fields,
-            'hl.highlightMultiTerm': True,
-        })
-
-    # Set a default sort order
-    if 'sort' not in solr_query:
-        solr_query['sort'] = 'score desc'
-
-    if using_facets:
-        solr_query['facet'] = True
-        solr_query['facet.sort'] = 'index'
-        solr_query['facet.method'] = 'enum'
-        solr_query['facet.mincount'] = 1
-        fq = []
-        ff = []
-        for facet in facets:
-            solr_query['f.{0}.facet.sort'.format(facet)] = fields[facet].solr_facet_sort
-            solr_query['f.{0}.facet.limit'.format(facet)] = fields[facet].solr_facet_limit
-            if facet in known_fields:
-                # Use this query syntax when facet search values are specified
-                quoted_terms = ['"{0}"'.format(item) for item in known_fields[facet]]
-                facet_text = '{{!tag=tag_{0}}}{0}:({1})'.format(facet, ' OR '.join(quoted_terms))
-                fq.append(facet_text)
-                ff.append('{{!ex=tag_{0}}}{0}'.format(facet))
-            else:
-                # Otherwise just retrieve the entire facet
-                ff.append(facet)
-        solr_query['fq'] = fq
-        solr_query['facet.field'] = ff
-    if export and solr_query['sort'] == "score desc":
-        solr_query['sort'] = "id asc"
-    if search.solr_debugging:
-        solr_query['debugQuery'] = True
-    return solr_query
+    query = builder.build(facets, start_row, rows, record_id, export=export, highlighting=highlighting,
+                          default_sort=default_sort, override_sort=override_sort, cursor_paging=cursor_paging,
+                          project_results=project_results)
+    return to_query_dict(query, facets)
 
 
-def create_solr_mlt_query(request: HttpRequest, search: Search, fields: dict, start_row: int, record_id: str):
+def create_solr_mlt_query(request: HttpRequest, search: Search, fields: dict, start_row: int, record_id: str,
+                          skeleton: QuerySkeleton = None):
+    skeleton = get_query_skeleton(skeleton, fields, request.LANGUAGE_CODE, 'mlt')
     solr_query = {
         'q': 'id:"{0}"'.format(record_id),
         'mlt': True,
@@ -303,8 +789,8 @@ def create_solr_mlt_query(request: HttpRequest, search: Search, fields: dict, st
         'mlt.boost': True,
         'start': start_row,
         'rows': search.mlt_items,
-        'fl':  get_query_fields(request.LANGUAGE_CODE, fields),
-        'mlt.fl': get_mlt_fields(request, fields),
+        'fl': list(skeleton.qf),
+        'mlt.fl': list(skeleton.mlt_fl),
         'mlt.mintf': 1,
         'mlt.minwl': 3,
         'mlt.mindf': 2,
@@ -312,165 +798,17 @@ def create_solr_mlt_query(request: HttpRequest, search: Search, fields: dict, st
     }
     return solr_query
 
-def create_post_solr_query(request: HttpRequest, search: Search, fields: dict, Codes: dict, facets: list,
-                           start_row: int = 0, rows: int = 10, default_sort='score desc',  override_sort=False, 
-                           is_export: bool = False, reset_filters: bool = False):
-    
-    # Look for known fields in the POST request
-    known_fields = {}
-
-    # basic default query. 'sow' is split-on-whitespace
-
-    solr_query = {'q': '*', 'defType': 'edismax', 'sow': True}
-
-    # Extract fields from POST data. There always should be POST data.
-
-    if len(request.POST) > 0:
-        form_data = request.POST
-        form_data_dict = form_data.dict()
-        for form_field in form_data_dict:
-            if form_field == 'search_text':
-
-                # The main query is specified by the 'q' parameter. We expect to use the Extended DisMax syntax that includes boolean
-                # operators in the text. We take on the task of provided French equivalents for the standard OR and AND boolean syntax
-                # which needs to be translated back to the eDisMax syntax before being sent to Solr
-
-                if reset_filters:
-                    solr_query['q'] = "*"
-                else:    
-                    solr_query['q'] = get_search_terms(form_data_dict.get('search_text'))
-                if request.LANGUAGE_CODE == 'fr':
-                    solr_query['q'] = solr_query['q'].replace(' OU ', ' OR ').replace(" ET ", " AND ").replace(' PAS ', ' NOT ').replace("(PAS ", "(NOT ")
-                    if solr_query['q'].startswith('PAS '):
-                        solr_query['q'] = "NOT " + solr_query['q'][4:]
-            
-            elif form_field == 'sort':
-
-                # Client has specified a solr value. Validate the value against the allowed user-defined values before adding it to the query
-                
-                if request.LANGUAGE_CODE == 'fr':
-                    solr_query['sort'] = form_data_dict.get('sort') if form_data_dict.get('sort') in search.results_sort_order_fr.split(',') else 'score desc'
-                else:
-                    solr_query['sort'] = form_data_dict.get('sort') if form_data_dict.get('sort') in search.results_sort_order_en.split(',') else 'score desc'
-            
-            elif form_field in ["page", "wbdisable", "_ga", "search_format", "export_query", "export_search_path", "csrfmiddlewaretoken"]:
-            
-                # Some POST fields are not relevant for the Solr query
-                pass
-            elif reset_filters:
-                pass
-            else:
-
-                # make sure the facet field form value has correct format.Thr field is 
-                
-                form_field_valus_decoded = form_data_dict.get(form_field).split('|')
-                if isinstance(form_field_valus_decoded, list) and len(form_field_valus_decoded) == 2:
-
-                    field_value = form_data_dict.get(form_field).split('|')[0]
-
-                    # Assemble a list of facet fiels selections
-                    if field_value in fields:
-                        if field_value in known_fields:
-                            known_fields[field_value].append(form_field_valus_decoded[1])
-                        else:    
-                            known_fields[field_value] = [form_field_valus_decoded[1]]
-        
-        # If sort not specified in the request, then use the default
-        
-        if 'sort' not in solr_query or reset_filters:
-            solr_query['sort'] = default_sort
-
-        # Sometimes, the sort order will be forced to the default value - usually this is when the search page is
-        # first loaded priory to any queries
-        
-        if override_sort:
-            solr_query['sort'] = default_sort
-
-
-        solr_query['q.op'] = search.solr_default_op
-
-        # Create a Solr query field list based on the Fields Model. Expand the field list where needed
-        solr_query['qf'] = get_query_fields(request.LANGUAGE_CODE, fields)
-
-        if not is_export:
-
-            # Add highlighting parameters
-
-            hl_fields = []
-            hl_field_types = ["search_text_en", "string", 'text_general']
-            if request.LANGUAGE_CODE == 'fr':
-                hl_field_types = ["search_text_fr", "string", 'text_general']
-            for field in fields:
-                if fields[field].solr_field_type in hl_field_types:
-                    hl_fields.append(field)
-                    if fields[field].solr_extra_fields:
-                        for extra_field in fields[field].solr_extra_fields.split(","):
-                            if extra_field.endswith("_en") or extra_field.endswith("_fr"):
-                                hl_fields.append(extra_field.strip())
-            solr_query.update({
-                'hl': 'on',
-                'hl.method': 'unified',
-                'hl.simple.pre': '<mark>',
-                'hl.simple.post': '</mark>',
-                'hl.snippets': 10,
-                'hl.fl': hl_fields,
-                'hl.highlightMultiTerm': True,
-            })
-
-        # query offset parameters - data exports include all data
-
-        solr_query['start'] = start_row
-        solr_query['rows'] = rows
 
-    # Add faceting parameters  
-
-    if len(facets) > 0:
-        
-        # Turn on faceting and set default parameters. The Solr filter (facet) query is specified by the 'fq' parameter
-        
-        solr_query['facet'] = True
-        solr_query['facet.sort'] = 'index'
-        solr_query['facet.method'] = 'enum'
-        solr_query['facet.mincount'] = 1
-        fq = []
-        ff = []
-        
-        for facet in facets:
-            solr_query['f.{0}.facet.sort'.format(facet)] = fields[facet].solr_facet_sort
-            solr_query['f.{0}.facet.limit'.format(facet)] = fields[facet].solr_facet_limit
-            if facet in known_fields:
-                # Use this query syntax when facet search values are specified 
-                # @TODO Investigate if this more complicated syntax is still required with the latest Solr
-                quoted_terms = ['"{0}"'.format(item) for item in known_fields[facet]]
-                facet_text = '{{!tag=tag_{0}}}{0}:({1})'.format(facet, ' OR '.join(quoted_terms))
-                fq.append(facet_text)
-                ff.append('{{!ex=tag_{0}}}{0}'.format(facet))
-            else:
-                # Otherwise just retrieve the entire facet
-                ff.append(facet)
-        solr_query['fq'] = fq
-        solr_query['facet.field'] = ff
-
-    # If the query is for a search download, there are additional or different fields that need to be
-    # used. For the data export it necessary to only query for fiels with a DocValues type. This
-    # computed list is specified in the 'fl' parameter. The 'fl' parameter limits the information 
-    # included in a query response to a specified list of fields.
-    
-    if is_export:
-        ef = ['id']
-        for f in fields:
-            if fields[f].solr_field_lang in [request.LANGUAGE_CODE, 'bi']:
-                if fields[f].solr_field_type in ['string', 'pint', 'pfloat', 'pdate']:
-                    if not fields[f].solr_field_is_coded and f != "unique_identifier":
-                        ef.append(f)
-                    if fields[f].solr_field_is_coded and f[-2:] not in ['_en', '_fr'] and f not in ['month', 'year']:
-                        ef.append("{0}_{1}".format(f, request.LANGUAGE_CODE))
-                elif fields[f].solr_field_type in ["search_text_en", "search_text_fr", 'text_general', 'text_keyword']:
-                    if fields[f].solr_field_export:
-                        for extra_field in fields[f].solr_field_export.split(","):
-                            ef.append(extra_field.strip())
-        solr_query['fl'] = ",".join(ef)
-    else:
-        solr_query['fl'] = ",".join(solr_query['qf'])
-
-    return solr_query
+def create_post_solr_query(request: HttpRequest, search: Search, fields: dict, Codes: dict, facets: list,
+                           start_row: int = 0, rows: int = 10, default_sort: str = None, override_sort=False,
+                           is_export: bool = False, reset_filters: bool = False, skeleton: QuerySkeleton = None,
+                           cursor_paging=False, project_results=False):
+    """
+    Create the Solr query for a POST search form, see QueryBuilder.parse_post()
+    """
+    builder = QueryBuilder(search, fields, request.LANGUAGE_CODE, skeleton)
+    builder.parse_post(request.POST.dict(), reset_filters=reset_filters)
+    query = builder.build(facets, start_row, rows, export=is_export, highlighting=not is_export,
+                          default_sort=default_sort, override_sort=override_sort, cursor_paging=cursor_paging,
+                          project_results=project_results)
+    return to_query_dict(query, facets)
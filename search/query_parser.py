@@ -0,0 +1,49 @@
+"""
+Parser for the search text entered by users.
+
+The search text is split into terms and quoted phrases with a single precompiled regular expression, using the same
+rules as the NLTK RegexpTokenizer that was previously built for every query: a term starts with any character other
+than a quote or a space, a phrase is everything between two double quotes, and unmatched quotes are dropped. Users of
+the French search pages may type the French equivalents of the eDisMax boolean operators, which are translated in
+the same pass over the terms. Quoted phrases are never translated.
+"""
+
+import re
+
+# A term, or a quoted phrase that may span several lines
+QUERY_TOKEN = re.compile(r'[^"\s]\S*|".+?"', re.DOTALL)
+
+# French operators that join two terms
+FRENCH_BINARY_OPERATORS = {'OU': 'OR', 'ET': 'AND'}
+
+# French operator that applies to the following term, also at the start of a group: (PAS
+FRENCH_NOT = 'PAS'
+
+
+def parse_query_text(search_text: str, lang: str = 'en') -> str:
+    """
+    Convert the search text entered by a user into the q parameter of an eDisMax query
+    :param search_text: the search text
+    :param lang: language of the search page. The French boolean operators OU, ET and PAS are translated for 'fr'
+    :return: the terms and phrases of the search text separated by single spaces, or '*' if there are none
+    """
+    tokens = QUERY_TOKEN.findall(search_text)
+    if not tokens:
+        return '*'
+    if lang == 'fr':
+        last = len(tokens) - 1
+        for i, token in enumerate(tokens):
+            # Operators need an operand, a trailing or leading OU is searched for as a term
+            if i < last:
+                if token == FRENCH_NOT or token.endswith('(' + FRENCH_NOT):
+                    tokens[i] = token[:-len(FRENCH_NOT)] + 'NOT'
+                elif i > 0 and token in FRENCH_BINARY_OPERATORS:
+                    tokens[i] = FRENCH_BINARY_OPERATORS[token]
+    return ' '.join(tokens)
+
+
+def get_search_terms(search_text: str) -> str:
+    """
+    Split the search text into terms and quoted phrases, without translating operators
+    """
+    return parse_query_text(search_text)
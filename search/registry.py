@@ -0,0 +1,372 @@
+"""
+Process-wide registry of the search configuration.
+
+The Search, Field, Code and Setting models rarely change, but every search page needs them. Instead of reloading them from the
+database on every request (or every time a local cache entry expires), the registry builds a single immutable snapshot
+of the configuration per process and only rebuilds it when the models are changed. Changes are detected with the
+post_save and post_delete signals (see search/signals.py) and broadcast to the other processes and nodes through a
+shared generation counter kept in the Redis cache, once the transaction that changed them is committed.
+"""
+
+from collections.abc import Mapping
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.db import transaction
+import importlib
+import logging
+import pkgutil
+import threading
+import time
+from search.code_tables import SearchCodeTables
+from search.models import Search, Field, Code, Setting
+from search.query import QuerySkeleton, get_results_fields
+from search.snippet_fields import get_template_field_ids
+import search.plugins
+
+logger = logging.getLogger(__name__)
+
+# Key of the shared configuration generation counter
+CONFIG_GENERATION_KEY = 'search_config_generation'
+
+
+def get_default_display_fields(fields: dict, lang: str):
+    """
+    Get the field labels for all the fields of a search that are displayed in the given language
+    :param fields: dictionary of Field objects for the search
+    :param lang: 'en' or 'fr'
+    :return: dictionary of field labels keyed by field ID
+    """
+    display_field_name = {}
+    for f in fields:
+        if fields[f].solr_field_lang in [lang, 'bi']:
+            if lang == 'en' and not f[:2] == 'fr':
+                display_field_name[f] = fields[f].label_en
+            elif lang == 'fr' and not f[:2] == 'en':
+                display_field_name[f] = fields[f].label_fr
+    return display_field_name
+
+
+class LazyCodeTables(Mapping):
+    """
+    Read-only mapping of search ID to the code labels of the search in one language. The code tables of a search are
+    only loaded from the database when the search is first requested.
+    """
+
+    __slots__ = ('snapshot', 'lang')
+
+    def __init__(self, snapshot, lang: str):
+        self.snapshot = snapshot
+        self.lang = lang
+
+    def __getitem__(self, search_id):
+        return self.snapshot.get_code_tables(search_id).for_lang(self.lang)
+
+    def __contains__(self, search_id):
+        return search_id in self.snapshot.searches
+
+    def __iter__(self):
+        return iter(self.snapshot.searches)
+
+    def __len__(self):
+        return len(self.snapshot.searches)
+
+
+class SearchConfigSnapshot:
+    """
+    Immutable snapshot of the search configuration. A new snapshot is built whenever the configuration changes and is
+    swapped in as a whole, so a request always sees a consistent set of searches, fields and codes. The dictionaries
+    are shared by every request in the process and must be treated as read-only. Code labels are kept in compact
+    code tables that are loaded per search on first use, and so are the query skeletons.
+    """
+
+    __slots__ = ('version', 'searches', 'search_alias_en', 'search_alias_fr', 'reverse_search_alias_en',
+                 'reverse_search_alias_fr', 'fields', 'facets_en', 'facets_fr', 'display_fields_en',
+                 'display_fields_fr', 'display_fields_names_en', 'display_fields_names_fr', 'codes_en', 'codes_fr', 'code_tables',
+                 'settings', 'query_skeletons', '_code_lock')
+
+    def __init__(self, version: int):
+        self.version = version
+        self.searches = {}
+        self.search_alias_en = {}
+        self.search_alias_fr = {}
+        self.reverse_search_alias_en = {}
+        self.reverse_search_alias_fr = {}
+        self.fields = {}
+        self.facets_en = {}
+        self.facets_fr = {}
+        self.display_fields_en = {}
+        self.display_fields_fr = {}
+        self.display_fields_names_en = {}
+        self.display_fields_names_fr = {}
+        self.code_tables = {}
+        self.settings = {}
+        self.query_skeletons = {}
+        self.codes_en = LazyCodeTables(self, 'en')
+        self.codes_fr = LazyCodeTables(self, 'fr')
+        self._code_lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the complete configuration, except for the codes, from the database. Uses one query per model instead of
+        one set of queries per search.
+        """
+        for s in Search.objects.all():
+            self.searches[s.search_id] = s
+            if s.search_alias_en:
+                self.search_alias_en[s.search_alias_en] = s.search_id
+                self.reverse_search_alias_en[s.search_id] = s.search_alias_en
+            else:
+                self.reverse_search_alias_en[s.search_id] = s.search_id
+            if s.search_alias_fr:
+                self.search_alias_fr[s.search_alias_fr] = s.search_id
+                self.reverse_search_alias_fr[s.search_id] = s.search_alias_fr
+            else:
+                self.reverse_search_alias_fr[s.search_id] = s.search_id
+            self.fields[s.search_id] = {}
+
+        for f in Field.objects.all().order_by('id'):
+            if f.search_id_id in self.fields:
+                self.fields[f.search_id_id][f.field_id] = f
+
+        for sid, sfields in self.fields.items():
+            facet_list_en = []
+            facet_list_fr = []
+            display_list_en = []
+            display_list_fr = []
+            for f in sorted((f for f in sfields.values() if f.is_search_facet), key=lambda x: x.solr_facet_display_order):
+                if f.solr_field_lang in ['en', 'bi']:
+                    facet_list_en.append(f.field_id)
+                if f.solr_field_lang in ['fr', 'bi']:
+                    facet_list_fr.append(f.field_id)
+            for f in sfields.values():
+                if f.is_default_display and f.solr_field_lang in ['en', 'bi']:
+                    display_list_en.append(f.field_id)
+                if f.is_default_display and f.solr_field_lang in ['fr', 'bi']:
+                    display_list_fr.append(f.field_id)
+            self.facets_en[sid] = facet_list_en
+            self.facets_fr[sid] = facet_list_fr
+            self.display_fields_en[sid] = display_list_en
+            self.display_fields_fr[sid] = display_list_fr
+            self.display_fields_names_en[sid] = get_default_display_fields(sfields, 'en')
+            self.display_fields_names_fr[sid] = get_default_display_fields(sfields, 'fr')
+
+        self.settings = dict(Setting.objects.values_list('key', 'value'))
+
+        return self
+
+    def get_code_tables(self, search_id: str) -> SearchCodeTables:
+        """
+        Get the code tables for a search, loading them from the database the first time the search is requested
+        """
+        tables = self.code_tables.get(search_id)
+        if tables is not None:
+            return tables
+        if search_id not in self.searches:
+            raise KeyError(search_id)
+        with self._code_lock:
+            tables = self.code_tables.get(search_id)
+            if tables is None:
+                tables = SearchCodeTables(self.load_codes(search_id))
+                self.code_tables[search_id] = tables
+            return tables
+
+    def get_query_skeleton(self, search_id: str, lang: str, mode: str) -> QuerySkeleton:
+        """
+        Get the precomputed parts of the Solr queries of a search for a language and query mode, see
+        search.query.QuerySkeleton
+        """
+        key = (search_id, lang, mode)
+        skeleton = self.query_skeletons.get(key)
+        if skeleton is None:
+            # Building a skeleton twice in concurrent requests is harmless, the last one built is kept
+            rendered_fields = self.get_rendered_fields(search_id, lang) if mode == 'search' else None
+            skeleton = QuerySkeleton(self.fields[search_id], lang, mode, rendered_fields=rendered_fields,
+                                     results_fields=get_results_fields(self.searches[search_id]))
+            self.query_skeletons[key] = skeleton
+        return skeleton
+
+    def get_rendered_fields(self, search_id: str, lang: str):
+        """
+        Get the IDs of the fields shown by the search item snippet of a search, or None if the snippet cannot be
+        scanned, see search.snippet_fields
+        """
+        display_fields = self.display_fields_fr[search_id] if lang == 'fr' else self.display_fields_en[search_id]
+        return get_template_field_ids(self.searches[search_id].search_item_snippet, self.fields[search_id],
+                                      display_fields)
+
+    @staticmethod
+    def load_codes(search_id: str) -> dict:
+        """
+        Load the codes of a search with a single query
+        :return: dictionary keyed by field ID of dictionaries of (English label, French label) tuples keyed by code ID
+        """
+        field_codes = {}
+        codes_queryset = Code.objects.filter(field_fid__search_id_id=search_id).values_list(
+            'field_fid__field_id', 'code_id', 'label_en', 'label_fr')
+        for field_id, code_id, label_en, label_fr in codes_queryset:
+            field_codes.setdefault(field_id, {})[code_id] = (label_en, label_fr)
+        return field_codes
+
+
+class SearchConfigRegistry:
+    """
+    Holds the current configuration snapshot for the process. The snapshot is rebuilt when it is invalidated locally
+    by a model signal, or when another process has bumped the shared generation counter. The shared counter is only
+    checked every SEARCH_CONFIG_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._config = None
+        self._builds = 0
+        self._dirty = True
+        self._generation = None
+        self._next_check = 0.0
+        # Deferred invalidations of the current thread, see invalidate_on_commit() and batch()
+        self._local = threading.local()
+
+    def _shared_cache(self):
+        alias = getattr(settings, 'SEARCH_CONFIG_BROADCAST_CACHE', 'redis')
+        if not alias or alias not in settings.CACHES:
+            return None
+        try:
+            return caches[alias]
+        except InvalidCacheBackendError:
+            return None
+
+    def _shared_generation(self):
+        cache = self._shared_cache()
+        if cache is None:
+            return None
+        try:
+            return cache.get(CONFIG_GENERATION_KEY)
+        except Exception as x:
+            logger.warning(f"Unable to read the search configuration generation: {x}")
+            return self._generation
+
+    def _shared_changed(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + getattr(settings, 'SEARCH_CONFIG_CHECK_INTERVAL', 5)
+        return self._shared_generation() != self._generation
+
+    @property
+    def generation(self):
+        """
+        The shared generation counter of the current snapshot, or None if there is no shared cache
+        """
+        return self._generation
+
+    def get_config(self) -> SearchConfigSnapshot:
+        config = self._config
+        if config is None or self._dirty or self._shared_changed():
+            config = self.reload()
+        return config
+
+    def reload(self) -> SearchConfigSnapshot:
+        builds = self._builds
+        with self._lock:
+            # Another thread may have already rebuilt the snapshot while this one was waiting for the lock
+            if self._builds != builds and not self._dirty and self._config is not None:
+                return self._config
+            self._dirty = False
+            generation = self._shared_generation()
+            config = SearchConfigSnapshot(self._builds + 1).load()
+            self._config = config
+            self._generation = generation
+            self._builds += 1
+            logger.info(f"Loaded search configuration version {config.version} (generation {generation})")
+            return config
+
+    def invalidate(self, broadcast=True):
+        """
+        Mark the current snapshot as stale. It is rebuilt on the next request.
+        :param broadcast: also notify the other processes through the shared generation counter
+        """
+        self._dirty = True
+        if not broadcast:
+            return
+        cache = self._shared_cache()
+        if cache is None:
+            return
+        try:
+            try:
+                cache.incr(CONFIG_GENERATION_KEY)
+            except ValueError:
+                if not cache.add(CONFIG_GENERATION_KEY, 1, timeout=None):
+                    cache.incr(CONFIG_GENERATION_KEY)
+        except Exception as x:
+            logger.warning(f"Unable to broadcast the search configuration change: {x}")
+
+    def invalidate_on_commit(self):
+        """
+        Invalidate the snapshot once the current transaction is committed, so that no process reloads the
+        configuration before the changes are visible. The changes of one transaction, or of one batch(), are broadcast
+        once.
+        """
+        # The changes are already visible to this thread, which reloads the snapshot again after the commit
+        self._dirty = True
+        local = self._local
+        if getattr(local, 'batch_depth', 0):
+            local.batch_changed = True
+            return
+        local.pending = True
+        transaction.on_commit(self._run_pending_invalidation)
+
+    def _run_pending_invalidation(self):
+        # Every change of a transaction registers this callback, only the first one to run invalidates
+        if getattr(self._local, 'pending', False):
+            self._local.pending = False
+            self.invalidate()
+
+    @contextmanager
+    def batch(self):
+        """
+        Defer the invalidations of the current thread until the end of the block, for commands that save many
+        configuration rows one at a time
+        """
+        local = self._local
+        local.batch_depth = getattr(local, 'batch_depth', 0) + 1
+        try:
+            yield
+        finally:
+            local.batch_depth -= 1
+            if not local.batch_depth and getattr(local, 'batch_changed', False):
+                local.batch_changed = False
+                self.invalidate_on_commit()
+
+
+search_registry = SearchConfigRegistry()
+
+
+def get_search_config() -> SearchConfigSnapshot:
+    return search_registry.get_config()
+
+
+def get_setting(key: str, default=None):
+    """
+    Get the value of a Setting from the configuration snapshot, without a database query
+    """
+    return get_search_config().settings.get(key, default)
+
+
+_discovered_plugins = None
+
+
+def get_plugins() -> dict:
+    """
+    Import the custom search plugins once per process. Plugins are python modules in the search.plugins package
+    and are keyed by their absolute module name, for example 'search.plugins.travelq'
+    """
+    global _discovered_plugins
+    if _discovered_plugins is None:
+        # Original function copied from https://packaging.python.org/guides/creating-and-discovering-plugins/
+        _discovered_plugins = {
+            name: importlib.import_module(name)
+            for finder, name, ispkg
+            in pkgutil.iter_modules(search.plugins.__path__, search.plugins.__name__ + ".")
+        }
+    return _discovered_plugins
@@ -0,0 +1,385 @@
+"""
+Optional cache of Solr responses.
+
+The same search pages are requested many times with the same Solr query. When SEARCH_RESULT_CACHE_ENABLED is set,
+the raw response data of a Solr query is stored in the SEARCH_RESULT_CACHE_ALIAS cache (Redis by default), so a repeat
+query is answered without calling Solr. The cache key is built from the normalized query, the Solr core, the version
+of the search plugin and a per-core index generation counter. The data loading commands increment the index
+generation after they commit to Solr, so cached results never outlive a reload of the core.
+
+The last good response for each query is also kept for SEARCH_STALE_RESULT_TIMEOUT seconds regardless of the index
+generation. It is only used when Solr is unavailable, see search/circuit_breaker.py.
+
+Identical queries that are in flight at the same time are coalesced, see search/single_flight.py. With
+SEARCH_SINGLE_FLIGHT_LOCK, the first process to miss the cache for a query also takes a lock in the result cache, and
+the other processes wait for it to cache the response rather than querying Solr themselves.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+import copy
+import hashlib
+import logging
+import time
+from search.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from search.query import CanonicalQuery
+from search.single_flight import AsyncSingleFlight, SingleFlight
+from SolrClient2 import SolrClient, SolrResponse
+from SolrClient2.exceptions import ConnectionError, SolrError
+
+logger = logging.getLogger(__name__)
+
+INDEX_GENERATION_KEY = 'search_index_generation'
+INDEX_UPDATED_KEY = 'search_index_updated'
+
+
+def get_result_cache():
+    """
+    :return: the cache used for Solr results, or None if result caching is disabled or not configured
+    """
+    if not getattr(settings, 'SEARCH_RESULT_CACHE_ENABLED', False):
+        return None
+    alias = getattr(settings, 'SEARCH_RESULT_CACHE_ALIAS', 'redis')
+    if not alias or alias not in settings.CACHES:
+        return None
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return None
+
+
+def get_index_generation(core_name: str, cache=None):
+    """
+    :return: the current index generation of the Solr core, 0 if the core has never been reloaded
+    """
+    if cache is None:
+        cache = get_result_cache()
+    if cache is None:
+        return 0
+    return cache.get(f"{INDEX_GENERATION_KEY}:{core_name}", 0)
+
+
+def bump_index_generation(core_name: str):
+    """
+    Increment the index generation of a Solr core, which makes every cached result for the core obsolete, and record
+    the time of the update. Call this after committing changes to the core.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return
+    key = f"{INDEX_GENERATION_KEY}:{core_name}"
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+        cache.set(f"{INDEX_UPDATED_KEY}:{core_name}", int(time.time()), timeout=None)
+    except Exception as x:
+        logger.warning(f"Unable to update the index generation for Solr core {core_name}: {x}")
+
+
+def get_index_updated(core_name: str, cache=None):
+    """
+    :return: the time of the last update of the Solr core in seconds since the epoch, or None if unknown
+    """
+    if cache is None:
+        cache = get_result_cache()
+    if cache is None:
+        return None
+    return cache.get(f"{INDEX_UPDATED_KEY}:{core_name}")
+
+
+def normalize_query(solr_query: dict, **kwargs) -> str:
+    """
+    Serialize a Solr query to a canonical string, see search.query.CanonicalQuery
+    """
+    params = dict(solr_query)
+    params.update(kwargs)
+    return CanonicalQuery(params).to_json()
+
+
+def result_cache_key(core_name: str, solr_query: dict, request_handler='select', plugin_version='', generation=0,
+                     **kwargs) -> str:
+    digest = hashlib.sha1(normalize_query(solr_query, **kwargs).encode('utf-8')).hexdigest()
+    version = getattr(settings, 'SEARCH_RESULT_CACHE_VERSION', 1)
+    return f"search_results:{version}:{core_name}:{request_handler}:{plugin_version}:{generation}:{digest}"
+
+
+def stale_cache_key(core_name: str, solr_query: dict, request_handler='select', plugin_version='', **kwargs) -> str:
+    """
+    Key of the last good response for a query, which does not depend on the index generation
+    """
+    digest = hashlib.sha1(normalize_query(solr_query, **kwargs).encode('utf-8')).hexdigest()
+    version = getattr(settings, 'SEARCH_RESULT_CACHE_VERSION', 1)
+    return f"search_results_stale:{version}:{core_name}:{request_handler}:{plugin_version}:{digest}"
+
+
+def get_stale_response(stale_key: str):
+    """
+    :return: the last good response for the query marked with is_stale, or None
+    """
+    cache = get_result_cache()
+    if cache is None or stale_key is None:
+        return None
+    try:
+        data = cache.get(stale_key)
+    except Exception as x:
+        logger.warning(f"Unable to read the Solr result cache: {x}")
+        return None
+    if data is None:
+        return None
+    solr_response = SolrResponse(data)
+    solr_response.is_stale = True
+    return solr_response
+
+
+def get_cached_response(core_name: str, solr_query: dict, request_handler='select', plugin_version='', **kwargs):
+    """
+    Look up a query in the result cache
+    :return: the cache key, the key of the last good response and the cached response or None. The keys are None
+    when result caching is disabled.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return None, None, None
+    try:
+        generation = get_index_generation(core_name, cache)
+        key = result_cache_key(core_name, solr_query, request_handler, plugin_version, generation, **kwargs)
+        stale_key = stale_cache_key(core_name, solr_query, request_handler, plugin_version, **kwargs)
+        data = cache.get(key)
+        return key, stale_key, SolrResponse(data) if data is not None else None
+    except Exception as x:
+        logger.warning(f"Unable to read the Solr result cache: {x}")
+        return None, None, None
+
+
+def is_partial_response(solr_response: SolrResponse) -> bool:
+    """
+    :return: True if Solr stopped searching before the end because the query ran out of time, see
+    Search.solr_time_allowed and Search.solr_cpu_allowed
+    """
+    return bool(solr_response.data.get('responseHeader', {}).get('partialResults', False))
+
+
+def set_cached_response(key: str, stale_key: str, solr_response: SolrResponse):
+    """
+    Store a Solr response in the result cache, both as the current response and as the last good response.
+    Partial responses are not stored, the next request for the query gets another chance to complete.
+    """
+    cache = get_result_cache()
+    if cache is None or key is None or solr_response is None or is_partial_response(solr_response):
+        return
+    try:
+        # Store the data before the caller modifies it, for example by highlighting the documents
+        cache.set(key, solr_response.data, getattr(settings, 'SEARCH_RESULT_CACHE_TIMEOUT', 3600))
+        cache.set(stale_key, solr_response.data, getattr(settings, 'SEARCH_STALE_RESULT_TIMEOUT', 86400))
+    except Exception as x:
+        logger.warning(f"Unable to write to the Solr result cache: {x}")
+
+
+def copy_solr_response(solr_response: SolrResponse) -> SolrResponse:
+    """
+    :return: a copy of a Solr response that can be modified without changing the original
+    """
+    copied = SolrResponse(copy.deepcopy(solr_response.data))
+    if getattr(solr_response, 'is_stale', False):
+        copied.is_stale = True
+    return copied
+
+
+single_flight = SingleFlight(copy_solr_response)
+async_single_flight = AsyncSingleFlight(copy_solr_response)
+
+
+def single_flight_key(key: str, core_name: str, solr_query: dict, request_handler='select', plugin_version='',
+                      **kwargs):
+    """
+    :return: the key that identical in-flight queries share, or None if single-flight coalescing is disabled
+    """
+    if not getattr(settings, 'SEARCH_SINGLE_FLIGHT_ENABLED', True):
+        return None
+    if key is not None:
+        return key
+    return f"{core_name}:{request_handler}:{plugin_version}:{normalize_query(solr_query, **kwargs)}"
+
+
+def acquire_query_lock(key: str):
+    """
+    Take the result cache lock of a query, so that other processes wait for this process to cache the response
+    instead of sending the same query to Solr
+    :return: the lock key, or None if the lock is held by another process or locking is disabled
+    """
+    cache = get_result_cache()
+    if cache is None or key is None or not getattr(settings, 'SEARCH_SINGLE_FLIGHT_LOCK', False):
+        return None
+    lock_key = f"{key}:lock"
+    try:
+        if cache.add(lock_key, 1, getattr(settings, 'SEARCH_SINGLE_FLIGHT_TIMEOUT', 10)):
+            return lock_key
+    except Exception as x:
+        logger.warning(f"Unable to lock the Solr result cache: {x}")
+    return None
+
+
+def release_query_lock(lock_key: str):
+    cache = get_result_cache()
+    if cache is None or lock_key is None:
+        return
+    try:
+        cache.delete(lock_key)
+    except Exception as x:
+        logger.warning(f"Unable to unlock the Solr result cache: {x}")
+
+
+def wait_for_cached_response(key: str):
+    """
+    Wait for the process holding the lock of a query to cache its response
+    :return: the cached response, or None if the lock is released without a response or the wait times out
+    """
+    cache = get_result_cache()
+    if cache is None or key is None or not getattr(settings, 'SEARCH_SINGLE_FLIGHT_LOCK', False):
+        return None
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + getattr(settings, 'SEARCH_SINGLE_FLIGHT_TIMEOUT', 10)
+    try:
+        while time.monotonic() < deadline:
+            time.sleep(getattr(settings, 'SEARCH_SINGLE_FLIGHT_POLL_INTERVAL', 0.05))
+            data = cache.get(key)
+            if data is not None:
+                return SolrResponse(data)
+            if cache.get(lock_key) is None:
+                # The response is cached before the lock is released, unless the query failed
+                data = cache.get(key)
+                return SolrResponse(data) if data is not None else None
+    except Exception as x:
+        logger.warning(f"Unable to read the Solr result cache: {x}")
+    return None
+
+
+def cached_query(solr: SolrClient, core_name: str, solr_query: dict, request_handler='select', plugin_version='',
+                 **kwargs) -> SolrResponse:
+    """
+    Same as SolrClient.query(), but the response data is returned from the result cache when possible. Queries go
+    through the circuit breaker of the Solr core: when the core is unavailable the last good response for the same
+    query is returned with is_stale set, or a ConnectionError is raised without waiting for Solr.
+
+    Identical queries made at the same time are coalesced: only the first one is sent to Solr, the others wait for
+    its response. With SEARCH_SINGLE_FLIGHT_LOCK, the processes sharing the result cache coalesce their queries too.
+    :param plugin_version: version of the custom search plugin, if any, that processes the query and the results
+    """
+    key, stale_key, solr_response = get_cached_response(core_name, solr_query, request_handler, plugin_version,
+                                                        **kwargs)
+    if solr_response is not None:
+        return solr_response
+
+    def query_solr():
+        return _query_solr(solr, core_name, solr_query, request_handler, key, stale_key, **kwargs)
+
+    flight_key = single_flight_key(key, core_name, solr_query, request_handler, plugin_version, **kwargs)
+    if flight_key is None:
+        return query_solr()
+    return single_flight.do(flight_key, query_solr, getattr(settings, 'SEARCH_SINGLE_FLIGHT_TIMEOUT', 10))
+
+
+def _query_solr(solr: SolrClient, core_name: str, solr_query: dict, request_handler, key, stale_key, **kwargs):
+    breaker = get_circuit_breaker(core_name)
+    if not breaker.allow_request():
+        solr_response = get_stale_response(stale_key)
+        if solr_response is not None:
+            return solr_response
+        raise CircuitOpenError(f"Solr core {core_name} is unavailable")
+
+    lock_key = acquire_query_lock(key)
+    if lock_key is None:
+        solr_response = wait_for_cached_response(key)
+        if solr_response is not None:
+            # Another process got the response from Solr, which also ends a trial query of the circuit
+            breaker.record_success()
+            return solr_response
+    try:
+        try:
+            solr_response = solr.query(core_name, solr_query, request_handler=request_handler, **kwargs)
+        except ConnectionError:
+            breaker.record_failure()
+            solr_response = get_stale_response(stale_key)
+            if solr_response is not None:
+                return solr_response
+            raise
+        except SolrError:
+            # Solr is up, but the query was rejected with a 4xx response. Timeouts and 5xx responses are raised as
+            # ConnectionError, see search.solr_connections.SolrServerError
+            breaker.record_success()
+            raise
+        except Exception:
+            # Unreadable or truncated responses
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+
+        set_cached_response(key, stale_key, solr_response)
+        return solr_response
+    finally:
+        release_query_lock(lock_key)
+
+
+async def acached_query(solr, core_name: str, solr_query: dict, request_handler='select', plugin_version='',
+                        **kwargs) -> SolrResponse:
+    """
+    Async version of cached_query() for an AsyncSolrClient. The cache is read and written in a worker thread.
+    """
+    key, stale_key, solr_response = await sync_to_async(get_cached_response, thread_sensitive=False)(
+        core_name, solr_query, request_handler, plugin_version, **kwargs)
+    if solr_response is not None:
+        return solr_response
+
+    def query_solr():
+        return _aquery_solr(solr, core_name, solr_query, request_handler, key, stale_key, **kwargs)
+
+    flight_key = single_flight_key(key, core_name, solr_query, request_handler, plugin_version, **kwargs)
+    if flight_key is None:
+        return await query_solr()
+    return await async_single_flight.do(flight_key, query_solr, getattr(settings, 'SEARCH_SINGLE_FLIGHT_TIMEOUT', 10))
+
+
+async def _aquery_solr(solr, core_name: str, solr_query: dict, request_handler, key, stale_key, **kwargs):
+    breaker = get_circuit_breaker(core_name)
+    if not breaker.allow_request():
+        solr_response = await sync_to_async(get_stale_response, thread_sensitive=False)(stale_key)
+        if solr_response is not None:
+            return solr_response
+        raise CircuitOpenError(f"Solr core {core_name} is unavailable")
+
+    lock_key = None
+    if key is not None:
+        lock_key = await sync_to_async(acquire_query_lock, thread_sensitive=False)(key)
+        if lock_key is None:
+            solr_response = await sync_to_async(wait_for_cached_response, thread_sensitive=False)(key)
+            if solr_response is not None:
+                breaker.record_success()
+                return solr_response
+    try:
+        try:
+            solr_response = await solr.query(core_name, solr_query, request_handler=request_handler, **kwargs)
+        except ConnectionError:
+            breaker.record_failure()
+            solr_response = await sync_to_async(get_stale_response, thread_sensitive=False)(stale_key)
+            if solr_response is not None:
+                return solr_response
+            raise
+        except SolrError:
+            breaker.record_success()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+
+        if key is not None:
+            await sync_to_async(set_cached_response, thread_sensitive=False)(key, stale_key, solr_response)
+        return solr_response
+    finally:
+        if lock_key is not None:
+            await sync_to_async(release_query_lock, thread_sensitive=False)(lock_key)
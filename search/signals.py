@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+from search.http_cache import purge_surrogate_key, surrogate_key
+from search.models import Search, Field, Code, ChronologicCode, Setting
+from search.registry import search_registry
+
+# Sent by the data loading commands after they commit to the Solr core of a search, with the core_name argument
+search_index_updated = Signal()
+
+
+@receiver([post_save, post_delete], sender=Search)
+@receiver([post_save, post_delete], sender=Field)
+@receiver([post_save, post_delete], sender=Code)
+@receiver([post_save, post_delete], sender=ChronologicCode)
+@receiver([post_save, post_delete], sender=Setting)
+def invalidate_search_config(sender, **kwargs):
+    # Any change to the search configuration models invalidates the configuration snapshot of every process
+    search_registry.invalidate_on_commit()
+
+
+@receiver(search_index_updated)
+def purge_search_core(sender, core_name, **kwargs):
+    # Purge the pages of the core from the CDN, if SEARCH_CDN_PURGE_URL is set
+    purge_surrogate_key(surrogate_key(core_name))
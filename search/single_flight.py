@@ -0,0 +1,124 @@
+"""
+Coalescing of identical in-flight calls.
+
+When a popular search page is shared, or its cached result expires, many requests send the same Solr query at the
+same moment. With single-flight coalescing only the first request of a worker process runs the query; the requests
+that arrive while it is in flight wait for its result instead of sending their own. Every waiting caller gets its own
+copy of the result, since the views modify the Solr responses while rendering them.
+
+See search.result_cache.cached_query(), which also coalesces queries across processes with a lock in the result
+cache.
+"""
+
+import asyncio
+import threading
+
+
+class _Flight:
+    """
+    A call in progress and the callers waiting for its result
+    """
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical calls made at the same time by the threads of a process
+    """
+
+    def __init__(self, copy_result):
+        """
+        :param copy_result: function returning an independent copy of a result, for the waiting callers
+        """
+        self.copy_result = copy_result
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key: str, fn, timeout: float = None):
+        """
+        Call fn(), or wait for the result of the call with the same key that is already in progress. If the call in
+        progress fails, its exception is raised in the waiting threads as well.
+        :param timeout: maximum number of seconds to wait for a call in progress, after which fn() is called anyway
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+            else:
+                flight.waiters += 1
+                leader = False
+
+        if not leader:
+            if not flight.event.wait(timeout):
+                return fn()
+            if flight.error is not None:
+                raise flight.error
+            return self.copy_result(flight.result)
+
+        try:
+            result = fn()
+        except BaseException as x:
+            flight.error = x
+            raise
+        else:
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
+                waiters = flight.waiters
+            # No caller can join the flight anymore. Keep a private copy for the waiting callers, since this caller
+            # is free to modify its result as soon as it is returned.
+            if waiters and flight.error is None:
+                flight.result = self.copy_result(result)
+            flight.event.set()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces identical calls made at the same time by the coroutines of an event loop
+    """
+
+    def __init__(self, copy_result):
+        self.copy_result = copy_result
+        self._flights = {}
+
+    async def do(self, key: str, coroutine_fn, timeout: float = None):
+        """
+        Async version of SingleFlight.do(), for a function returning a coroutine
+        """
+        loop = asyncio.get_running_loop()
+        flight = self._flights.get(key)
+        if flight is not None and flight[0].get_loop() is loop:
+            flight[1] += 1
+            try:
+                result = await asyncio.wait_for(asyncio.shield(flight[0]), timeout)
+            except asyncio.TimeoutError:
+                return await coroutine_fn()
+            return self.copy_result(result)
+
+        flight = [loop.create_future(), 0]
+        self._flights[key] = flight
+        try:
+            result = await coroutine_fn()
+        except Exception as x:
+            if flight[1]:
+                flight[0].set_exception(x)
+            else:
+                flight[0].cancel()
+            raise
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight[0].set_result(self.copy_result(result) if flight[1] else result)
+        return result
@@ -0,0 +1,74 @@
+"""
+Find the fields that a search template or snippet shows.
+
+The search item snippet of a search only shows some of the fields of a search result. The templates are scanned
+once per configuration snapshot for the field IDs they name, so that the Solr queries only ask for what the page
+needs, for example highlighting only for the fields that are shown.
+"""
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+# Variables and block tags, the only parts of a template that can name a field
+TEMPLATE_TAG = re.compile(r'{[{%](.*?)[}%]}', re.DOTALL)
+
+# Templates included with a literal name, which are scanned as well
+INCLUDE_TAG = re.compile(r'{%\s*include\s+["\']([^"\']+)["\']')
+
+
+def get_template_source(template_name: str):
+    """
+    :return: the source of a template, or None if the template cannot be loaded
+    """
+    try:
+        return get_template(template_name).template.source
+    except (TemplateDoesNotExist, TemplateSyntaxError) as x:
+        logger.warning(f"Unable to scan template {template_name}: {x}")
+        return None
+
+
+def get_template_names(template_name: str, seen=None):
+    """
+    Get the identifiers used in the variables and tags of a template and of the templates it includes
+    :return: a set of names, or None if the template or one of the included templates cannot be loaded
+    """
+    if seen is None:
+        seen = set()
+    if template_name in seen:
+        return set()
+    seen.add(template_name)
+    source = get_template_source(template_name)
+    if source is None:
+        return None
+    names = set()
+    for tag in TEMPLATE_TAG.findall(source):
+        names.update(IDENTIFIER.findall(tag))
+    for included in INCLUDE_TAG.findall(source):
+        included_names = get_template_names(included, seen)
+        if included_names is None:
+            return None
+        names |= included_names
+    return names
+
+
+def get_template_field_ids(template_name: str, fields: dict, default_display_fields: list):
+    """
+    Get the IDs of the fields that a template shows: the fields it names and, when it loops over the
+    default_display_fields of the context, the default display fields of the search.
+    :return: a set of field IDs, or None if the template cannot be scanned, in which case any field may be shown
+    """
+    if not template_name:
+        return None
+    names = get_template_names(template_name)
+    if names is None:
+        return None
+    field_ids = {f for f in fields if f in names}
+    if 'default_display_fields' in names:
+        field_ids.update(default_display_fields)
+    return field_ids
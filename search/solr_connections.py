@@ -0,0 +1,228 @@
+"""
+Process-wide Solr connection manager.
+
+SolrClient2 opens a new requests session, and therefore new TCP connections, for every SolrClient. The clients returned
+by get_solr_client() are created once per process for each Solr host and type of operation and reuse a pool of
+keep-alive connections. Each operation has its own connect and read timeouts, failed connections and 502, 503 and
+504 responses are retried a bounded number of times, and responses are requested with gzip encoding. Read timeouts
+are not retried, so a query never waits for more than one read timeout.
+
+get_async_solr_client() returns the asyncio equivalent used by the async views, built on httpx.
+"""
+
+import asyncio
+
+from django.conf import settings
+import os
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+from urllib3.util.retry import Retry
+from SolrClient2 import SolrClient, SolrResponse
+from SolrClient2.exceptions import ConnectionError, SolrError
+from SolrClient2.transport import TransportRequests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Operations that only read from Solr can safely be retried after a 502, 503 or 504 response, including POSTed queries
+READ_OPERATIONS = ['select', 'export', 'federated']
+
+DEFAULT_TIMEOUTS = {
+    'select': (3.05, 30),
+    'export': (3.05, 300),
+    'update': (3.05, 120),
+}
+
+
+class SolrServerError(ConnectionError):
+    """
+    Raised for a 5xx response: Solr is failing or overloaded, as opposed to rejecting the query with a 4xx response
+    """
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code} - {message}")
+        self.status_code = status_code
+
+
+class TimeoutSession(requests.Session):
+    """
+    requests session that applies a default timeout to every request. SolrClient2 does not set a timeout, and reports
+    every error response as a SolrError, so 5xx responses are raised as SolrServerError here.
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        res = super().request(method, url, **kwargs)
+        if res.status_code >= 500:
+            raise SolrServerError(res.status_code, f"{res.url} {res.text}")
+        return res
+
+
+class PooledTransport(TransportRequests):
+    """
+    SolrClient2 transport that uses a TimeoutSession with a keep-alive connection pool and bounded retries
+    """
+
+    def __init__(self, solr, operation='select', **kwargs):
+        self.operation = operation
+        super().__init__(solr, **kwargs)
+
+    def setup(self):
+        self.session = create_session(self.operation)
+        if self.auth and self.auth != (None, None):
+            self.session.auth = (self.auth[0], self.auth[1])
+
+
+def get_timeout(operation: str) -> tuple:
+    """
+    :return: the (connect, read) timeouts in seconds for a type of Solr operation
+    """
+    timeouts = getattr(settings, 'SOLR_CLIENT_TIMEOUTS', DEFAULT_TIMEOUTS)
+    if operation == 'federated':
+        # The federated search gives up on the searches that have not answered after FEDERATED_SEARCH_TIMEOUT
+        # seconds, so their queries are not left waiting on Solr any longer than that
+        connect_timeout, read_timeout = timeouts.get('select', DEFAULT_TIMEOUTS['select'])
+        return connect_timeout, min(read_timeout, getattr(settings, 'FEDERATED_SEARCH_TIMEOUT', 5))
+    return timeouts.get(operation, DEFAULT_TIMEOUTS.get(operation, DEFAULT_TIMEOUTS['select']))
+
+
+def create_session(operation: str) -> TimeoutSession:
+    session = TimeoutSession(get_timeout(operation))
+    retries = getattr(settings, 'SOLR_CLIENT_RETRIES', 2)
+    retry_args = {}
+    if operation in READ_OPERATIONS:
+        retry_args['allowed_methods'] = frozenset(['GET', 'POST'])
+    # Read errors are not retried: a core that does not answer within the read timeout is not going to answer the
+    # next attempt either, and the retries would hold the worker for several read timeouts
+    retry = Retry(total=retries, connect=retries, read=0, status=retries,
+                  backoff_factor=getattr(settings, 'SOLR_CLIENT_RETRY_BACKOFF', 0.2),
+                  status_forcelist=[502, 503, 504], raise_on_status=False, **retry_args)
+    pool_size = getattr(settings, 'SOLR_CLIENT_POOL_SIZE', 10)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_clients_pid = None
+
+
+def get_solr_client(operation='select', host=None) -> SolrClient:
+    """
+    Get the shared Solr client for this process.
+    :param operation: 'select' for searches, 'federated' for the federated search, 'export' for the export request
+    handler or 'update' for indexing
+    :param host: Solr server URL, defaults to SOLR_SERVER_URL
+    """
+    global _clients_pid
+    if host is None:
+        host = settings.SOLR_SERVER_URL
+    key = (host, operation)
+    pid = os.getpid()
+    # Pooled connections must not be shared with the parent process after a fork, for example by uWSGI or Celery
+    client = _clients.get(key) if _clients_pid == pid else None
+    if client is None:
+        with _clients_lock:
+            if _clients_pid != pid:
+                _clients.clear()
+                _clients_pid = pid
+            client = _clients.get(key)
+            if client is None:
+                client = SolrClient(host, transport=PooledTransport, operation=operation)
+                _clients[key] = client
+    return client
+
+
+def close_solr_clients():
+    """
+    Close the pooled connections of every shared Solr client of the process
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.transport.session.close()
+        _clients.clear()
+
+
+class AsyncSolrClient:
+    """
+    Minimal asyncio Solr client with the same query() interface and errors as SolrClient2. Used by the async views,
+    so that a single ASGI worker can wait on many Solr queries at once.
+    """
+
+    def __init__(self, host: str, operation='select'):
+        if httpx is None:
+            raise ImportError("The httpx module is required for the async search views")
+        self.host = host if host.endswith('/') else host + '/'
+        connect_timeout, read_timeout = get_timeout(operation)
+        pool_size = getattr(settings, 'SOLR_CLIENT_POOL_SIZE', 10)
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        # httpx only retries failed connections, which is safe for every operation
+        transport = httpx.AsyncHTTPTransport(retries=getattr(settings, 'SOLR_CLIENT_RETRIES', 2), limits=limits)
+        self.client = httpx.AsyncClient(transport=transport,
+                                        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                                        headers={'Accept-Encoding': 'gzip, deflate'})
+
+    async def query(self, collection: str, query: dict, request_handler='select', **kwargs) -> SolrResponse:
+        """
+        Send a query to Solr
+        :param collection: the Solr core
+        :param query: dictionary of Solr query parameters
+        :return: a SolrClient2 SolrResponse
+        """
+        params = dict(query)
+        params.update(wt='json', indent=False, **kwargs)
+        for field in params:
+            if type(params[field]) is bool:
+                params[field] = str(params[field]).lower()
+        url = f"{self.host}{collection}/{request_handler}"
+        try:
+            res = await self.client.post(url, data=params)
+        except httpx.TimeoutException as e:
+            raise ConnectionError('TIMEOUT', str(e), e)
+        except httpx.TransportError as e:
+            raise ConnectionError('N/A', str(e), e)
+
+        if 200 <= res.status_code < 300:
+            solr_response = SolrResponse(res.json())
+            solr_response.url = str(res.url)
+            return solr_response
+        if res.status_code in [401, 404]:
+            raise ConnectionError(f"{res.status_code} - {res.url}")
+        if res.status_code >= 500:
+            raise SolrServerError(res.status_code, f"{res.url} {res.text}")
+        raise SolrError(f"{res.status_code} - {res.url} {res.text}")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_async_clients = {}
+
+
+def get_async_solr_client(operation='select', host=None) -> AsyncSolrClient:
+    """
+    Get the shared async Solr client for the running event loop.
+    :param operation: 'select' for searches, 'export' for the export request handler or 'update' for indexing
+    :param host: Solr server URL, defaults to SOLR_SERVER_URL
+    """
+    if host is None:
+        host = settings.SOLR_SERVER_URL
+    loop = asyncio.get_running_loop()
+    key = (host, operation)
+    # httpx connections belong to the event loop that opened them
+    entry = _async_clients.get(key)
+    if entry is None or entry[0] is not loop:
+        entry = (loop, AsyncSolrClient(host, operation))
+        _async_clients[key] = entry
+    return entry[1]
@@ -4,11 +4,12 @@ from celery import shared_task
 import csv
 from datetime import datetime, timedelta
 from django.conf import settings
-import hashlib
 import logging
 import os
 from .models import Event
-from SolrClient2 import SolrClient, SolrResponse
+from .query import get_query_key
+from .solr_connections import get_solr_client
+from SolrClient2 import SolrResponse
 from SolrClient2.exceptions import ConnectionError, SolrError
 import time
 
@@ -84,8 +85,7 @@ def cache_search_results_file(cached_filename: str, sr: SolrResponse, rows=0, fi
 @shared_task()
 def export_search_results_csv(query, lang, core, fieldlist: dict):
     cache_dir = settings.EXPORT_FILE_CACHE_DIR
-    string_to_hash = ",".join(f"{k}:{v}" for k, v in query.items())
-    hashed_query = hashlib.sha1(string_to_hash.encode('utf8')).hexdigest()
+    hashed_query = get_query_key(query)
     fileroot = core.replace("search_", "rechercher_") if  lang == "fr" else core
     cached_filename = os.path.join(cache_dir, f"{fileroot}_{hashed_query}_{lang}.csv")
     static_filename = f'{settings.EXPORT_FILE_CACHE_URL}/{fileroot}_{hashed_query}_{lang}.csv'
@@ -97,7 +97,7 @@ def export_search_results_csv(query, lang, core, fieldlist: dict):
             os.remove(cached_filename)
         else:
             return f"{static_filename}"
-    solr = SolrClient(settings.SOLR_SERVER_URL)
+    solr = get_solr_client('export')
     solr_response = solr.query(core, query, request_handler='export')
 
     # Either create and cache the the search results or return the cached file
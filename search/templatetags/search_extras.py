@@ -13,6 +13,7 @@ from dateutil import parser
 import json
 import markdown2
 import re
+from search.fragment_cache import get_fragment, set_fragment
 
 
 register = template.Library()
@@ -279,3 +280,34 @@ def int_format(value: int, formatstr: str):
 @register.filter('normailize_id_value')
 def normailize_id_value(value: str):
     return value.replace(" ", "_").replace('é', 'e').replace('à', 'a')
+
+
+class FragmentCacheNode(template.Node):
+
+    def __init__(self, nodelist, key):
+        self.nodelist = nodelist
+        self.key = key
+
+    def render(self, context):
+        key = self.key.resolve(context)
+        if not key:
+            return self.nodelist.render(context)
+        content = get_fragment(key)
+        if content is None:
+            content = self.nodelist.render(context)
+            set_fragment(key, content)
+        return content
+
+
+@register.tag('cachefragment')
+def do_cache_fragment(parser, token):
+    """
+    {% cachefragment key %}...{% endcachefragment %} caches the rendered content under a key computed by the view,
+    see search/fragment_cache.py. The content is rendered every time when the key is empty.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes one argument, the cache key")
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    return FragmentCacheNode(nodelist, parser.compile_filter(bits[1]))
@@ -1,5 +1,25 @@
-from django.test import TestCase
-from .query import calc_starting_row
+from importlib import import_module
+import json
+import threading
+import time
+from unittest import mock
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from SolrClient2 import SolrResponse
+from SolrClient2.exceptions import ConnectionError, SolrError
+from . import circuit_breaker
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .code_tables import CodeTable
+from .facets import FacetResult
+from .models import Search, Field, Code, Setting
+from .query import add_legacy_facet_counts, calc_pagination_range, calc_starting_row, get_cursor_sort, \
+    remove_cursor_sort, QueryBuilder
+from .query_parser import parse_query_text
+from .registry import search_registry
+from .result_cache import bump_index_generation, cached_query
+from .single_flight import SingleFlight
+from . import views
 
 
 class UtilTestCase(TestCase):
@@ -8,3 +28,453 @@ class UtilTestCase(TestCase):
     def test_calc_starting_row(self):
         start_page = calc_starting_row(34, 10)
         self.assertEqual(start_page[0], 330)
+
+    def test_calc_pagination_range(self):
+        self.assertEqual(calc_pagination_range(100, 10, 5, 1), [1, 0, 4, 5, 6, 0, 10])
+        # With an approximate count the last page is unknown
+        self.assertEqual(calc_pagination_range(100, 10, 5, 1, exact=False), [1, 0, 4, 5, 6, 0])
+        self.assertEqual(calc_pagination_range(30, 10, 1, 3, exact=False), [1, 2, 3, 0])
+
+
+class QueryParserTestCase(SimpleTestCase):
+
+    def test_terms(self):
+        self.assertEqual(parse_query_text(''), '*')
+        self.assertEqual(parse_query_text(' \t\n '), '*')
+        self.assertEqual(parse_query_text('  travel\texpenses\n 2020 '), 'travel expenses 2020')
+        self.assertEqual(parse_query_text('owner_org:tbs-sct +hotel -"air fare"'), 'owner_org:tbs-sct +hotel -"air fare"')
+
+    def test_quotes(self):
+        self.assertEqual(parse_query_text('"travel  expenses" hotel'), '"travel  expenses" hotel')
+        self.assertEqual(parse_query_text('"multi\nline"'), '"multi\nline"')
+        # Unmatched and empty quotes are dropped
+        self.assertEqual(parse_query_text('hotel "air fare'), 'hotel air fare')
+        self.assertEqual(parse_query_text('"" hotel'), 'hotel')
+        self.assertEqual(parse_query_text('"'), '*')
+
+    def test_french_operators(self):
+        self.assertEqual(parse_query_text('chat OU chien ET PAS oiseau', 'fr'), 'chat OR chien AND NOT oiseau')
+        self.assertEqual(parse_query_text('PAS chat', 'fr'), 'NOT chat')
+        self.assertEqual(parse_query_text('chat ET (PAS chien)', 'fr'), 'chat AND (NOT chien)')
+        self.assertEqual(parse_query_text('OU chat OU', 'fr'), 'OU chat OU')
+        self.assertEqual(parse_query_text('chat PAS', 'fr'), 'chat PAS')
+        self.assertEqual(parse_query_text('"chat OU chien" ET oiseau', 'fr'), '"chat OU chien" AND oiseau')
+        self.assertEqual(parse_query_text('chat OU chien', 'en'), 'chat OU chien')
+        self.assertEqual(parse_query_text('chat ou chien', 'fr'), 'chat ou chien')
+        self.assertEqual(parse_query_text('cat OR dog', 'fr'), 'cat OR dog')
+
+
+class QueryBuilderTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.search = Search(search_id='test', results_sort_order_en='score desc,title_en asc',
+                             results_sort_order_fr='score desc,title_fr asc', results_sort_default_en='title_en asc',
+                             results_sort_default_fr='title_fr asc')
+        self.fields = {'title_en': Field(field_id='title_en', search_id=self.search, solr_field_lang='en',
+                                         solr_field_type='search_text_en'),
+                       'owner_org': Field(field_id='owner_org', search_id=self.search, solr_field_lang='bi',
+                                          is_search_facet=True)}
+
+    def build(self, lang, get=None, post=None, **kwargs):
+        builder = QueryBuilder(self.search, self.fields, lang)
+        if get is not None:
+            builder.parse_get(get)
+        if post is not None:
+            builder.parse_post(post)
+        return builder.build(['owner_org'], **kwargs).as_dict()
+
+    def test_default_sort(self):
+        self.assertEqual(self.build('en', get={})['sort'], 'title_en asc')
+        self.assertEqual(self.build('fr', get={})['sort'], 'title_fr asc')
+        self.assertEqual(self.build('en', get={'search_text': 'x'}, override_sort=True)['sort'], 'score desc')
+        # Equivalent GET and POST searches produce the same query
+        self.assertEqual(self.build('en', get={'search_text': 'x', 'owner_org': 'tbs'}),
+                         self.build('en', post={'search_text': 'x', 'filter': 'owner_org|tbs'}))
+
+    def test_cursor_paging(self):
+        self.assertEqual(get_cursor_sort('title_en asc'), 'title_en asc,id asc')
+        self.assertEqual(get_cursor_sort('score desc,id desc'), 'score desc,id desc')
+        self.assertEqual(remove_cursor_sort('title_en asc,id asc'), 'title_en asc')
+        self.assertEqual(remove_cursor_sort('id asc'), 'id asc')
+        solr_query = self.build('en', get={}, cursor_paging=True)
+        self.assertEqual((solr_query['cursorMark'], solr_query['sort'], solr_query['start']),
+                         ('*', 'title_en asc,id asc', 0))
+        solr_query = self.build('en', get={'cursor': 'AoE'}, cursor_paging=True)
+        self.assertEqual(solr_query['cursorMark'], 'AoE')
+
+    def test_cursor_time_allowed(self):
+        self.search.solr_time_allowed = 500
+        self.search.solr_cpu_allowed = 200
+        solr_query = self.build('en', get={}, cursor_paging=True)
+        self.assertEqual(solr_query['cursorMark'], '*')
+        self.assertNotIn('timeAllowed', solr_query)
+        self.assertNotIn('cpuAllowed', solr_query)
+        # Pages past the first one without a cursor use start paging and keep the time budget
+        solr_query = self.build('en', get={}, start_row=10, cursor_paging=True)
+        self.assertNotIn('cursorMark', solr_query)
+        self.assertEqual((solr_query['timeAllowed'], solr_query['cpuAllowed']), (500, 200))
+
+    def test_json_range_facets(self):
+        self.search.solr_json_facets = True
+        self.fields['date_published'] = Field(field_id='date_published', search_id=self.search, solr_field_lang='bi',
+                                              solr_field_type='pdate', is_search_facet=True,
+                                              solr_facet_range_gap='+1YEAR', solr_facet_range_start='2019-01-01T00:00:00Z')
+        builder = QueryBuilder(self.search, self.fields, 'en')
+        builder.parse_get({'date_published': '2020|<2019'})
+        solr_query = builder.build(['owner_org', 'date_published']).as_dict()
+        self.assertIn('{!tag=tag_date_published}date_published:([2020-01-01T00:00:00Z TO 2020-01-01T00:00:00Z+1YEAR} '
+                      'OR [* TO 2019-01-01T00:00:00Z})', solr_query['fq'])
+        json_facet = json.loads(solr_query['json.facet'])
+        self.assertEqual(json_facet['date_published']['other'], 'before')
+        self.assertEqual(json_facet['date_published']['domain'], {'excludeTags': 'tag_date_published'})
+
+        solr_data = {'facets': {'count': 9,
+                                'owner_org': {'buckets': [{'val': 'tbs', 'count': 5}, {'val': 'pco', 'count': 4}]},
+                                'date_published': {'before': {'count': 3},
+                                                   'buckets': [{'val': '2019-01-01T00:00:00Z', 'count': 0},
+                                                               {'val': '2020-01-01T00:00:00Z', 'count': 6}]}}}
+        add_legacy_facet_counts(solr_data, solr_query, self.fields)
+        self.assertEqual(solr_data['facet_counts']['facet_fields'],
+                         {'owner_org': ['tbs', 5, 'pco', 4], 'date_published': ['<2019', 3, '2020', 6]})
+
+
+class CodeTableTestCase(SimpleTestCase):
+
+    def test_sort_by_label(self):
+        table = CodeTable({'a': ('Ontario', 'Ontario'), 'b': ('Quebec', 'Québec'), 'c': ('alberta', 'Alberta'),
+                           'd': ('Yukon', 'Yukon'), 'e': ('Elk', 'Élan'), 'f': ('Ezra', 'Ezra')})
+        self.assertEqual(table.for_lang('en').sort_by_label(['a', 'b', 'c', 'x', 'd']), (['c', 'a', 'b', 'd'], ['x']))
+        self.assertEqual(table.for_lang('fr').sort_by_label(['f', 'e', 'b', 'c']), (['c', 'e', 'f', 'b'], []))
+
+    def test_french_accents(self):
+        table = CodeTable({'1': ('', 'côté'), '2': ('', 'coté'), '3': ('', 'côte'), '4': ('', 'cote'), '5': ('', 'Cote')})
+        self.assertEqual(table.for_lang('fr').sort_by_label(['1', '2', '3', '4', '5'])[0], ['4', '5', '3', '2', '1'])
+
+
+class FacetResultTestCase(SimpleTestCase):
+
+    def test_rows(self):
+        codes = CodeTable({'a': ('Zeta', 'Zêta'), 'b': ('Alpha', 'Alpha')})
+        facet = FacetResult.from_solr('org', ['a', 3, 'b', 1, 'x', 2], 'Organization', 'label', 'fr',
+                                      codes.for_lang('en'), codes.for_lang('fr'))
+        self.assertEqual(facet.rows, [('a', 'Zêta', 3), ('b', 'Alpha', 1), ('x', '', 2)])
+        facet.reorder(['b', 'a'])
+        self.assertEqual(facet.to_json(), [{'code': 'b', 'label_en': 'Alpha', 'label_fr': 'Alpha', 'count': 1},
+                                           {'code': 'a', 'label_en': 'Zeta', 'label_fr': 'Zêta', 'count': 3}])
+
+    def test_mapping(self):
+        facet = FacetResult.from_solr('year', ['2020', 1, '2021', 2], 'Year', 'count', 'en')
+        facet['2022'] = 3
+        del facet['2020']
+        self.assertEqual(dict(facet), {'2021': 2, '2022': 3, '__label__': 'Year', '__sortorder__': 'count'})
+        self.assertEqual(facet.rows, [('2021', '2021', 2), ('2022', '2022', 3)])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                           'results': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'test_circuit_breaker'}},
+                   SEARCH_RESULT_CACHE_ENABLED=True, SEARCH_RESULT_CACHE_ALIAS='results',
+                   SOLR_CIRCUIT_FAILURE_THRESHOLD=2, SOLR_CIRCUIT_RESET_TIMEOUT=30)
+class CircuitBreakerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(circuit_breaker._breakers.pop, 'core_breaker', None)
+        self.solr = mock.Mock()
+        self.solr.query.return_value = SolrResponse({'responseHeader': {'QTime': 1},
+                                                     'response': {'numFound': 1, 'docs': [{'id': 'r1'}]}})
+
+    def test_states(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+        # A single trial query is let through after the reset timeout, and a failure opens the circuit again
+        breaker.opened_at -= 30
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        self.assertFalse(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        breaker.opened_at -= 30
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_abandoned_trial(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        breaker.opened_at -= 30
+        self.assertTrue(breaker.allow_request())
+        # The trial query never reports back: no other query is let through until the reset timeout
+        self.assertFalse(breaker.allow_request())
+        breaker.opened_at -= 30
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        breaker.record_success()
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+    def test_unreadable_response(self):
+        self.solr.query.side_effect = ValueError('Expecting value: line 1 column 1 (char 0)')
+        for i in range(2):
+            with self.assertRaises(ValueError):
+                cached_query(self.solr, 'core_breaker', {'q': 'cat'})
+        self.assertEqual(circuit_breaker.get_circuit_breaker('core_breaker').state, circuit_breaker.OPEN)
+
+    def test_stale_fallback(self):
+        cached_query(self.solr, 'core_breaker', {'q': 'cat'})
+        bump_index_generation('core_breaker')
+        self.solr.query.side_effect = ConnectionError('TIMEOUT')
+        # The last good response is returned while Solr is unavailable
+        self.assertTrue(cached_query(self.solr, 'core_breaker', {'q': 'cat'}).is_stale)
+        with self.assertRaises(ConnectionError):
+            cached_query(self.solr, 'core_breaker', {'q': 'dog'})
+        self.assertEqual(circuit_breaker.get_circuit_breaker('core_breaker').state, circuit_breaker.OPEN)
+        # While the circuit is open, Solr is not queried
+        queries = self.solr.query.call_count
+        self.assertTrue(cached_query(self.solr, 'core_breaker', {'q': 'cat'}).is_stale)
+        with self.assertRaises(CircuitOpenError):
+            cached_query(self.solr, 'core_breaker', {'q': 'dog'})
+        self.assertEqual(self.solr.query.call_count, queries)
+
+    def test_rejected_query(self):
+        # A query rejected by Solr does not count as a failure
+        self.solr.query.side_effect = SolrError('400 undefined field')
+        for i in range(3):
+            with self.assertRaises(SolrError):
+                cached_query(self.solr, 'core_breaker', {'q': 'bad:x'})
+        self.assertEqual(circuit_breaker.get_circuit_breaker('core_breaker').state, circuit_breaker.CLOSED)
+
+
+class SingleFlightTestCase(SimpleTestCase):
+
+    def coalesce(self, fn, waiters=2):
+        """
+        Call fn() in a leading thread and in waiting threads that join it while it is in progress
+        :return: the results or exceptions of the calls, the leading call first
+        """
+        flight = SingleFlight(copy_result=list)
+        release = threading.Event()
+        results = [None] * (waiters + 1)
+
+        def call(i):
+            try:
+                results[i] = flight.do('key', lambda: fn(release), timeout=10)
+            except Exception as x:
+                results[i] = x
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(waiters + 1)]
+        threads[0].start()
+        while not flight.in_flight():
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while flight._flights['key'].waiters < waiters:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(flight.in_flight(), 0)
+        return results
+
+    def test_coalesce(self):
+        calls = []
+
+        def fn(release):
+            calls.append(1)
+            release.wait()
+            return ['result']
+
+        results = self.coalesce(fn)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['result']] * 3)
+        # Each caller gets its own copy of the result
+        self.assertEqual(len(set(id(result) for result in results)), 3)
+
+    def test_error(self):
+        def fn(release):
+            release.wait()
+            raise ConnectionError('TIMEOUT')
+
+        for result in self.coalesce(fn):
+            self.assertIsInstance(result, ConnectionError)
+
+
+class ConfigInvalidationTestCase(TestCase):
+
+    def test_invalidate_on_commit(self):
+        with mock.patch.object(search_registry, 'invalidate') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                Setting.objects.create(key='test.one', value='1')
+                Setting.objects.create(key='test.two', value='2')
+                # Nothing is broadcast before the commit
+                invalidate.assert_not_called()
+            invalidate.assert_called_once()
+
+    def test_batch(self):
+        with mock.patch.object(search_registry, 'invalidate') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with search_registry.batch():
+                    for i in range(10):
+                        Setting.objects.create(key=f'test.{i}', value=str(i))
+            self.assertEqual(len(callbacks), 1)
+            invalidate.assert_called_once()
+
+
+@override_settings(SEARCH_RESULT_CACHE_ENABLED=False, SEARCH_CONFIG_BROADCAST_CACHE=None)
+class HotPathQueryTestCase(TestCase):
+    # Once the search configuration is loaded, search pages must be served without any database queries
+
+    solr_data = {
+        'responseHeader': {'QTime': 1},
+        'response': {'numFound': 1, 'start': 0, 'docs': [{'id': 'r1', 'title_en': 'Title', 'owner_org': 'tbs'}]},
+        'facet_counts': {'facet_fields': {'owner_org': ['tbs', 1]}},
+        'highlighting': {},
+        'moreLikeThis': {'r1': {'docs': [{'id': 'r2', 'title_en': 'Other title', 'owner_org': 'tbs'}]}},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        search = Search.objects.create(search_id='test', label_en='Test', label_fr='Test', solr_core_name='core_test',
+                                       results_sort_order_en='score desc', results_sort_order_display_en='Best match',
+                                       results_sort_order_fr='score desc', results_sort_order_display_fr='Pertinence',
+                                       json_response=True, mlt_enabled=True)
+        Field.objects.create(field_id='title_en', search_id=search, label_en='Title', label_fr='Titre',
+                             solr_field_lang='en', solr_field_type='search_text_en', is_default_display=True)
+        owner_org = Field.objects.create(field_id='owner_org', search_id=search, label_en='Organization',
+                                         label_fr='Organisation', solr_field_lang='bi', solr_field_is_coded=True,
+                                         is_search_facet=True, solr_facet_sort='label', is_default_display=True)
+        Code.objects.create(code_id='tbs', field_fid=owner_org, label_en='Treasury Board', label_fr='Conseil du Trésor')
+        Setting.objects.create(key='search.searchpage.topmessage.en', value='Top message')
+
+    def setUp(self):
+        search_registry.invalidate(broadcast=False)
+        solr = mock.Mock()
+        solr.query.side_effect = lambda *args, **kwargs: SolrResponse(self.solr_data)
+        self.solr = solr
+        # The page templates include snippets from the custom searches, which are not part of this repository, so
+        # only the template context is checked
+        self.rendered = []
+        for patcher in [mock.patch.object(views, 'get_solr_client', return_value=solr),
+                        mock.patch.object(views, 'render', side_effect=self.render)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def render(self, request, template_name, context=None, status=200):
+        self.rendered.append((template_name, context))
+        return HttpResponse(template_name, status=status)
+
+    def get(self, view_class, path, data=None, headers=None, status_code=200, **kwargs):
+        request = RequestFactory().get(path, data or {}, headers=headers)
+        request.LANGUAGE_CODE = 'en'
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        response = view_class.as_view()(request, lang='en', **kwargs)
+        self.assertEqual(response.status_code, status_code)
+        if self.rendered:
+            self.assertNotEqual(self.rendered[-1][0], 'error.html')
+        return response
+
+    def assertWarmRequestWithoutQueries(self, view_class, path, data=None, **kwargs):
+        # The first request loads the configuration and the code tables
+        self.get(view_class, path, data, **kwargs)
+        with self.assertNumQueries(0):
+            return self.get(view_class, path, data, **kwargs)
+
+    def test_search(self):
+        self.assertWarmRequestWithoutQueries(views.SearchView, '/search/en/test/', {'search_text': 'title'},
+                                             search_type='test')
+        self.assertEqual(self.rendered[-1][1]['general_msg'], 'Top message')
+
+    def test_record(self):
+        self.assertWarmRequestWithoutQueries(views.RecordView, '/search/en/test/record/r1', search_type='test',
+                                             record_id='r1')
+
+    def test_more_like_this(self):
+        self.assertWarmRequestWithoutQueries(views.MoreLikeThisView, '/search/en/test/similar/r1', search_type='test',
+                                             record_id='r1')
+
+    def test_json(self):
+        response = self.assertWarmRequestWithoutQueries(views.SearchView, '/search/en/test/',
+                                                        {'search_format': 'json'}, search_type='test')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_api(self):
+        response = self.assertWarmRequestWithoutQueries(views.SearchApiView, '/search/api/v1/en/test/',
+                                                        {'fields': 'title_en', 'facets': 'owner_org'},
+                                                        search_type='test', version=1)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['num_found'], 1)
+        self.assertEqual(data['docs'][0]['id'], 'r1')
+        self.assertEqual(data['facets']['owner_org'][0]['label_fr'], 'Conseil du Trésor')
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                               'results': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                           'LOCATION': 'test_results'}},
+                       SEARCH_RESULT_CACHE_ENABLED=True, SEARCH_RESULT_CACHE_ALIAS='results',
+                       SEARCH_HTTP_CACHE_ENABLED=True)
+    def test_conditional_get(self):
+        response = self.get(views.SearchView, '/search/en/test/', search_type='test')
+        etag = response['ETag']
+        self.assertEqual(response['Surrogate-Key'], 'search-core-core_test')
+        queries = self.solr.query.call_count
+        rendered = len(self.rendered)
+        response = self.get(views.SearchView, '/search/en/test/', headers={'If-None-Match': etag}, status_code=304,
+                            search_type='test')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.solr.query.call_count, queries)
+        self.assertEqual(len(self.rendered), rendered)
+        # Loading data into the core changes the ETag
+        bump_index_generation('core_test')
+        response = self.get(views.SearchView, '/search/en/test/', headers={'If-None-Match': etag}, search_type='test')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Last-Modified', response)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                               'fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                             'LOCATION': 'test_fragments'}},
+                       SEARCH_FRAGMENT_CACHE_ALIAS='fragments')
+    def test_fragment_cache_keys(self):
+        self.get(views.SearchView, '/search/en/test/', search_type='test')
+        self.get(views.SearchView, '/search/en/test/', {'page': '2'}, search_type='test')
+        self.get(views.SearchView, '/search/en/test/', {'owner_org': 'tbs'}, search_type='test')
+        first, second, filtered = [context for template_name, context in self.rendered[-3:]]
+        self.assertEqual(first['facets_fragment_key'], second['facets_fragment_key'])
+        self.assertEqual(first['results_fragment_key'], second['results_fragment_key'])
+        self.assertNotEqual(first['facets_fragment_key'], filtered['facets_fragment_key'])
+        # The snippets in the fragments may show the search text
+        self.get(views.SearchView, '/search/en/test/', {'search_text': 'title'}, search_type='test')
+        searched = self.rendered[-1][1]
+        self.assertNotEqual(first['facets_fragment_key'], searched['facets_fragment_key'])
+        self.assertNotEqual(first['results_fragment_key'], searched['results_fragment_key'])
+
+    def test_next_cursor(self):
+        view = views.SearchView()
+        docs = [{'id': 'r1'}, {'id': 'r2'}]
+        solr_response = SolrResponse({'response': {'numFound': 3, 'docs': docs}, 'nextCursorMark': 'AoE'})
+        self.assertEqual(view.get_next_cursor({'cursorMark': '*', 'rows': 2}, solr_response), 'AoE')
+        self.assertIsNone(view.get_next_cursor({'rows': 2}, solr_response))
+        # No next cursor on the last page, whether it is full or not
+        self.assertIsNone(view.get_next_cursor({'cursorMark': 'AoE', 'rows': 2}, solr_response))
+        solr_response = SolrResponse({'response': {'numFound': 3, 'docs': docs[:1]}, 'nextCursorMark': 'AoF'})
+        self.assertIsNone(view.get_next_cursor({'cursorMark': 'AoE', 'rows': 2}, solr_response))
+
+    @override_settings(SEARCH_CURSOR_PAGING=True, SEARCH_MAX_START_ROW=100)
+    def test_cursor_page_number(self):
+        # Only offset paging is limited, pages read with a cursor keep their number
+        self.solr_data = dict(self.solr_data, response=dict(self.solr_data['response'], numFound=20000))
+        self.get(views.SearchView, '/search/en/test/', {'page': '500'}, search_type='test')
+        self.assertEqual(self.rendered[-1][1]['currentpage'], 11)
+        self.get(views.SearchView, '/search/en/test/', {'page': '500', 'cursor': 'AoE'}, search_type='test')
+        self.assertEqual(self.rendered[-1][1]['currentpage'], 500)
+        self.assertEqual(self.solr.query.call_args[0][1]['cursorMark'], 'AoE')
+
+    def test_setting_change(self):
+        self.get(views.SearchView, '/search/en/test/', search_type='test')
+        Setting.objects.get(key='search.searchpage.topmessage.en').delete()
+        self.get(views.SearchView, '/search/en/test/', search_type='test')
+        self.assertEqual(self.rendered[-1][1]['general_msg'], '')
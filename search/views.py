@@ -1,38 +1,61 @@
-import collections
+from concurrent.futures import ThreadPoolExecutor, wait
 import csv
+import hashlib
 from datetime import datetime
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.core.cache import caches
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import HttpRequest, HttpResponseRedirect, FileResponse, JsonResponse
+from django.http import HttpRequest, HttpResponse, HttpResponseRedirect, FileResponse, JsonResponse, \
+    StreamingHttpResponse
 from django.utils import translation
 from django.utils.translation import gettext as _, activate
 from django.views.generic import View
 from django.shortcuts import render, redirect
-import importlib
 import logging
-from nltk.tokenize.regexp import RegexpTokenizer
 import os
-import pkgutil
 import platform
 import re
-from .query import calc_pagination_range, calc_starting_row, create_solr_query, create_solr_mlt_query, create_post_solr_query
-from search.models import Search, Field, Code, Setting  
+import threading
+from .query import calc_pagination_range, calc_starting_row, create_solr_query, create_solr_mlt_query, create_post_solr_query, \
+    add_legacy_facet_counts, remove_cursor_sort, QueryBuilder, to_query_dict
+from search import metrics
+from search.facets import FacetResult
+from search.fragment_cache import facets_fragment_key, results_fragment_key
+from search.http_cache import add_cache_headers, get_etag, not_modified_response
+from search.json_api import iter_json_object
+from search.models import Search
+from search.query_parser import parse_query_text
+from search.registry import get_search_config, get_default_display_fields, get_plugins, search_registry
+from search.result_cache import cached_query, acached_query, get_index_generation, get_result_cache, \
+    is_partial_response
+from search.solr_connections import get_solr_client, get_async_solr_client
 from django_celery_results.models import TaskResult
-import search.plugins
-from SolrClient2 import SolrClient, SolrResponse
+from SolrClient2 import SolrResponse
 from SolrClient2.exceptions import ConnectionError, SolrError
 from search.tasks import export_search_results_csv
-from unidecode import unidecode
 from urllib import parse
 
 
-def iter_namespace(ns_pkg):
-    # Specifying the second argument (prefix) to iter_modules makes the
-    # returned name an absolute name instead of a relative one. This allows
-    # import_module to work without having to do additional modification to
-    # the name.
-    return pkgutil.iter_modules(ns_pkg.__path__, ns_pkg.__name__ + ".")
+_federated_executor = None
+_federated_executor_lock = threading.Lock()
+_federated_executor_pid = None
+
+
+def get_federated_executor() -> ThreadPoolExecutor:
+    """
+    Get the thread pool shared by the federated searches of the process, with FEDERATED_SEARCH_WORKERS threads. A
+    pool per request would leave its threads blocked on slow Solr cores after the request gives up on them.
+    """
+    global _federated_executor, _federated_executor_pid
+    pid = os.getpid()
+    # Threads do not survive a fork, for example by uWSGI
+    if _federated_executor is None or _federated_executor_pid != pid:
+        with _federated_executor_lock:
+            if _federated_executor is None or _federated_executor_pid != pid:
+                _federated_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'FEDERATED_SEARCH_WORKERS', 8),
+                                                         thread_name_prefix='federated_search')
+                _federated_executor_pid = pid
+    return _federated_executor
 
 
 def log_search_results(request: HttpRequest, search_logger: logging.Logger, search_type: str = "", format: str = "html", page_type: str = "search", search_text: str = '', doc_count: int = 0, hostname = "None"):
@@ -53,7 +76,7 @@ def log_search_results(request: HttpRequest, search_logger: logging.Logger, sear
         search_format = query_values['search_format'][0]
     fq = []
     for q in query_values:
-        if q not in ['page', 'sort', 'search_text', 'search_format', '_gl', '_ga', 'wbdisable']:
+        if q not in ['page', 'sort', 'search_text', 'search_format', '_gl', '_ga', 'wbdisable', 'cursor']:
             fq.append(f"{q}:{parse.quote_plus(query_values[q][0])}")
     log_message = f'{hostname},{search_type},{page_type},{format},{request.session.session_key},{page},{sort},"{search_text}",{",".join(fq)},{doc_count}'
     search_logger.info(log_message)
@@ -139,6 +162,7 @@ class SearchView(View):
     display_fields_fr = {}
     display_fields_names_en = {}
     display_fields_names_fr = {}
+    setting_values = {}
 
     discovered_plugins = {}
 
@@ -148,132 +172,239 @@ class SearchView(View):
     def __init__(self):
         super().__init__()
 
-        # Original function copied from https://packaging.python.org/guides/creating-and-discovering-plugins/
-        self.discovered_plugins = {
-            name: importlib.import_module(name)
-            for finder, name, ispkg
-            in iter_namespace(search.plugins)
-        }
-
-        # Use a local memory cache for the DB objects
-        cache = caches['local']
+        self.discovered_plugins = get_plugins()
 
         self.hostname = platform.node()
-        # Load Search and Field configuration
-
-        if cache.get('searches') is None:
-            search_queryset = Search.objects.all()
-            for s in search_queryset:
-                self.searches[s.search_id] = s
-                if s.search_alias_en:
-                    self.search_alias_en[s.search_alias_en] = s.search_id
-                    self.reverse_search_alias_en[s.search_id] = s.search_alias_en
-                else:
-                    self.reverse_search_alias_en[s.search_id] = s.search_id
-                if s.search_alias_fr:
-                    self.search_alias_fr[s.search_alias_fr] = s.search_id
-                    self.reverse_search_alias_fr[s.search_id] = s.search_alias_fr
-                else:
-                    self.reverse_search_alias_fr[s.search_id] = s.search_id
-            cache.set('searches', self.searches, settings.CACHE_LOCAL_TIMEOUT)
-            cache.set('search_alias_en', self.search_alias_en, settings.CACHE_LOCAL_TIMEOUT + 10)
-            cache.set('search_alias_fr', self.search_alias_fr, settings.CACHE_LOCAL_TIMEOUT + 10)
-            cache.set('reverse_search_alias_en', self.reverse_search_alias_en, settings.CACHE_LOCAL_TIMEOUT + 10)
-            cache.set('reverse_search_alias_fr', self.reverse_search_alias_fr, settings.CACHE_LOCAL_TIMEOUT + 10)
-        else:
-            self.searches = cache.get('searches')
-            self.search_alias_en = cache.get('search_alias_en')
-            self.search_alias_fr = cache.get('search_alias_fr')
-            self.reverse_search_alias_en = cache.get('reverse_search_alias_en')
-            self.reverse_search_alias_fr = cache.get('reverse_search_alias_fr')
-
-        if cache.get('fields') is None:
-            for sid in self.searches.keys():
-                sfields = {}
-                facet_list_en = []
-                facet_list_fr = []
-                display_list_en = []
-                display_list_fr = []
-                field_queryset = Field.objects.filter(search_id_id=sid)
-                for f in field_queryset:
-                    sfields[f.field_id] = f
-                field_queryset = Field.objects.filter(search_id_id=sid).filter(is_search_facet=True).order_by('solr_facet_display_order')
-                for f in field_queryset:
-                    if f.solr_field_lang == 'en':
-                        facet_list_en.append(f.field_id)
-                    elif f.solr_field_lang == 'fr':
-                        facet_list_fr.append(f.field_id)
-                    elif f.solr_field_lang == 'bi':
-                        facet_list_en.append(f.field_id)
-                        facet_list_fr.append(f.field_id)
-                field_queryset = Field.objects.filter(search_id_id=sid).filter(is_default_display=True)
-                for f in field_queryset:
-                    if f.is_default_display and f.solr_field_lang == 'en':
-                        display_list_en.append(f.field_id)
-                    elif f.is_default_display and f.solr_field_lang == 'fr':
-                        display_list_fr.append(f.field_id)
-                    elif f.is_default_display and f.solr_field_lang == 'bi':
-                        display_list_en.append(f.field_id)
-                        display_list_fr.append(f.field_id)
-
-                self.fields[sid] = sfields
-                self.facets_en[sid] = facet_list_en
-                self.facets_fr[sid] = facet_list_fr
-                self.display_fields_en[sid] = display_list_en
-                self.display_fields_fr[sid] = display_list_fr
-                self.display_fields_names_en[sid] = self.get_default_display_fields('en', sid)
-                self.display_fields_names_fr[sid] = self.get_default_display_fields('fr', sid)
-
-            cache.set('fields', self.fields, settings.CACHE_LOCAL_TIMEOUT)
-            cache.set('facets_en', self.facets_en, settings.CACHE_LOCAL_TIMEOUT + 10)
-            cache.set('facets_fr', self.facets_fr, settings.CACHE_LOCAL_TIMEOUT + 10)
-            cache.set('display_fields_en', self.display_fields_en, settings.CACHE_LOCAL_TIMEOUT + 10)
-            cache.set('display_fields_fr', self.display_fields_fr, settings.CACHE_LOCAL_TIMEOUT + 10)
-            cache.set('display_fields_names_en', self.display_fields_names_en, settings.CACHE_LOCAL_TIMEOUT + 10)
-            cache.set('display_fields_names_fr', self.display_fields_names_fr, settings.CACHE_LOCAL_TIMEOUT + 10)
 
-        else:
-            self.fields = cache.get('fields')
-            self.facets_en = cache.get('facets_en')
-            self.facets_fr = cache.get('facets_fr')
-            self.display_fields_en = cache.get('display_fields_en')
-            self.display_fields_fr = cache.get('display_fields_fr')
-            self.display_fields_names_en = cache.get('display_fields_names_en')
-            self.display_fields_names_fr = cache.get('display_fields_names_fr')
-
-        # Load Code configuration
-        if cache.get('codes_en') is None:
-            self.codes_en = {}
-            self.codes_fr = {}
-            for sid in self.searches.keys():
-                self.codes_en[sid] = {}
-                self.codes_fr[sid] = {}
-                codes_queryset = Code.objects.filter(field_fid__search_id__search_id=sid)
-                for code in codes_queryset:
-                    # Codes are stored in a dictionary with the code_id as the key
-                    if code.field_fid.field_id in self.codes_en[sid]:
-                        self.codes_en[sid][code.field_fid.field_id][code.code_id] = code.label_en
-                        self.codes_fr[sid][code.field_fid.field_id][code.code_id] = code.label_fr
-                    else:
-                        self.codes_en[sid][code.field_fid.field_id] = {code.code_id: code.label_en}
-                        self.codes_fr[sid][code.field_fid.field_id] = {code.code_id: code.label_fr}
-            cache.set('codes_en', self.codes_en, settings.CACHE_LOCAL_TIMEOUT)
-            cache.set('codes_fr', self.codes_fr, settings.CACHE_LOCAL_TIMEOUT)
-        else:
-            self.codes_en = cache.get('codes_en')
-            self.codes_fr = cache.get('codes_fr')
+        self.load_config()
+
+    def load_config(self):
+        # Search, Field and Code configuration is shared by all requests through a process-wide snapshot that is
+        # only rebuilt when the configuration changes
+        config = get_search_config()
+        self.search_config = config
+        self.config_version = config.version
+        self.searches = config.searches
+        self.search_alias_en = config.search_alias_en
+        self.search_alias_fr = config.search_alias_fr
+        self.reverse_search_alias_en = config.reverse_search_alias_en
+        self.reverse_search_alias_fr = config.reverse_search_alias_fr
+        self.fields = config.fields
+        self.facets_en = config.facets_en
+        self.facets_fr = config.facets_fr
+        self.display_fields_en = config.display_fields_en
+        self.display_fields_fr = config.display_fields_fr
+        self.display_fields_names_en = config.display_fields_names_en
+        self.display_fields_names_fr = config.display_fields_names_fr
+        self.codes_en = config.codes_en
+        self.codes_fr = config.codes_fr
+        self.setting_values = config.settings
 
     def get_default_display_fields(self, lang: str, search_type: str):
-        display_field_name = {}
-        for f in self.fields[search_type]:
-            if self.fields[search_type][f].solr_field_lang in [lang, 'bi']:
-                if lang == 'en' and not f[:2] == 'fr':
-                    display_field_name[f] = self.fields[search_type][f].label_en
-                    continue
-                elif lang == 'fr' and not f[:2] == 'en':
-                    display_field_name[f] = self.fields[search_type][f].label_fr
-                    continue
-        return display_field_name
+        return get_default_display_fields(self.fields[search_type], lang)
+
+    def get_query_skeleton(self, search_type: str, lang: str, mode: str):
+        return self.search_config.get_query_skeleton(search_type, lang, mode)
+
+    def query_solr(self, solr, search_type: str, solr_query: dict, **kwargs) -> SolrResponse:
+        """
+        Send a query to the Solr core of the search. The response is returned from the Solr result cache when
+        result caching is enabled.
+        """
+        solr_response = cached_query(solr, self.searches[search_type].solr_core_name, solr_query,
+                                     plugin_version=self.get_plugin_version(search_type), **kwargs)
+        add_legacy_facet_counts(solr_response.data, solr_query, self.fields[search_type])
+        return solr_response
+
+    @staticmethod
+    def is_num_found_exact(solr_response: SolrResponse) -> bool:
+        """
+        :return: False if Solr stopped counting the hits and numFound is a lower bound, see Search.solr_min_exact_count
+        """
+        return solr_response.data.get('response', {}).get('numFoundExact', True)
+
+    def get_facet_results(self, search_type: str, solr_response: SolrResponse, lang: str) -> dict:
+        """
+        Read the facet counts of a Solr response into FacetResult objects, in the order of the response. The values
+        of the facets sorted by label are reordered with the label ranks precomputed in the code tables.
+        :return: dictionary of FacetResult keyed by field ID
+        """
+        facet_fields = solr_response.data.get('facet_counts', {}).get('facet_fields', {})
+        codes_en = self.codes_en[search_type]
+        codes_fr = self.codes_fr[search_type]
+        facet_results = {}
+        for f, facet_field in facet_fields.items():
+            field = self.fields[search_type][f]
+            facet = FacetResult.from_solr(f, facet_field, field.label_fr if lang == 'fr' else field.label_en,
+                                          field.solr_facet_sort, lang, codes_en.get(f), codes_fr.get(f))
+            # If the facet is a code and sorting by label, then the facet needs to be resorted
+            if field.solr_facet_sort == 'label':
+                self.sort_facet_by_label(search_type, facet)
+            facet_results[f] = facet
+        return facet_results
+
+    def sort_facet_by_label(self, search_type: str, facet: FacetResult):
+        """
+        Reorder the values of a coded facet by their labels. Values that are not codes of the field are dropped and
+        counted in the unknown_facet_value metric.
+        """
+        codes = (self.codes_fr if facet.lang == 'fr' else self.codes_en)[search_type].get(facet.field_id, {})
+        facet_values = [v for v in facet.values if v != '-']
+        if codes:
+            sorted_facet_values, unknown_values = codes.sort_by_label(facet_values)
+        else:
+            sorted_facet_values, unknown_values = [], facet_values
+        for facet_value in unknown_values:
+            if metrics.increment('unknown_facet_value', search_type, facet.field_id, facet_value) == 1:
+                self.logger.info(f"Unknown facet_value {facet.field_id}:{facet_value}, later occurrences are only counted")
+        facet.reorder(sorted_facet_values)
+
+    def get_facets_json(self, search_type: str, facets, lang: str) -> dict:
+        """
+        :return: the facets of the context with the codes and labels of their values in both languages, for the JSON
+        responses
+        """
+        facets_json = {}
+        for f, facet in (facets.items() if facets else ()):
+            facet = FacetResult.from_mapping(f, facet, lang, self.codes_en[search_type].get(f),
+                                             self.codes_fr[search_type].get(f))
+            facets_json[f] = facet.to_json()
+        return facets_json
+
+    @staticmethod
+    def get_max_start_row(cursor):
+        """
+        :param cursor: the Solr cursor of the request, if any
+        :return: the highest starting row of the search results, or None when the results are read with a cursor, which
+        does not page deeply, so that the page number of the request is kept for the pagination
+        """
+        if cursor and getattr(settings, 'SEARCH_CURSOR_PAGING', False):
+            return None
+        return getattr(settings, 'SEARCH_MAX_START_ROW', None)
+
+    def get_next_cursor(self, solr_query: dict, solr_response: SolrResponse):
+        """
+        :return: the Solr cursor for the next page of results, or None if the query did not use a cursor or there
+        are no more results
+        """
+        cursor = solr_query.get('cursorMark')
+        if not cursor:
+            return None
+        next_cursor = solr_response.data.get('nextCursorMark')
+        if next_cursor == cursor or len(solr_response.docs) < solr_query.get('rows', 10):
+            return None
+        return next_cursor
+
+    def get_plugin_version(self, search_type: str):
+        search_type_plugin = 'search.plugins.{0}'.format(search_type)
+        if search_type_plugin in self.discovered_plugins:
+            return self.discovered_plugins[search_type_plugin].plugin_api_version()
+        return ''
+
+    def call_pre_query_plugin(self, hook: str, request: HttpRequest, prepared: dict):
+        """
+        Call the pre-solr-query hook of the custom search plugin, if defined, which may change the context and query
+        """
+        if prepared['search_type_plugin'] in self.discovered_plugins:
+            plugin_hook = getattr(self.discovered_plugins[prepared['search_type_plugin']], hook)
+            prepared['context'], prepared['solr_query'] = plugin_hook(prepared['context'],
+                                                                      prepared['solr_query'],
+                                                                      request,
+                                                                      *prepared['plugin_args'])
+
+    def call_post_query_plugin(self, hook: str, request: HttpRequest, prepared: dict, solr_response: SolrResponse) -> SolrResponse:
+        """
+        Call the post-solr-query hook of the custom search plugin, if defined, which may change the context and
+        the Solr response
+        """
+        if prepared['search_type_plugin'] in self.discovered_plugins:
+            plugin_hook = getattr(self.discovered_plugins[prepared['search_type_plugin']], hook)
+            prepared['context'], result = plugin_hook(prepared['context'],
+                                                      solr_response,
+                                                      prepared['solr_query'],
+                                                      request,
+                                                      *prepared.get('post_plugin_args', prepared['plugin_args']))
+            # post_mlt_solr_query has always been expected to return the query, so its result is not used
+            if hook != 'post_mlt_solr_query':
+                solr_response = result
+        return solr_response
+
+    def get_config_generation(self):
+        """
+        :return: the generation of the search configuration of the view, for the keys of the cached pages and fragments
+        """
+        config_generation = search_registry.generation
+        if config_generation is None:
+            # Without the shared generation counter, the generation is only stable within a process
+            config_generation = f"local-{self.search_config.version}"
+        return config_generation
+
+    def add_fragment_cache_keys(self, request: HttpRequest, search_type: str, lang: str, context: dict,
+                                solr_response: SolrResponse):
+        """
+        Add the cache keys of the facet list and the result list to the context of a search page, see
+        search/fragment_cache.py
+        """
+        config_generation = self.get_config_generation()
+        search_text = context.get('search_text', '')
+        context['facets_fragment_key'] = facets_fragment_key(search_type, lang, config_generation,
+                                                             context.get('facets'), context.get('selected_facets'),
+                                                             search_text, request.path)
+        try:
+            index_generation = get_index_generation(self.searches[search_type].solr_core_name)
+        except Exception as x:
+            self.logger.warning(f"Unable to read the index generation for search {search_type}: {x}")
+            index_generation = None
+        context['results_fragment_key'] = None if index_generation is None else \
+            results_fragment_key(search_type, lang, config_generation, index_generation, request.path,
+                                 context.get('docs', []), solr_response.data.get('highlighting', {}), search_text,
+                                 context.get('sort', ''), context.get('currentpage'))
+
+    def get_etag(self, request: HttpRequest, search_type: str, solr_query: dict, variant: str, **kwargs):
+        """
+        :param variant: the kind of page and anything else the page depends on that is not part of the Solr query
+        :return: the ETag of the page for a Solr query, or None if HTTP caching is disabled
+        """
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return get_etag(variant, self.get_config_generation(), self.searches[search_type].solr_core_name, solr_query,
+                        plugin_version=self.get_plugin_version(search_type), **kwargs)
+
+    def add_cache_headers(self, response: HttpResponse, etag, search_type: str, solr_response: SolrResponse):
+        """
+        Add the ETag, Last-Modified and surrogate key headers to a page rendered from a complete Solr response
+        """
+        if etag is not None and response.status_code == 200 and not getattr(solr_response, 'is_stale', False) \
+                and not is_partial_response(solr_response):
+            add_cache_headers(response, etag, self.searches[search_type].solr_core_name)
+        return response
+
+    def run_query(self, request: HttpRequest, prepared: dict, pre_hook: str, post_hook: str, render_page):
+        """
+        Query Solr for a prepared search, record or more-like-this request, with the plugin hooks called before and
+        after the query, and render the page. A conditional request for an unchanged page is answered with 304 Not
+        Modified without querying Solr.
+        :param prepared: the context, Solr query and plugin arguments returned by one of the prepare methods
+        :param render_page: the method that renders the page from the prepared request and the Solr response
+        """
+        search_type = prepared['search_type']
+        self.call_pre_query_plugin(pre_hook, request, prepared)
+        etag = self.get_etag(request, search_type, prepared['solr_query'],
+                             f"{pre_hook}:{prepared['lang']}:{request.GET.get('search_format', 'html')}",
+                             **prepared['query_kwargs'])
+        if etag is not None:
+            not_modified = not_modified_response(request, etag)
+            if not_modified is not None:
+                return add_cache_headers(not_modified, etag, self.searches[search_type].solr_core_name)
+        try:
+            solr_response = self.query_solr(get_solr_client(), search_type, prepared['solr_query'],
+                                            **prepared['query_kwargs'])
+        except (ConnectionError, SolrError) as ce:
+            return render(request, 'error.html', get_error_context(search_type, prepared['lang'], ce.args[0]))
+        prepared['context']['stale_results'] = getattr(solr_response, 'is_stale', False)
+        prepared['context']['partial_results'] = is_partial_response(solr_response)
+        solr_response = self.call_post_query_plugin(post_hook, request, prepared, solr_response)
+        return self.add_cache_headers(render_page(request, prepared, solr_response), etag, search_type, solr_response)
 
     def default_context(self, request: HttpRequest, search_type: str, lang: str):
         context = {
@@ -335,6 +466,17 @@ class SearchView(View):
         return context
 
     def get(self, request: HttpRequest, lang='en', search_type=''):
+        prepared = self.prepare_search(request, lang, search_type)
+        if isinstance(prepared, HttpResponse):
+            return prepared
+        return self.run_query(request, prepared, 'pre_search_solr_query', 'post_search_solr_query', self.render_search)
+
+    def prepare_search(self, request: HttpRequest, lang='en', search_type=''):
+        """
+        Build the page context and Solr query for a search page.
+        :return: a dictionary with the prepared request for run_query(), or an HttpResponse for a page that does not
+        need a Solr query (errors, disabled searches)
+        """
 
         lang = request.LANGUAGE_CODE
 
@@ -372,23 +514,12 @@ class SearchView(View):
             context['main_content_body_top_snippet'] = self.searches[search_type].main_content_body_top_snippet
 
             # Get search drop in message:
-            context["general_msg"] = ""
-            if lang == 'en':
-                search_msg_en, is_new = Setting.objects.get_or_create(key="search.searchpage.topmessage.en")
-                if not is_new:
-                    context["general_msg"] = search_msg_en.value
-            else:
-                search_msg_fr, is_new = Setting.objects.get_or_create(key="search.searchpage.topmessage.fr")
-                if not is_new:
-                    context["general_msg"] = search_msg_fr.value
-
-            solr = SolrClient(settings.SOLR_SERVER_URL)
-
-            core_name = self.searches[search_type].solr_core_name
+            context["general_msg"] = self.setting_values.get(f"search.searchpage.topmessage.{'fr' if lang == 'fr' else 'en'}", "")
 
             # Get the search result boundaries
             start_row, page = calc_starting_row(request.GET.get('page', 1),
-                                                rows_per_page=self.searches[search_type].results_page_size)
+                                                rows_per_page=self.searches[search_type].results_page_size,
+                                                max_start_row=self.get_max_start_row(request.GET.get('cursor')))
 
             # Link to Reset the search
             context['reset_path'] = f"{request.scheme}://{request.get_host()}{request.path}"        
@@ -401,23 +532,17 @@ class SearchView(View):
                     reversed_facets.append(facet)
             context['reversed_facets'] = reversed_facets
 
-            # Determine a default sort order - used by the query if a valid sort order is not specified --
-            # unless this is the first time a user is using search text, then use best match order.
-            # Use the default specified in the search model and if none is specified used best match.
-
-            if new_text_search:
-                default_sort_order = 'score desc'
-            elif request.LANGUAGE_CODE == 'fr':
-                default_sort_order = self.searches[search_type].results_sort_default_fr if self.searches[
-                    search_type].results_sort_default_fr else 'score desc'
-            else:
-                default_sort_order = self.searches[search_type].results_sort_default_en if self.searches[search_type].results_sort_default_en else 'score desc'
+            # The query uses the default sort order of the search if a valid sort order is not specified, unless this
+            # is the first time a user is using search text, then it uses best match order.
 
             solr_query = create_solr_query(request, self.searches[search_type], self.fields[search_type],
                                            self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
                                            facets, start_row, self.searches[search_type].results_page_size,
                                            record_id='', export=False, highlighting=True,
-                                           default_sort=default_sort_order, override_sort=new_text_search)
+                                           override_sort=new_text_search,
+                                           skeleton=self.get_query_skeleton(search_type, lang, 'search'),
+                                           cursor_paging=getattr(settings, 'SEARCH_CURSOR_PAGING', False),
+                                           project_results=request.GET.get('search_format', 'html') == 'html')
             # If the solr_query contains an error, then there was a problem with the request and
             # a 400 error page should be returned instead.
 
@@ -429,200 +554,21 @@ class SearchView(View):
                 self.logger.info(f"Invalid search query: {solr_query['error_search_path']}")
                 return render(request, '400.html', error_context, status=400)  
 
-            # Call  plugin pre-solr-query if defined
+            # The Solr query and the plugin pre and post query hooks are run by run_query()
             search_type_plugin = 'search.plugins.{0}'.format(search_type)
-            if search_type_plugin in self.discovered_plugins:
-                context, solr_query = self.discovered_plugins[search_type_plugin].pre_search_solr_query(
-                    context,
-                    solr_query,
-                    request,
-                    self.searches[search_type], self.fields[search_type],
-                    self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                    facets,
-                    '')
-
-            # Query Solr
-
-            try:
-                solr_response = solr.query(core_name, solr_query, highlight=True)
-
-                # Call  plugin post-solr-query if it exists
-                if search_type_plugin in self.discovered_plugins:
-                    context, solr_response = self.discovered_plugins[search_type_plugin].post_search_solr_query(
-                        context,
-                        solr_response,
-                        solr_query,
-                        request,
-                        self.searches[search_type], self.fields[search_type],
-                        self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                        facets,
-                        '')
-
-                context['show_all_results'] = True
-                for p in request.GET:
-                    if p not in ['encoding', 'page', 'sort']:
-                        context['show_all_results'] = False
-                        break
-
-                context['system_facet_fields'] = ['__label__', '__sortorder__']
-                if len(facets) > 0:
-                    # Facet search results
-                    context['facets'] = solr_response.get_facets()
-                    # Get the selected facets from the search URL
-                    selected_facets = {}
-
-                    for request_field in request.GET.keys():
-                        if request_field in self.fields[search_type] and request_field in context['facets']:
-                            selected_facets[request_field] = request.GET.get(request_field, "").split('|')
-                    context['selected_facets'] = selected_facets
-                    # Provide human friendly facet labels to the web page and any custom snippets
-                    facets_custom_snippets = {}
-                    for f in context['facets']:
-                        context['facets'][f]['__label__'] = self.fields[search_type][f].label_fr if lang == 'fr' else self.fields[search_type][f].label_en
-                        context['facets'][f]['__sortorder__'] = self.fields[search_type][f].solr_facet_sort
-                        # If the facet is a code and sorting by label, then the facet needs to be resorted
-                        if self.fields[search_type][f].solr_facet_sort == 'label':
-                            # Create an inverted index of the facet values
-                            facet_values = {}
-                            for facet_value in context['facets'][f].keys():
-                                if facet_value not in context['system_facet_fields'] and facet_value != '-' and facet_value in self.codes_en[search_type][f]:
-                                    if request.LANGUAGE_CODE == 'fr':
-                                        facet_values[self.codes_fr[search_type][f][facet_value]] = facet_value
-                                    else:
-                                        facet_values[self.codes_en[search_type][f][facet_value]] = facet_value
-                                elif facet_value not in context['system_facet_fields'] and facet_value != '-' and facet_value not in self.codes_en[search_type][f]:
-                                    self.logger.info(f"Unknown facet_value {f}:{facet_value}")
-                            # Sort the facet values - use French locale for sorting
-                            if lang == "fr":
-                                sorted_facet_values = sorted(facet_values.keys(), key=unidecode)
-                            else:
-                                sorted_facet_values = sorted(facet_values.keys())
-                            new_facet = collections.OrderedDict()
-                            for facet_value in sorted_facet_values:
-                                new_facet[facet_values[facet_value]] = context['facets'][f][facet_values[facet_value]]
-                            new_facet['__label__'] = context['facets'][f]['__label__']
-                            new_facet['__sortorder__'] = context['facets'][f]['__sortorder__']
-                            context['facets'][f] = new_facet
-
-                        if self.fields[search_type][f].solr_facet_snippet:
-                            facets_custom_snippets[f] = self.fields[search_type][f].solr_facet_snippet
-                    context['facet_snippets'] = facets_custom_snippets
-                else:
-                    context['facets'] = []
-                    context['selected_facets'] = []
-
-                context['total_hits'] = solr_response.num_found
-                context['docs'] = solr_response.get_highlighting()
-
-                # Prepare a dictionary of language appropriate sort options
-                sort_options = {}
-                sort_labels = self.searches[search_type].results_sort_order_display_fr.split(',') if lang == 'fr' else self.searches[search_type].results_sort_order_display_en.split(',')
-                if lang == 'fr':
-                    for i, v in enumerate(self.searches[search_type].results_sort_order_fr.split(',')):
-                        sort_options[v] = str(sort_labels[i]).strip()
-                else:
-                    for i, v in enumerate(self.searches[search_type].results_sort_order_en.split(',')):
-                        sort_options[v] = str(sort_labels[i]).strip()
-                context['sort_options'] = sort_options
-                context['sort'] = solr_query['sort']
-
-                # Add code information
-                context['codes'] = self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type]
-
-                # Save display fields
-                context['default_display_fields'] = self.display_fields_fr[search_type] if lang == 'fr' else self.display_fields_en[search_type]
-                context['display_field_name'] = self.display_fields_names_fr[search_type] if lang == 'fr' else self.display_fields_names_en[search_type]
-
-                # Calculate pagination for the search page
-                context['pagination'] = calc_pagination_range(solr_response.num_found, self.searches[search_type].results_page_size, page, 3)
-                if len(context['pagination']) == 1:
-                    context['show_pagination'] = False
-                else:
-                    
-                    # Calculate the pagination values for the bottom of the search results page
-                    context['show_pagination'] = True
-                    context['previous_page'] = (1 if page == 1 else page - 1)
-                    last_page = (context['pagination'][len(context['pagination']) - 1] if len(context['pagination']) > 0 else 1)
-                    last_page = (1 if last_page < 1 else last_page)
-                    context['last_page'] = last_page
-                    next_page = page + 1
-                    next_page = (last_page if next_page > last_page else next_page)
-                    context['next_page'] = next_page
-                    context['currentpage'] = page
-                    
-                    # Recreate the query string portion of the paging URL with the correct page and sort params
-                    get_params = request.GET.dict()
-                    get_params['page'] = "__page__"
-                    get_params['sort'] = context['sort']
-                    q_list = []
-                    for k,v in get_params.items():
-                        q_list.append(f"{k}={v}")
-                    pgntn_url_querystr = "&".join(q_list).replace(' ', '+')
-                    context['pgntn_path'] = f"{request.scheme}://{request.get_host()}{request.path}?{pgntn_url_querystr}"
-
-                if search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() == 1.1:
-                    context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
-                                                                                                      self.searches[search_type].page_template,
-                                                                                                      request,
-                                                                                                      lang,
-                                                                                                      self.searches[search_type],
-                                                                                                      self.fields[search_type],
-                                                                                                      self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type])
-                elif search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() >= 1.2:
-                    context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
-                                                                                                      self.searches[search_type].page_template,
-                                                                                                      request,
-                                                                                                      lang,
-                                                                                                      self.searches[search_type],
-                                                                                                      self.fields[search_type],
-                                                                                                      self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                                                                                                      view_type='search')
-                # Users can optionally get the search results as a JSON object instead of the normal HTML page
-                search_format = request.GET.get("search_format", "html")
-                if search_format == 'json' and self.searches[search_type].json_response:
-                    full_facet_dict = {}
-                    for facet in context['facets'].keys():
-                        facet_list = []
-                        for facet_field in context['facets'][facet]:
-                            if not facet_field.startswith('__'):
-                                if self.fields[context['search_type']][facet].solr_field_is_coded:
-                                    facet_dict = {
-                                        'code': facet_field,
-                                        'label_en': self.codes_en[context['search_type']][facet][facet_field],
-                                        'label_fr': self.codes_fr[context['search_type']][facet][facet_field],
-                                        'count': context['facets'][facet][facet_field]
-                                    }
-                                else:
-                                    facet_dict = {
-                                        'code': facet_field,
-                                        'label_en': facet_field,
-                                        'label_fr': facet_field,
-                                        'count': context['facets'][facet][facet_field]
-                                    }
-                                facet_list.append(facet_dict)
-                        full_facet_dict[facet] = facet_list
-                    doc_dict = {'num_count': context['total_hits'],
-                                'start': solr_response.data['response']['start'] + 1,
-                                'end': solr_response.data['response']['start'] + solr_response.docs.__len__(),
-                                'docs': context['docs'],
-                                'facets': full_facet_dict,
-                                'selected_facets': context['selected_facets'] if context['selected_facets'] else []}
-                    return JsonResponse(doc_dict)
-                elif search_format == 'solr' and self.searches[search_type].raw_solr_response:
-                    return JsonResponse(solr_response.data)
-                else:
-                    json_link = str(request.get_full_path())
-                    if json_link.endswith("/"):
-                        json_link = json_link + "?search_format=json"
-                    elif json_link.endswith("&") or json_link.endswith("?"):
-                        json_link = json_link + "search_format=json"
-                    else:
-                        json_link = json_link + "&search_format=json"
-                    context["json_format_url"] = json_link
-                    log_search_results(request, self.search_logger, search_type=search_type, format=search_format, page_type='search', doc_count=solr_response.num_found, hostname=self.hostname)
-                    return render(request, self.searches[search_type].page_template, context)
-            except (ConnectionError, SolrError) as ce:
-                return render(request, 'error.html', get_error_context(search_type, lang, ce.args[0]))
+            return {
+                'context': context,
+                'solr_query': solr_query,
+                'search_type': search_type,
+                'lang': lang,
+                'facets': facets,
+                'page': page,
+                'search_type_plugin': search_type_plugin,
+                'plugin_args': (self.searches[search_type], self.fields[search_type],
+                                self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
+                                facets, ''),
+                'query_kwargs': {'highlight': True},
+            }
         elif search_type in self.searches and self.searches[search_type].is_disabled:
             context = self.default_context(request, search_type, lang)
             context['label_en'] = self.searches[search_type].label_en
@@ -633,10 +579,171 @@ class SearchView(View):
         else:
             return render(request, '404.html', get_error_context(search_type, lang), status=404)
 
+    def render_search(self, request: HttpRequest, prepared: dict, solr_response: SolrResponse):
+        context = prepared['context']
+        solr_query = prepared['solr_query']
+        search_type = prepared['search_type']
+        lang = prepared['lang']
+        facets = prepared['facets']
+        page = prepared['page']
+        search_type_plugin = prepared['search_type_plugin']
+
+        context['show_all_results'] = True
+        for p in request.GET:
+            if p not in ['encoding', 'page', 'sort', 'cursor']:
+                context['show_all_results'] = False
+                break
+
+        context['system_facet_fields'] = ['__label__', '__sortorder__']
+        if len(facets) > 0:
+            # Facet search results
+            context['facets'] = self.get_facet_results(search_type, solr_response, lang)
+            # Get the selected facets from the search URL
+            selected_facets = {}
+
+            for request_field in request.GET.keys():
+                if request_field in self.fields[search_type] and request_field in context['facets']:
+                    selected_facets[request_field] = request.GET.get(request_field, "").split('|')
+            context['selected_facets'] = selected_facets
+            # Provide human friendly facet labels to the web page and any custom snippets
+            facets_custom_snippets = {}
+            for f in context['facets']:
+                if self.fields[search_type][f].solr_facet_snippet:
+                    facets_custom_snippets[f] = self.fields[search_type][f].solr_facet_snippet
+            context['facet_snippets'] = facets_custom_snippets
+        else:
+            context['facets'] = []
+            context['selected_facets'] = []
+
+        context['total_hits'] = solr_response.num_found
+        context['total_hits_exact'] = self.is_num_found_exact(solr_response)
+        context['docs'] = solr_response.get_highlighting()
+
+        # Prepare a dictionary of language appropriate sort options
+        sort_options = {}
+        sort_labels = self.searches[search_type].results_sort_order_display_fr.split(',') if lang == 'fr' else self.searches[search_type].results_sort_order_display_en.split(',')
+        if lang == 'fr':
+            for i, v in enumerate(self.searches[search_type].results_sort_order_fr.split(',')):
+                sort_options[v] = str(sort_labels[i]).strip()
+        else:
+            for i, v in enumerate(self.searches[search_type].results_sort_order_en.split(',')):
+                sort_options[v] = str(sort_labels[i]).strip()
+        context['sort_options'] = sort_options
+        context['sort'] = remove_cursor_sort(solr_query['sort'])
+        next_cursor = self.get_next_cursor(solr_query, solr_response)
+
+        # Add code information
+        context['codes'] = self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type]
+
+        # Save display fields
+        context['default_display_fields'] = self.display_fields_fr[search_type] if lang == 'fr' else self.display_fields_en[search_type]
+        context['display_field_name'] = self.display_fields_names_fr[search_type] if lang == 'fr' else self.display_fields_names_en[search_type]
+
+        # Calculate pagination for the search page
+        context['pagination'] = calc_pagination_range(solr_response.num_found, self.searches[search_type].results_page_size, page, 3,
+                                                      exact=context['total_hits_exact'])
+        if len(context['pagination']) == 1:
+            context['show_pagination'] = False
+        else:
+                    
+            # Calculate the pagination values for the bottom of the search results page
+            context['show_pagination'] = True
+            context['previous_page'] = (1 if page == 1 else page - 1)
+            last_page = (context['pagination'][len(context['pagination']) - 1] if len(context['pagination']) > 0 else 1)
+            last_page = (1 if last_page < 1 else last_page)
+            next_page = page + 1
+            if context['total_hits_exact']:
+                next_page = (last_page if next_page > last_page else next_page)
+            else:
+                # The number of pages is unknown
+                last_page = None
+            context['last_page'] = last_page
+            context['next_page'] = next_page
+            context['currentpage'] = page
+                    
+            # Recreate the query string portion of the paging URL with the correct page and sort params
+            get_params = request.GET.dict()
+            get_params.pop('cursor', None)
+            get_params['page'] = "__page__"
+            get_params['sort'] = context['sort']
+            q_list = []
+            for k,v in get_params.items():
+                q_list.append(f"{k}={v}")
+            pgntn_url_querystr = "&".join(q_list).replace(' ', '+')
+            context['pgntn_path'] = f"{request.scheme}://{request.get_host()}{request.path}?{pgntn_url_querystr}"
+
+            # The next page link continues from the Solr cursor of this page instead of using a row offset
+            if next_cursor and next_page == page + 1:
+                context['next_page_path'] = context['pgntn_path'].replace('__page__', str(next_page)) + \
+                                            f"&cursor={parse.quote(next_cursor, safe='')}"
+
+        if search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() == 1.1:
+            context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
+                                                                                              self.searches[search_type].page_template,
+                                                                                              request,
+                                                                                              lang,
+                                                                                              self.searches[search_type],
+                                                                                              self.fields[search_type],
+                                                                                              self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type])
+        elif search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() >= 1.2:
+            context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
+                                                                                              self.searches[search_type].page_template,
+                                                                                              request,
+                                                                                              lang,
+                                                                                              self.searches[search_type],
+                                                                                              self.fields[search_type],
+                                                                                              self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
+                                                                                              view_type='search')
+        # Users can optionally get the search results as a JSON object instead of the normal HTML page
+        search_format = request.GET.get("search_format", "html")
+        if search_format == 'json' and self.searches[search_type].json_response:
+            full_facet_dict = self.get_facets_json(search_type, context['facets'], lang)
+            # Cursor queries always start at row 0, so use the row offset of the requested page instead
+            start_row = (page - 1) * self.searches[search_type].results_page_size if 'cursorMark' in solr_query \
+                else solr_response.data['response']['start']
+            doc_dict = {'num_count': context['total_hits'],
+                        'start': start_row + 1,
+                        'end': start_row + solr_response.docs.__len__(),
+                        'docs': context['docs'],
+                        'facets': full_facet_dict,
+                        'selected_facets': context['selected_facets'] if context['selected_facets'] else []}
+            if next_cursor:
+                doc_dict['next_cursor'] = next_cursor
+            if not context['total_hits_exact']:
+                doc_dict['num_count_exact'] = False
+            if context['stale_results']:
+                doc_dict['stale_results'] = True
+            if context['partial_results']:
+                doc_dict['partial_results'] = True
+            return JsonResponse(doc_dict)
+        elif search_format == 'solr' and self.searches[search_type].raw_solr_response:
+            return JsonResponse(solr_response.data)
+        else:
+            json_link = str(request.get_full_path())
+            if json_link.endswith("/"):
+                json_link = json_link + "?search_format=json"
+            elif json_link.endswith("&") or json_link.endswith("?"):
+                json_link = json_link + "search_format=json"
+            else:
+                json_link = json_link + "&search_format=json"
+            context["json_format_url"] = json_link
+            log_search_results(request, self.search_logger, search_type=search_type, format=search_format, page_type='search', doc_count=solr_response.num_found, hostname=self.hostname)
+            self.add_fragment_cache_keys(request, search_type, lang, context, solr_response)
+            return render(request, self.searches[search_type].page_template, context)
+
 
 class RecordView(SearchView):
 
     def get(self, request: HttpRequest, lang='en', search_type='', record_id=''):
+        prepared = self.prepare_record(request, lang, search_type, record_id)
+        if isinstance(prepared, HttpResponse):
+            return prepared
+        return self.run_query(request, prepared, 'pre_record_solr_query', 'post_record_solr_query', self.render_record)
+
+    def prepare_record(self, request: HttpRequest, lang='en', search_type='', record_id=''):
+        """
+        Build the page context and Solr query for a record page
+        """
         lang = request.LANGUAGE_CODE        # Replace search_type alias with actual search type
         if lang == 'fr':
             if search_type in self.search_alias_fr:
@@ -654,9 +761,6 @@ class RecordView(SearchView):
             context['main_content_body_top_snippet'] = "search_snippets/default_main_content_body_top.html"
             context["im_enabled"] = settings.IM_ENABLED if hasattr(settings, 'IM_ENABLED') else False,
             request.session['prev_record'] = request.build_absolute_uri()
-            solr = SolrClient(settings.SOLR_SERVER_URL)
-
-            core_name = self.searches[search_type].solr_core_name
 
             # Get the search result boundaries
             start_row, page = calc_starting_row(request.GET.get('page', 1), rows_per_page=5)
@@ -666,89 +770,94 @@ class RecordView(SearchView):
 
             solr_query = create_solr_query(request, self.searches[search_type], self.fields[search_type],
                                            self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                                           facets, start_row, 25, record_id)
+                                           facets, start_row, 25, record_id,
+                                           skeleton=self.get_query_skeleton(search_type, lang, 'record'))
 
-            # Call  plugin pre-solr-query if defined
             search_type_plugin = 'search.plugins.{0}'.format(search_type)
-            if search_type_plugin in self.discovered_plugins:
-                context, solr_query = self.discovered_plugins[search_type_plugin].pre_record_solr_query(
-                    context,
-                    solr_query,
-                    request,
-                    self.searches[search_type], self.fields[search_type],
-                    self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                    facets,
-                    record_id)
+            return {
+                'context': context,
+                'solr_query': solr_query,
+                'search_type': search_type,
+                'lang': lang,
+                'record_id': record_id,
+                'page': page,
+                'search_type_plugin': search_type_plugin,
+                'plugin_args': (self.searches[search_type], self.fields[search_type],
+                                self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
+                                facets, record_id),
+                # The post-query hook has always been given the codes of all the searches
+                'post_plugin_args': (self.searches[search_type], self.fields[search_type],
+                                     self.codes_fr if lang == 'fr' else self.codes_en,
+                                     facets, record_id),
+                'query_kwargs': {},
+            }
+        else:
+            return render(request, '404.html', get_error_context(search_type, lang))
 
-            # Query Solr
-            solr_response = solr.query(core_name, solr_query)
+    def render_record(self, request: HttpRequest, prepared: dict, solr_response: SolrResponse):
+        context = prepared['context']
+        search_type = prepared['search_type']
+        lang = prepared['lang']
+        record_id = prepared['record_id']
+        page = prepared['page']
+        search_type_plugin = prepared['search_type_plugin']
 
-            # Call  plugin post-solr-query if it exists
-            if search_type_plugin in self.discovered_plugins:
-                context, solr_response = self.discovered_plugins[search_type_plugin].post_record_solr_query(
-                    context,
-                    solr_response,
-                    solr_query,
-                    request,
-                    self.searches[search_type], self.fields[search_type],
-                    self.codes_fr if lang == 'fr' else self.codes_en,
-                    facets,
-                    record_id)
+        context['facets'] = []
+        context['selected_facets'] = []
+        context['total_hits'] = solr_response.num_found
+        context['total_hits_exact'] = self.is_num_found_exact(solr_response)
+        context['docs'] = solr_response.get_highlighting()
 
-            context['facets'] = []
-            context['selected_facets'] = []
-            context['total_hits'] = solr_response.num_found
-            context['docs'] = solr_response.get_highlighting()
-
-            # Add code information
-            context['codes'] = self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type]
-
-            display_fields = []
-            display_field_name = {}
-            for f in self.fields[search_type]:
-                if self.fields[search_type][f].solr_field_lang in [request.LANGUAGE_CODE, 'bi']:
-                    if request.LANGUAGE_CODE == 'en' and not f[:2] == 'fr':
-                        display_fields.append(f)
-                        display_field_name[f] = self.fields[search_type][f].label_en
-                        continue
-                    elif request.LANGUAGE_CODE == 'fr' and not f[:2] == 'en':
-                        display_fields.append(f)
-                        display_field_name[f] = self.fields[search_type][f].label_fr
-                        continue
-                    if self.fields[search_type][f].solr_extra_fields:
-                        display_fields.extend(self.fields[search_type][f].solr_extra_fields.split(","))
-            context['display_fields'] = display_fields
-            context['display_field_name'] = display_field_name
-
-            # Calculate pagination for the search page
-            context['pagination'] = calc_pagination_range(solr_response.num_found, 10, page)
-            if len(context['pagination']) == 1:
-                context['show_pagination'] = False
-            else:
-                context['show_pagination'] = True
-                context['previous_page'] = (1 if page == 1 else page - 1)
-                last_page = (context['pagination'][len(context['pagination']) - 1] if len(context['pagination']) > 0 else 1)
-                last_page = (1 if last_page < 1 else last_page)
-                context['last_page'] = last_page
-                next_page = page + 1
-                next_page = (last_page if next_page > last_page else next_page)
-                context['next_page'] = next_page
-                context['currentpage'] = page
-
-            if search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() >= 1.1:
-                context, template = self.discovered_plugins[search_type_plugin].pre_render_record(context,
-                                                                                                  self.searches[search_type].record_template,
-                                                                                                  request,
-                                                                                                  lang,
-                                                                                                  self.searches[search_type],
-                                                                                                  self.fields[search_type],
-                                                                                                  self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type])
-            log_search_results(request, self.search_logger, search_type=search_type, format='html', page_type='record', search_text=record_id, doc_count=solr_response.num_found, hostname=self.hostname)
-            return render(request, self.searches[search_type].record_template, context)
+        # Add code information
+        context['codes'] = self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type]
 
+        display_fields = []
+        display_field_name = {}
+        for f in self.fields[search_type]:
+            if self.fields[search_type][f].solr_field_lang in [request.LANGUAGE_CODE, 'bi']:
+                if request.LANGUAGE_CODE == 'en' and not f[:2] == 'fr':
+                    display_fields.append(f)
+                    display_field_name[f] = self.fields[search_type][f].label_en
+                    continue
+                elif request.LANGUAGE_CODE == 'fr' and not f[:2] == 'en':
+                    display_fields.append(f)
+                    display_field_name[f] = self.fields[search_type][f].label_fr
+                    continue
+                if self.fields[search_type][f].solr_extra_fields:
+                    display_fields.extend(self.fields[search_type][f].solr_extra_fields.split(","))
+        context['display_fields'] = display_fields
+        context['display_field_name'] = display_field_name
+
+        # Calculate pagination for the search page
+        context['pagination'] = calc_pagination_range(solr_response.num_found, 10, page)
+        if len(context['pagination']) == 1:
+            context['show_pagination'] = False
         else:
-            return render(request, '404.html', get_error_context(search_type, lang))
-    
+            context['show_pagination'] = True
+            context['previous_page'] = (1 if page == 1 else page - 1)
+            last_page = (context['pagination'][len(context['pagination']) - 1] if len(context['pagination']) > 0 else 1)
+            last_page = (1 if last_page < 1 else last_page)
+            next_page = page + 1
+            if context['total_hits_exact']:
+                next_page = (last_page if next_page > last_page else next_page)
+            else:
+                # The number of pages is unknown
+                last_page = None
+            context['last_page'] = last_page
+            context['next_page'] = next_page
+            context['currentpage'] = page
+
+        if search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() >= 1.1:
+            context, template = self.discovered_plugins[search_type_plugin].pre_render_record(context,
+                                                                                              self.searches[search_type].record_template,
+                                                                                              request,
+                                                                                              lang,
+                                                                                              self.searches[search_type],
+                                                                                              self.fields[search_type],
+                                                                                              self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type])
+        log_search_results(request, self.search_logger, search_type=search_type, format='html', page_type='record', search_text=record_id, doc_count=solr_response.num_found, hostname=self.hostname)
+        return render(request, self.searches[search_type].record_template, context)
+
 
 class ExportView(SearchView):
 
@@ -769,12 +878,13 @@ class ExportView(SearchView):
         search_type = request.POST.get('export_search')
         if search_type in self.searches:
 
-            solr = SolrClient(settings.SOLR_SERVER_URL)
+            solr = get_solr_client()
             core_name = self.searches[search_type].solr_core_name
             facets = self.facets_fr[search_type] if lang == 'fr' else self.facets_en[search_type]
             solr_query = create_solr_query(request, self.searches[search_type], self.fields[search_type],
                                            self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                                           facets, 1, 0, record_id='', export=True)
+                                           facets, 1, 0, record_id='', export=True,
+                                           skeleton=self.get_query_skeleton(search_type, lang, 'export'))
 
             # Call  plugin pre-solr-query if defined
             search_type_plugin = 'search.plugins.{0}'.format(search_type)
@@ -827,12 +937,13 @@ class ExportView(SearchView):
             #         else:
             #             return HttpResponseRedirect(settings.EXPORT_FILE_CACHE_URL + "{0}_{1}.csv".format(hashed_query, lang))
 
-            solr = SolrClient(settings.SOLR_SERVER_URL)
+            solr = get_solr_client()
             core_name = self.searches[search_type].solr_core_name
             facets = self.facets_fr[search_type] if lang == 'fr' else self.facets_en[search_type]
             solr_query = create_solr_query(request, self.searches[search_type], self.fields[search_type],
                                            self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                                           facets, 1, 0, record_id='', export=True)
+                                           facets, 1, 0, record_id='', export=True,
+                                           skeleton=self.get_query_skeleton(search_type, lang, 'export'))
             # Call  plugin pre-solr-query if defined
             search_type_plugin = 'search.plugins.{0}'.format(search_type)
             if search_type_plugin in self.discovered_plugins:
@@ -913,25 +1024,10 @@ class DownloadSearchResultsView(View):
 
     def __init__(self):
         super().__init__()
-        # Use a local memory cache for the DB objects
-        cache = caches['local']
-        # Load Search and Field configuration
-
-        if cache.get('searches') is None:
-            search_queryset = Search.objects.all()
-            for s in search_queryset:
-                self.searches[s.search_id] = s
-                if s.search_alias_en:
-                    self.search_alias_en[s.search_alias_en] = s.search_id
-                if s.search_alias_fr:
-                    self.search_alias_fr[s.search_alias_fr] = s.search_id
-            cache.set('searches', self.searches, 3600)
-            cache.set('search_alias_en', self.search_alias_en, 3610)
-            cache.set('search_alias_fr', self.search_alias_fr, 3610)
-        else:
-            self.searches = cache.get('searches')
-            self.search_alias_en = cache.get('search_alias_en')
-            self.search_alias_fr = cache.get('search_alias_fr')
+        config = get_search_config()
+        self.searches = config.searches
+        self.search_alias_en = config.search_alias_en
+        self.search_alias_fr = config.search_alias_fr
 
     def get(self, request: HttpRequest, lang='en', search_type='', task_id=''):
 
@@ -1017,6 +1113,15 @@ class MoreLikeThisView(SearchView):
     # http://127.0.0.1:8000/search/en/travelq/similar/aafc-aac,T-2017-Q1-00003
 
     def get(self, request: HttpRequest, lang='en', search_type='', record_id=''):
+        prepared = self.prepare_mlt(request, lang, search_type, record_id)
+        if isinstance(prepared, HttpResponse):
+            return prepared
+        return self.run_query(request, prepared, 'pre_mlt_solr_query', 'post_mlt_solr_query', self.render_mlt)
+
+    def prepare_mlt(self, request: HttpRequest, lang='en', search_type='', record_id=''):
+        """
+        Build the page context and Solr query for a more-like-this page
+        """
         lang = request.LANGUAGE_CODE
 
         # Replace search_type alias with actual search type
@@ -1046,67 +1151,61 @@ class MoreLikeThisView(SearchView):
             context["referer"] = request.META["HTTP_REFERER"] if "HTTP_REFERER" in request.META and (request.META["HTTP_REFERER"].startswith("http://" + request.META["HTTP_HOST"]) or request.META[
                     "HTTP_REFERER"].startswith("https://" + request.META["HTTP_HOST"])) else ""
             context['main_content_body_top_snippet'] = "search_snippets/default_main_content_body_top.html"
-            solr = SolrClient(settings.SOLR_SERVER_URL)
-
-            core_name = self.searches[search_type].solr_core_name
 
             # Get the search result boundaries
             start_row, page = calc_starting_row(request.GET.get('page', 1), rows_per_page=self.searches[search_type].mlt_items)
             # Compose the Solr query
-            solr_query = create_solr_mlt_query(request, self.searches[search_type], self.fields[search_type], start_row, record_id)
+            solr_query = create_solr_mlt_query(request, self.searches[search_type], self.fields[search_type], start_row, record_id,
+                                               skeleton=self.get_query_skeleton(search_type, lang, 'mlt'))
 
-            # Call  plugin pre-solr-query if defined
             search_type_plugin = 'search.plugins.{0}'.format(search_type)
-            if search_type_plugin in self.discovered_plugins:
-                context, solr_query = self.discovered_plugins[search_type_plugin].pre_mlt_solr_query(
-                    context,
-                    solr_query,
-                    request,
-                    self.searches[search_type], self.fields[search_type],
-                    self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                    record_id)
-
-            # Query Solr
-            solr_response = solr.query(core_name, solr_query)
-
-            if search_type_plugin in self.discovered_plugins:
-                context, solr_query = self.discovered_plugins[search_type_plugin].post_mlt_solr_query(
-                    context,
-                    solr_response,
-                    solr_query,
-                    request,
-                    self.searches[search_type], self.fields[search_type],
-                    self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                    record_id)
-
-            context['docs'] = solr_response.data['moreLikeThis'][record_id]['docs']
-            context['original_doc'] = solr_response.docs[0]
-
-            template = "more_like_this.html"
-            if search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() == 1.1:
-                context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
-                                        self.searches[search_type].more_like_this_template,
-                                        request,
-                                        lang,
-                                        self.searches[search_type],
-                                        self.fields[search_type],
-                                        self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type])
-            elif search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() >= 1.2:
-                context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
-                                        self.searches[search_type].more_like_this_template,
-                                        request,
-                                        lang,
-                                        self.searches[search_type],
-                                        self.fields[search_type],
-                                        self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                                        view_type="mlt")
-
-            context['back_to_url'] = get_search_path(self.searches[search_type], lang)
-            return render(request, template, context)
-
+            return {
+                'context': context,
+                'solr_query': solr_query,
+                'search_type': search_type,
+                'lang': lang,
+                'record_id': record_id,
+                'search_type_plugin': search_type_plugin,
+                'plugin_args': (self.searches[search_type], self.fields[search_type],
+                                self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
+                                record_id),
+                'query_kwargs': {},
+            }
         else:
             return render(request, '404.html', get_error_context(search_type, lang))
 
+    def render_mlt(self, request: HttpRequest, prepared: dict, solr_response: SolrResponse):
+        context = prepared['context']
+        search_type = prepared['search_type']
+        lang = prepared['lang']
+        record_id = prepared['record_id']
+        search_type_plugin = prepared['search_type_plugin']
+
+        context['docs'] = solr_response.data['moreLikeThis'][record_id]['docs']
+        context['original_doc'] = solr_response.docs[0]
+
+        template = "more_like_this.html"
+        if search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() == 1.1:
+            context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
+                                    self.searches[search_type].more_like_this_template,
+                                    request,
+                                    lang,
+                                    self.searches[search_type],
+                                    self.fields[search_type],
+                                    self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type])
+        elif search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() >= 1.2:
+            context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
+                                    self.searches[search_type].more_like_this_template,
+                                    request,
+                                    lang,
+                                    self.searches[search_type],
+                                    self.fields[search_type],
+                                    self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
+                                    view_type="mlt")
+
+        context['back_to_url'] = get_search_path(self.searches[search_type], lang)
+        return render(request, template, context)
+
 
 class HomeView(SearchView):
 
@@ -1138,6 +1237,226 @@ class HomeView(SearchView):
         return render(request, "homepage.html", context)
 
 
+class FederatedSearchView(SearchView):
+    """
+    Search every enabled search at once. One small query is sent to the Solr core of each search concurrently, and
+    the number of matching records and the top few records of each search are returned as JSON.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+    def get_federated_query(self, search_text: str, lang: str, search_type: str, rows: int) -> dict:
+        solr_query = {'q': parse_query_text(search_text, lang), 'defType': 'edismax', 'sow': True}
+        solr_query['q.op'] = self.searches[search_type].solr_default_op
+        solr_query['qf'] = list(self.get_query_skeleton(search_type, lang, 'search').qf)
+        solr_query['rows'] = rows
+        if rows > 0:
+            display_fields = self.display_fields_fr[search_type] if lang == 'fr' else self.display_fields_en[search_type]
+            solr_query['fl'] = ",".join(['id'] + [f for f in display_fields if f != 'id'])
+        else:
+            solr_query['fl'] = 'id'
+        return solr_query
+
+    def federated_search(self, search_text: str, lang: str, rows: int) -> dict:
+        search_types = [s for s in self.searches if not self.searches[s].is_disabled]
+        results = {}
+        if not search_types:
+            return results
+        # The read timeout of the federated Solr client ends the abandoned queries with the request
+        solr = get_solr_client('federated')
+        executor = get_federated_executor()
+        futures = {}
+        for search_type in search_types:
+            solr_query = self.get_federated_query(search_text, lang, search_type, rows)
+            futures[search_type] = executor.submit(self.query_solr, solr, search_type, solr_query)
+        # Wait for all the searches together, then give up on the ones that have not answered yet. The queries still
+        # waiting for a thread are not sent at all.
+        wait(futures.values(), timeout=getattr(settings, 'FEDERATED_SEARCH_TIMEOUT', 5))
+        for future in futures.values():
+            future.cancel()
+
+        for search_type, future in futures.items():
+            search = self.searches[search_type]
+            result = {
+                "label": search.label_fr if lang == 'fr' else search.label_en,
+                "search_path": get_search_path(search, lang),
+                "count": None,
+                "docs": [],
+            }
+            if not future.done():
+                result["error"] = "timeout"
+            elif future.exception() is not None:
+                self.logger.warning(f"Federated search of {search_type} failed: {future.exception()}")
+                result["error"] = "unavailable"
+            else:
+                solr_response = future.result()
+                result["count"] = solr_response.num_found
+                result["docs"] = solr_response.docs
+                if getattr(solr_response, 'is_stale', False):
+                    result["stale_results"] = True
+                if is_partial_response(solr_response):
+                    result["partial_results"] = True
+            results[search_type] = result
+        return results
+
+    def get_federated_cache_key(self, cache, search_text: str, lang: str, rows: int):
+        """
+        :return: the result cache key of a federated search, or None if the cache is disabled or the index
+        generations cannot be read. The key covers the shared configuration generation and the index generation of
+        the Solr core of every enabled search, so that every process stops using a response after a data load or a
+        configuration change.
+        """
+        if cache is None:
+            return None
+        try:
+            index_generations = [(s, get_index_generation(self.searches[s].solr_core_name, cache))
+                                 for s in sorted(self.searches) if not self.searches[s].is_disabled]
+        except Exception as x:
+            self.logger.warning(f"Unable to read the index generations for the federated search: {x}")
+            return None
+        generations_digest = hashlib.sha1(repr(index_generations).encode('utf-8')).hexdigest()
+        return "federated_search:{0}:{1}:{2}:{3}:{4}".format(
+            self.get_config_generation(), generations_digest, lang, rows,
+            hashlib.sha1(search_text.encode('utf-8')).hexdigest())
+
+    def get(self, request: HttpRequest, lang='en'):
+        lang = request.LANGUAGE_CODE
+        search_text = request.GET.get('search_text', '')
+        max_rows = getattr(settings, 'FEDERATED_SEARCH_MAX_ROWS', 10)
+        try:
+            rows = min(max(int(request.GET.get('rows', getattr(settings, 'FEDERATED_SEARCH_ROWS', 3))), 0), max_rows)
+        except ValueError:
+            return JsonResponse({"error": "rows"}, status=400)
+
+        cache = get_result_cache()
+        cache_key = self.get_federated_cache_key(cache, search_text, lang, rows)
+        if cache_key is None:
+            cache = None
+        if cache is not None:
+            try:
+                results = cache.get(cache_key)
+                if results is not None:
+                    return JsonResponse(results)
+            except Exception as x:
+                self.logger.warning(f"Unable to read the Solr result cache: {x}")
+
+        results = {
+            "search_text": search_text,
+            "language": lang,
+            "searches": self.federated_search(search_text, lang, rows),
+        }
+        # Responses with timed out or failed searches are not cached
+        if cache is not None and not any("error" in r for r in results["searches"].values()):
+            try:
+                cache.set(cache_key, results, getattr(settings, 'FEDERATED_SEARCH_CACHE_TIMEOUT', 60))
+            except Exception as x:
+                self.logger.warning(f"Unable to write to the Solr result cache: {x}")
+        return JsonResponse(results)
+
+
+class SearchApiView(SearchView):
+    """
+    Versioned JSON API of a search, for integrators: /search/api/v1/<lang>/<search_type>/. Takes the same search_text,
+    sort and facet filter parameters as the search page, and:
+      fields: comma separated list of the fields to return for each record, every field by default
+      facets: comma separated list of the facets to count, none by default
+      rows: number of records to return, up to SEARCH_API_MAX_ROWS
+      cursor: the next_cursor of the previous response, to get the next records
+    Only searches with JSON responses enabled are available.
+    """
+
+    API_VERSIONS = [1]
+
+    # Parameters of the API that are not part of the search request
+    API_PARAMS = ['fields', 'facets', 'rows']
+
+    def __init__(self):
+        super().__init__()
+
+    @staticmethod
+    def error_response(status: int, error: str, **kwargs):
+        return JsonResponse(dict(error=error, **kwargs), status=status)
+
+    @staticmethod
+    def get_list_param(request: HttpRequest, name: str) -> list:
+        return [v.strip() for v in request.GET.get(name, '').split(',') if v.strip()]
+
+    def get(self, request: HttpRequest, version=1, lang='en', search_type=''):
+        lang = request.LANGUAGE_CODE
+        search_alias = self.search_alias_fr if lang == 'fr' else self.search_alias_en
+        search_type = search_alias.get(search_type, search_type)
+        if version not in self.API_VERSIONS:
+            return self.error_response(404, "version")
+        if search_type not in self.searches or not self.searches[search_type].json_response:
+            return self.error_response(404, "search")
+        search = self.searches[search_type]
+        if search.is_disabled:
+            return self.error_response(503, "disabled")
+
+        max_rows = getattr(settings, 'SEARCH_API_MAX_ROWS', 100)
+        try:
+            rows = min(max(int(request.GET.get('rows', search.results_page_size)), 0), max_rows)
+        except ValueError:
+            return self.error_response(400, "rows")
+        fields = self.get_list_param(request, 'fields')
+        invalid = [f for f in fields if f not in self.fields[search_type]]
+        if invalid:
+            return self.error_response(400, "fields", invalid=invalid)
+        facets = self.facets_fr[search_type] if lang == 'fr' else self.facets_en[search_type]
+        count_facets = self.get_list_param(request, 'facets')
+        invalid = [f for f in count_facets if f not in facets]
+        if invalid:
+            return self.error_response(400, "facets", invalid=invalid)
+
+        builder = QueryBuilder(search, self.fields[search_type], lang, self.get_query_skeleton(search_type, lang, 'search'))
+        builder.parse_get({name: value for name, value in request.GET.items() if name not in self.API_PARAMS})
+        if builder.error:
+            return self.error_response(400, "parameter", parameter=builder.error)
+        query = builder.build(facets, 0, rows, cursor_paging=True, count_facets=count_facets)
+        solr_query = to_query_dict(query, facets)
+        if fields:
+            solr_query['fl'] = ",".join(['id'] + [f for f in fields if f != 'id'])
+
+        prepared = {
+            'context': {'search_text': builder.search_text or '', 'language': lang, 'search_type': search_type},
+            'solr_query': solr_query,
+            'search_type_plugin': 'search.plugins.{0}'.format(search_type),
+            'plugin_args': (search, self.fields[search_type],
+                            self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
+                            facets, ''),
+        }
+        self.call_pre_query_plugin('pre_search_solr_query', request, prepared)
+        etag = self.get_etag(request, search_type, prepared['solr_query'], f"api:{version}:{lang}")
+        if etag is not None:
+            not_modified = not_modified_response(request, etag)
+            if not_modified is not None:
+                return add_cache_headers(not_modified, etag, search.solr_core_name)
+        try:
+            solr_response = self.query_solr(get_solr_client(), search_type, prepared['solr_query'])
+        except ConnectionError:
+            return self.error_response(503, "unavailable")
+        except SolrError as se:
+            return self.error_response(400, "query", message=se.args[0] if se.args else "")
+        solr_response = self.call_post_query_plugin('post_search_solr_query', request, prepared, solr_response)
+
+        summary = {
+            "version": version,
+            "search": search_type,
+            "language": lang,
+            "num_found": solr_response.num_found,
+            "num_found_exact": self.is_num_found_exact(solr_response),
+            "next_cursor": self.get_next_cursor(prepared['solr_query'], solr_response),
+            "stale_results": getattr(solr_response, 'is_stale', False),
+            "partial_results": is_partial_response(solr_response),
+        }
+        if count_facets:
+            summary["facets"] = self.get_facets_json(search_type, self.get_facet_results(search_type, solr_response, lang), lang)
+        return self.add_cache_headers(StreamingHttpResponse(iter_json_object(summary, "docs", solr_response.docs),
+                                                            content_type="application/json"),
+                                      etag, search_type, solr_response)
+
+
 class PageView(SearchView):
 
     def __init__(self):
@@ -1244,9 +1563,6 @@ class SearchFormView(SearchView):
     # Generate the Solr query for both the first GET and subsequent POST requests
 
         if request.method == "GET":
-            default_sort_order = self.searches[search_type].results_sort_default_fr if self.searches[
-                    search_type].results_sort_default_fr else 'score desc'
-            
             new_text_search = False
             if 'prev_search' in request.session:
                 if not re.search(r'search_text=\S+', request.session['prev_search']) and \
@@ -1264,8 +1580,10 @@ class SearchFormView(SearchView):
                             record_id='', 
                             export=False, 
                             highlighting=True,
-                            default_sort=default_sort_order, 
-                            override_sort=new_text_search)
+                            override_sort=new_text_search,
+                            skeleton=self.get_query_skeleton(search_type, lang, 'search'),
+                            cursor_paging=getattr(settings, 'SEARCH_CURSOR_PAGING', False),
+                            project_results=True)
             
         elif request.method == "POST":
             solr_query = create_post_solr_query(request=request,
@@ -1276,22 +1594,12 @@ class SearchFormView(SearchView):
                             start_row=start_row,
                             rows=num_rows, 
                             is_export=is_export,
-                            reset_filters=reset_filters)
+                            reset_filters=reset_filters,
+                            skeleton=self.get_query_skeleton(search_type, lang, 'export' if is_export else 'search'),
+                            cursor_paging=getattr(settings, 'SEARCH_CURSOR_PAGING', False),
+                            project_results=True)
         return solr_query
 
-    def get_search_terms(self, search_text: str):
-    # Get any search terms
-
-        tr = RegexpTokenizer(r'[^"\s]\S*|".+?"', gaps=False)
-
-        # Respect quoted strings
-        search_terms = tr.tokenize(search_text)
-        if len(search_terms) == 0:
-            solr_search_terms = "*"
-        else:
-            solr_search_terms = ' '.join(search_terms)
-        return solr_search_terms
-
     def default_search_context(self, context: dict, lang: str, search_type: str, request: HttpRequest):
     # Basic page context information for all situations
 
@@ -1326,6 +1634,16 @@ class SearchFormView(SearchView):
         return self.search_page(request, *args, **kwargs)
     
     def search_page(self, request: HttpRequest, *args, **kwargs):
+        prepared = self.prepare_search_page(request, *args, **kwargs)
+        if isinstance(prepared, HttpResponse):
+            return prepared
+        return self.run_query(request, prepared, 'pre_search_solr_query', 'post_search_solr_query',
+                              self.render_search_page)
+
+    def prepare_search_page(self, request: HttpRequest, *args, **kwargs):
+        """
+        Build the page context and Solr query for a search form page, or start the export of the search results
+        """
 
         # NOTE for Django developers - we are doing our own form handling and not using the Django forms
 
@@ -1377,230 +1695,326 @@ class SearchFormView(SearchView):
                     form_page_slices = key.split('-')
                     if len(form_page_slices) == 2 and form_page_slices[1].isdigit():
                         form_page = form_page_slices[1]
-        start_row, page = calc_starting_row(form_page, rows_per_page=self.searches[search_type].results_page_size)
+        # The cursor of the next page is only used by the next page button, see QueryBuilder.parse_post()
+        cursor = None
+        if not clear_filters and any(key.startswith('pg_next-') for key in request.POST.keys()):
+            cursor = request.POST.get('next_cursor')
+        start_row, page = calc_starting_row(form_page, rows_per_page=self.searches[search_type].results_page_size,
+                                            max_start_row=self.get_max_start_row(cursor))
 
-        # Stand up the Solr client
+        # Compose the Solr query
 
         query = self.to_solr_query(request, search_type, lang, start_row, num_rows=10, is_export=export_query, reset_filters=clear_filters)
 
-        solr = SolrClient(settings.SOLR_SERVER_URL)
         core_name = self.searches[search_type].solr_core_name
                 
         # A regular website search query
 
         if not export_query:
-
-            # Call custom search plugin pre-solr-query - if 
-            
             search_type_plugin = 'search.plugins.{0}'.format(search_type)
-            if search_type_plugin in self.discovered_plugins:
-                context, query = self.discovered_plugins[search_type_plugin].pre_search_solr_query(
-                    context,
-                    query,
-                    request,
-                    self.searches[search_type], self.fields[search_type],
-                    self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                    facets,
-                    '')        
-            try:
-                solr_response = solr.query(core_name, query, highlight=True)
-            except (ConnectionError, SolrError) as ce:
-                return render(request, 'error.html', get_error_context(search_type, lang, ce.args[0]))
-            
-            # Call custom search plugin post-solr-query - if it is defined
-            
-            if search_type_plugin in self.discovered_plugins:
-                context, solr_response = self.discovered_plugins[search_type_plugin].post_search_solr_query(
-                    context,
-                    solr_response,
-                    query,
-                    request,
-                    self.searches[search_type], self.fields[search_type],
-                    self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                    facets,
-                    '')
-
-            context["search_item_snippet"] = self.searches[search_type].search_item_snippet
-
-            # Determine if this search is filtered in any way
+            return {
+                'context': context,
+                'solr_query': query,
+                'search_type': search_type,
+                'lang': lang,
+                'facets': facets,
+                'page': page,
+                'clear_filters': clear_filters,
+                'search_type_plugin': search_type_plugin,
+                'plugin_args': (self.searches[search_type], self.fields[search_type],
+                                self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
+                                facets, ''),
+                'query_kwargs': {'highlight': True},
+            }
 
-            context['show_all_results'] = True
-            if not clear_filters:
-                for p in request.POST.keys():
-                    if p not in self.non_filter_fields:
-                        if request.POST[p] != '':
-                            context['show_all_results'] = False
-                            break
+        # This is a request to download search results instead of a webpage. Send the Solr 
+        # query to a task redirect to the download progress screen
 
-            # Set facet information 
+        else:
+            field_names = {}
+            for field in self.fields[search_type]:
+                if lang == 'fr':
+                    field_names[field] = self.fields[search_type][field].label_fr
+                else:
+                    field_names[field] = self.fields[search_type][field].label_en
 
-            context['system_facet_fields'] = ['__label__', '__sortorder__']
-            if len(facets) > 0:
+            task = export_search_results_csv.delay(query, lang, core_name, field_names)
+            if settings.SEARCH_LANG_USE_PATH:
+                if lang == 'fr':
+                    return redirect(f'/rechercher/fr/{search_type}/telecharger/{task}')
+                else:
+                    return redirect(f'/search/en/{search_type}/download/{task}')
+            else:
+                if lang == 'fr':
+                    return redirect(f'{settings.SEARCH_HOST_PATH}/{search_type}/telecharger/{task}')
+                else:
+                    return redirect(f'{settings.SEARCH_HOST_PATH}/{search_type}/download/{task}')
 
-                # Solr search facet results
+    def render_search_page(self, request: HttpRequest, prepared: dict, solr_response: SolrResponse):
+        context = prepared['context']
+        query = prepared['solr_query']
+        search_type = prepared['search_type']
+        lang = prepared['lang']
+        facets = prepared['facets']
+        page = prepared['page']
+        clear_filters = prepared['clear_filters']
+        search_type_plugin = prepared['search_type_plugin']
+
+        context["search_item_snippet"] = self.searches[search_type].search_item_snippet
+
+        # Determine if this search is filtered in any way
+
+        context['show_all_results'] = True
+        if not clear_filters:
+            for p in request.POST.keys():
+                if p not in self.non_filter_fields:
+                    if request.POST[p] != '':
+                        context['show_all_results'] = False
+                        break
 
-                context['facets'] = solr_response.get_facets()
+        # Set facet information 
 
-                # Unless resetting the search, gather information about any filters selected by the user
+        context['system_facet_fields'] = ['__label__', '__sortorder__']
+        if len(facets) > 0:
 
-                selected_facets = {}
-                if not clear_filters:         
-                    for request_field in request.POST.keys():
-                        if request_field not in self.non_facet_fields and not request_field.startswith("pg-"):
-                            request_field_value = request.POST.get(request_field, "")
-                            if len(request_field_value.split('|')) == 2:
-                                field_name = request_field_value.split('|')[0]
-                                if field_name in self.fields[search_type] and field_name in context['facets']:
-                                    # Add to new or existing selected facets list
-                                    if field_name in selected_facets:
-                                        selected_facets[field_name].append(request_field_value.split('|')[1])
-                                    else:
-                                        selected_facets[field_name] = [request_field_value.split('|')[1]]
-                context['selected_facets'] = selected_facets
+            # Solr search facet results, with the facets sorted by label already reordered
 
-                # Gather facet display information
+            context['facets'] = self.get_facet_results(search_type, solr_response, lang)
 
-                for f in context['facets']:
-                    context['facets'][f]['__label__'] = self.fields[search_type][f].label_fr if lang == 'fr' else self.fields[search_type][f].label_en
-                    context['facets'][f]['__sortorder__'] = self.fields[search_type][f].solr_facet_sort
+            # Unless resetting the search, gather information about any filters selected by the user
 
-                    # If the facet is a code and sorting by label, then the facet needs to be resorted
-                    
-                    if self.fields[search_type][f].solr_facet_sort == 'label':
-
-                        # Create an inverted index of the facet values
-                        
-                        facet_values = {}
-                        for facet_value in context['facets'][f].keys():
-                            if facet_value not in context['system_facet_fields'] and facet_value != '-' and facet_value in self.codes_en[search_type][f]:
-                                if request.LANGUAGE_CODE == 'fr':
-                                    facet_values[self.codes_fr[search_type][f][facet_value]] = facet_value
+            selected_facets = {}
+            if not clear_filters:         
+                for request_field in request.POST.keys():
+                    if request_field not in self.non_facet_fields and not request_field.startswith("pg-"):
+                        request_field_value = request.POST.get(request_field, "")
+                        if len(request_field_value.split('|')) == 2:
+                            field_name = request_field_value.split('|')[0]
+                            if field_name in self.fields[search_type] and field_name in context['facets']:
+                                # Add to new or existing selected facets list
+                                if field_name in selected_facets:
+                                    selected_facets[field_name].append(request_field_value.split('|')[1])
                                 else:
-                                    facet_values[self.codes_en[search_type][f][facet_value]] = facet_value
-                            elif facet_value not in context['system_facet_fields'] and facet_value != '-' and facet_value not in self.codes_en[search_type][f]:
-                                self.logger.info(f"Unknown facet_value {f}:{facet_value}")
-                        
-                        # Sort the facet values - use French locale for sorting
-                        
-                        if lang == "fr":
-                            sorted_facet_values = sorted(facet_values.keys(), key=unidecode)
-                        else:
-                            sorted_facet_values = sorted(facet_values.keys())
-                        new_facet = collections.OrderedDict()
-                        for facet_value in sorted_facet_values:
-                            new_facet[facet_values[facet_value]] = context['facets'][f][facet_values[facet_value]]
-                        new_facet['__label__'] = context['facets'][f]['__label__']
-                        new_facet['__sortorder__'] = context['facets'][f]['__sortorder__']
-                        context['facets'][f] = new_facet
-                
-                # Handle the specified facets that are to be displayed in reversed order
+                                    selected_facets[field_name] = [request_field_value.split('|')[1]]
+            context['selected_facets'] = selected_facets
+
+            # Handle the specified facets that are to be displayed in reversed order
                 
-                reversed_facets = []
-                for facet in facets:
-                    if self.fields[search_type][facet].solr_facet_display_reversed:
-                        reversed_facets.append(facet)
-                context['reversed_facets'] = reversed_facets
+            reversed_facets = []
+            for facet in facets:
+                if self.fields[search_type][facet].solr_facet_display_reversed:
+                    reversed_facets.append(facet)
+            context['reversed_facets'] = reversed_facets
 
-                # Handle any custom facet template snippets for this custom search
+            # Handle any custom facet template snippets for this custom search
 
-                facets_custom_snippets = {}
+            facets_custom_snippets = {}
+            for f in context['facets']:
                 if self.fields[search_type][f].solr_facet_snippet:
                     facets_custom_snippets[f] = self.fields[search_type][f].solr_facet_snippet
-                context['facet_snippets'] = facets_custom_snippets
-            else:
+            context['facet_snippets'] = facets_custom_snippets
+        else:
 
-                context['facets'] = []
-                context['selected_facets'] = []
+            context['facets'] = []
+            context['selected_facets'] = []
 
-            context['total_hits'] = solr_response.num_found
-            context['docs'] = solr_response.get_highlighting()
+        context['total_hits'] = solr_response.num_found
+        context['total_hits_exact'] = self.is_num_found_exact(solr_response)
+        context['docs'] = solr_response.get_highlighting()
 
-            #    @TODO need to set up a JSON link
-            #    json_format_url
+        #    @TODO need to set up a JSON link
+        #    json_format_url
 
-            # Prepare a dictionary of language appropriate sort options
+        # Prepare a dictionary of language appropriate sort options
 
-            sort_options = {}
-            sort_labels = self.searches[search_type].results_sort_order_display_fr.split(',') if lang == 'fr' else self.searches[search_type].results_sort_order_display_en.split(',')
-            if lang == 'fr':
-                for i, v in enumerate(self.searches[search_type].results_sort_order_fr.split(',')):
-                    sort_options[v] = str(sort_labels[i]).strip()
-            else:
-                for i, v in enumerate(self.searches[search_type].results_sort_order_en.split(',')):
-                    sort_options[v] = str(sort_labels[i]).strip()
-            context['sort_options'] = sort_options
-            context['sort'] = query['sort']
+        sort_options = {}
+        sort_labels = self.searches[search_type].results_sort_order_display_fr.split(',') if lang == 'fr' else self.searches[search_type].results_sort_order_display_en.split(',')
+        if lang == 'fr':
+            for i, v in enumerate(self.searches[search_type].results_sort_order_fr.split(',')):
+                sort_options[v] = str(sort_labels[i]).strip()
+        else:
+            for i, v in enumerate(self.searches[search_type].results_sort_order_en.split(',')):
+                sort_options[v] = str(sort_labels[i]).strip()
+        context['sort_options'] = sort_options
+        context['sort'] = remove_cursor_sort(query['sort'])
 
-            # Add code information. This is used to display readable labels instead of code values
+        # Add code information. This is used to display readable labels instead of code values
 
-            context['codes'] = self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type]
+        context['codes'] = self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type]
 
-            # Save display fields
+        # Save display fields
 
-            context['default_display_fields'] = self.display_fields_fr[search_type] if lang == 'fr' else self.display_fields_en[search_type]
-            context['display_field_name'] = self.display_fields_names_fr[search_type] if lang == 'fr' else self.display_fields_names_en[search_type]
+        context['default_display_fields'] = self.display_fields_fr[search_type] if lang == 'fr' else self.display_fields_en[search_type]
+        context['display_field_name'] = self.display_fields_names_fr[search_type] if lang == 'fr' else self.display_fields_names_en[search_type]
 
-            # Calculate pagination for the search page
+        # Calculate pagination for the search page
 
-            context['pagination'] = calc_pagination_range(solr_response.num_found, self.searches[search_type].results_page_size, page, 3)
-            if len(context['pagination']) == 1:
-                context['show_pagination'] = False
-            else:
+        context['pagination'] = calc_pagination_range(solr_response.num_found, self.searches[search_type].results_page_size, page, 3,
+                                                      exact=context['total_hits_exact'])
+        if len(context['pagination']) == 1:
+            context['show_pagination'] = False
+        else:
                 
-                # Calculate the pagination values for the bottom of the search results page
-
-                context['show_pagination'] = True
-                context['previous_page'] = (1 if page == 1 else page - 1)
-                last_page = (context['pagination'][len(context['pagination']) - 1] if len(context['pagination']) > 0 else 1)
-                last_page = (1 if last_page < 1 else last_page)
-                context['last_page'] = last_page
-                next_page = page + 1
+            # Calculate the pagination values for the bottom of the search results page
+
+            context['show_pagination'] = True
+            context['previous_page'] = (1 if page == 1 else page - 1)
+            last_page = (context['pagination'][len(context['pagination']) - 1] if len(context['pagination']) > 0 else 1)
+            last_page = (1 if last_page < 1 else last_page)
+            next_page = page + 1
+            if context['total_hits_exact']:
                 next_page = (last_page if next_page > last_page else next_page)
-                context['next_page'] = next_page
-                context['currentpage'] = page
-                
-            # Call custom search plugin pre-render - if it is defined
-
-            if search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() == 1.1:
-                context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
-                    self.searches[search_type].page_template,
-                    request,
-                    lang,
-                    self.searches[search_type],
-                    self.fields[search_type],
-                    self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type])
-            elif search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() >= 1.2:
-                context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
-                    self.searches[search_type].page_template,
-                    request,
-                    lang,
-                    self.searches[search_type],
-                    self.fields[search_type],
-                    self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
-                    view_type='search')
-
-            return render(request, 'search_form.html', context)
-        
-        # This is a request to download search results instead of a webpage. Send the Solr 
-        # query to a task redirect to the download progress screen
-
-        else:
-            field_names = {}
-            for field in self.fields[search_type]:
-                if lang == 'fr':
-                    field_names[field] = self.fields[search_type][field].label_fr
-                else:
-                    field_names[field] = self.fields[search_type][field].label_en
-
-            task = export_search_results_csv.delay(query, lang, core_name, field_names)
-            if settings.SEARCH_LANG_USE_PATH:
-                if lang == 'fr':
-                    return redirect(f'/rechercher/fr/{search_type}/telecharger/{task}')
-                else:
-                    return redirect(f'/search/en/{search_type}/download/{task}')
             else:
-                if lang == 'fr':
-                    return redirect(f'{settings.SEARCH_HOST_PATH}/{search_type}/telecharger/{task}')
-                else:
-                    return redirect(f'{settings.SEARCH_HOST_PATH}/{search_type}/download/{task}')
-
+                # The number of pages is unknown
+                last_page = None
+            context['last_page'] = last_page
+            context['next_page'] = next_page
+            context['currentpage'] = page
+
+            # The next page button continues from the Solr cursor of this page instead of using a row offset
+            next_cursor = self.get_next_cursor(query, solr_response)
+            if next_cursor and next_page == page + 1:
+                context['next_cursor'] = next_cursor
+                
+        # Call custom search plugin pre-render - if it is defined
+
+        if search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() == 1.1:
+            context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
+                self.searches[search_type].page_template,
+                request,
+                lang,
+                self.searches[search_type],
+                self.fields[search_type],
+                self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type])
+        elif search_type_plugin in self.discovered_plugins and self.discovered_plugins[search_type_plugin].plugin_api_version() >= 1.2:
+            context, template = self.discovered_plugins[search_type_plugin].pre_render_search(context,
+                self.searches[search_type].page_template,
+                request,
+                lang,
+                self.searches[search_type],
+                self.fields[search_type],
+                self.codes_fr[search_type] if lang == 'fr' else self.codes_en[search_type],
+                view_type='search')
+
+        self.add_fragment_cache_keys(request, search_type, lang, context, solr_response)
+        return render(request, 'search_form.html', context)
+
+
+class AsyncSearchMixin:
+    """
+    Async request handling for the search, record, more-like-this and search form views, used in ASGI deployments
+    when SEARCH_ASYNC_VIEWS is set. Solr is queried with the asyncio Solr client, so the worker can serve other
+    requests while waiting for Solr. Building the query and rendering the page, which may use the database, run in
+    a worker thread.
+
+    Custom search plugins can provide coroutine versions of the pre and post Solr query hooks, named with an async_
+    prefix, for example async_pre_search_solr_query(). Otherwise the regular hooks are called in a worker thread.
+    """
+
+    def load_config(self):
+        # Loading the configuration may require database queries, which are not allowed in the event loop. The
+        # configuration is loaded by aload_config() instead
+        pass
+
+    async def aload_config(self):
+        await sync_to_async(super().load_config)()
+
+    @staticmethod
+    async def acall_plugin_hook(plugin, hook: str, args: tuple):
+        async_hook = getattr(plugin, f'async_{hook}', None)
+        if async_hook is not None:
+            return await async_hook(*args)
+        return await sync_to_async(getattr(plugin, hook))(*args)
+
+    async def acall_pre_query_plugin(self, hook: str, request: HttpRequest, prepared: dict):
+        if prepared['search_type_plugin'] in self.discovered_plugins:
+            prepared['context'], prepared['solr_query'] = await self.acall_plugin_hook(
+                self.discovered_plugins[prepared['search_type_plugin']], hook,
+                (prepared['context'], prepared['solr_query'], request, *prepared['plugin_args']))
+
+    async def acall_post_query_plugin(self, hook: str, request: HttpRequest, prepared: dict,
+                                      solr_response: SolrResponse) -> SolrResponse:
+        if prepared['search_type_plugin'] in self.discovered_plugins:
+            prepared['context'], result = await self.acall_plugin_hook(
+                self.discovered_plugins[prepared['search_type_plugin']], hook,
+                (prepared['context'], solr_response, prepared['solr_query'], request,
+                 *prepared.get('post_plugin_args', prepared['plugin_args'])))
+            # post_mlt_solr_query has always been expected to return the query, so its result is not used
+            if hook != 'post_mlt_solr_query':
+                solr_response = result
+        return solr_response
+
+    async def arun_query(self, request: HttpRequest, prepared: dict, pre_hook: str, post_hook: str, render_page):
+        """
+        Async version of SearchView.run_query()
+        """
+        search_type = prepared['search_type']
+        await self.acall_pre_query_plugin(pre_hook, request, prepared)
+        etag = await sync_to_async(self.get_etag)(
+            request, search_type, prepared['solr_query'],
+            f"{pre_hook}:{prepared['lang']}:{request.GET.get('search_format', 'html')}", **prepared['query_kwargs'])
+        if etag is not None:
+            not_modified = not_modified_response(request, etag)
+            if not_modified is not None:
+                return await sync_to_async(add_cache_headers)(not_modified, etag,
+                                                              self.searches[search_type].solr_core_name)
+        try:
+            solr_response = await acached_query(get_async_solr_client(), self.searches[search_type].solr_core_name,
+                                                prepared['solr_query'],
+                                                plugin_version=self.get_plugin_version(search_type),
+                                                **prepared['query_kwargs'])
+            add_legacy_facet_counts(solr_response.data, prepared['solr_query'], self.fields[search_type])
+        except (ConnectionError, SolrError) as ce:
+            return await sync_to_async(render)(request, 'error.html',
+                                               get_error_context(search_type, prepared['lang'], ce.args[0]))
+        prepared['context']['stale_results'] = getattr(solr_response, 'is_stale', False)
+        prepared['context']['partial_results'] = is_partial_response(solr_response)
+        solr_response = await self.acall_post_query_plugin(post_hook, request, prepared, solr_response)
+        response = await sync_to_async(render_page)(request, prepared, solr_response)
+        return await sync_to_async(self.add_cache_headers)(response, etag, search_type, solr_response)
+
+    async def ahandle(self, request: HttpRequest, prepare, pre_hook: str, post_hook: str, render_page, *args, **kwargs):
+        """
+        Load the configuration, prepare the request with the given prepare method of the view and run the query
+        """
+        await self.aload_config()
+        prepared = await sync_to_async(prepare)(request, *args, **kwargs)
+        if isinstance(prepared, HttpResponse):
+            return prepared
+        return await self.arun_query(request, prepared, pre_hook, post_hook, render_page)
+
+
+class AsyncSearchView(AsyncSearchMixin, SearchView):
+
+    async def get(self, request: HttpRequest, lang='en', search_type=''):
+        return await self.ahandle(request, self.prepare_search, 'pre_search_solr_query', 'post_search_solr_query',
+                                  self.render_search, lang, search_type)
+
+
+class AsyncRecordView(AsyncSearchMixin, RecordView):
+
+    async def get(self, request: HttpRequest, lang='en', search_type='', record_id=''):
+        return await self.ahandle(request, self.prepare_record, 'pre_record_solr_query', 'post_record_solr_query',
+                                  self.render_record, lang, search_type, record_id)
+
+
+class AsyncMoreLikeThisView(AsyncSearchMixin, MoreLikeThisView):
+
+    async def get(self, request: HttpRequest, lang='en', search_type='', record_id=''):
+        return await self.ahandle(request, self.prepare_mlt, 'pre_mlt_solr_query', 'post_mlt_solr_query',
+                                  self.render_mlt, lang, search_type, record_id)
+
+
+class AsyncSearchFormView(AsyncSearchMixin, SearchFormView):
+
+    async def get(self, request, *args, **kwargs):
+        return await self.ahandle(request, self.prepare_query_type_page, 'pre_search_solr_query',
+                                  'post_search_solr_query', self.render_search_page, "GET", *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        return await self.ahandle(request, self.prepare_query_type_page, 'pre_search_solr_query',
+                                  'post_search_solr_query', self.render_search_page, "POST", *args, **kwargs)
+
+    def prepare_query_type_page(self, request: HttpRequest, query_type: str, *args, **kwargs):
+        request.session['query_type'] = query_type
+        return self.prepare_search_page(request, *args, **kwargs)
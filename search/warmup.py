@@ -0,0 +1,147 @@
+"""
+Load everything a search page needs before a worker starts serving requests: the search configuration, the custom
+search plugins and the compiled page templates and snippets. Optionally load the code tables of every search, and send
+one query to each Solr core so that the Solr searchers are warm as well.
+"""
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+import logging
+import os
+import sys
+from search.registry import get_search_config, get_plugins
+from search.solr_connections import get_solr_client, close_solr_clients
+from SolrClient2.exceptions import ConnectionError, SolrError
+
+logger = logging.getLogger(__name__)
+
+# Search model attributes that name a template or a template snippet
+TEMPLATE_ATTRIBUTES = ['page_template', 'record_template', 'more_like_this_template', 'breadcrumb_snippet',
+                       'footer_snippet', 'info_message_snippet', 'about_message_snippet', 'header_js_snippet',
+                       'header_css_snippet', 'body_js_snippet', 'search_item_snippet', 'record_detail_snippet',
+                       'record_breadcrumb_snippet', 'main_content_body_top_snippet', 'search_results_message_snippet']
+
+# Templates used by every search
+COMMON_TEMPLATES = ['search_form.html', 'error.html', '400.html', '404.html', 'no_service.html', 'download.html',
+                    'homepage.html']
+
+
+def get_search_templates(config=None) -> list:
+    """
+    List the names of every template and snippet named in the Search and Field models, without duplicates
+    """
+    if config is None:
+        config = get_search_config()
+    template_names = list(COMMON_TEMPLATES)
+    for search_id, search in config.searches.items():
+        for attr in TEMPLATE_ATTRIBUTES:
+            name = getattr(search, attr)
+            if name and name not in template_names:
+                template_names.append(name)
+        for field in config.fields[search_id].values():
+            if field.solr_facet_snippet and field.solr_facet_snippet not in template_names:
+                template_names.append(field.solr_facet_snippet)
+    return template_names
+
+
+def precompile_templates(template_names: list) -> int:
+    """
+    Load and compile the templates. When the cached template loader is in use (the default when DEBUG is off) the
+    compiled templates are kept for the life of the process.
+    :return: The number of templates that were compiled
+    """
+    compiled = 0
+    for name in template_names:
+        try:
+            get_template(name)
+            compiled += 1
+        except TemplateDoesNotExist:
+            logger.warning(f"Template not found: {name}")
+        except TemplateSyntaxError as x:
+            logger.error(f"Unable to compile template {name}: {x}")
+    return compiled
+
+
+def ping_solr_cores(config=None) -> dict:
+    """
+    Send a single zero-row query to each Solr core used by a search.
+    :return: dictionary of core names with True if the core responded
+    """
+    if config is None:
+        config = get_search_config()
+    solr = get_solr_client()
+    results = {}
+    for core_name in sorted(set(s.solr_core_name for s in config.searches.values())):
+        try:
+            solr.query(core_name, {'q': '*:*', 'rows': 0})
+            results[core_name] = True
+        except (ConnectionError, SolrError) as x:
+            logger.warning(f"Unable to warm Solr core {core_name}: {x}")
+            results[core_name] = False
+    return results
+
+
+def warm_search_cache(templates=True, ping=False, codes=False) -> dict:
+    """
+    Warm up the search configuration registry, the custom plugins and, optionally, the code tables of every search,
+    the templates and Solr cores. Code tables are otherwise loaded by the first request of each search.
+    :return: a summary of what was loaded, with the number of codes in the code tables loaded so far
+    """
+    config = get_search_config()
+    if codes:
+        for search_id in config.searches:
+            config.get_code_tables(search_id)
+    summary = {
+        'config_version': config.version,
+        'searches': len(config.searches),
+        'codes': sum(len(t.keys) for tables in list(config.code_tables.values()) for t in tables.tables.values()),
+        'plugins': len(get_plugins()),
+        'templates': 0,
+        'solr_cores': {},
+    }
+    if templates:
+        summary['templates'] = precompile_templates(get_search_templates(config))
+    if ping:
+        summary['solr_cores'] = ping_solr_cores(config)
+    return summary
+
+
+# Programs that serve the search pages: the uWSGI and Gunicorn WSGI servers and the Daphne, Uvicorn and Hypercorn
+# ASGI servers
+SERVER_PROGRAMS = ['uwsgi', 'gunicorn', 'daphne', 'uvicorn', 'hypercorn']
+
+
+def is_server_process() -> bool:
+    """
+    Returns True only for the WSGI and ASGI servers and the runserver command, and False for every other management
+    command, Celery workers and test runners, which do not serve search pages.
+    """
+    if 'uwsgi' in sys.modules:
+        # The uwsgi module only exists inside a uWSGI worker
+        return True
+    program = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else ''
+    if program == '__main__.py':
+        # python -m <package>
+        program = os.path.basename(os.path.dirname(sys.argv[0]))
+    if program in ('manage.py', 'django-admin', 'django'):
+        return len(sys.argv) > 1 and sys.argv[1] == 'runserver'
+    return program in SERVER_PROGRAMS
+
+
+def warm_on_startup():
+    """
+    Called from the search application's ready() hook when SEARCH_WARM_ON_STARTUP is set.
+    """
+    try:
+        summary = warm_search_cache(templates=True, ping=getattr(settings, 'SEARCH_WARM_PING_SOLR', False),
+                                    codes=getattr(settings, 'SEARCH_WARM_CODE_TABLES', False))
+        logger.info(f"Search worker warmed up: {summary}")
+    except Exception as x:
+        # Never prevent the worker from starting - the configuration will be loaded by the first request instead
+        logger.error(f"Unable to warm up the search application: {x}")
+    finally:
+        # Don't share database or Solr connections opened before uWSGI forks the workers
+        connections.close_all()
+        close_solr_clients()